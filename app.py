@@ -1,13 +1,26 @@
+import os
 from flask import Flask
+from jinja2 import FileSystemBytecodeCache
 from config import Config
 from database.db import init_app, init_db, get_db
+from services import admission, assets, compression, metrics, snapshot
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
 
+    # Compiled templates survive restarts, so new workers skip the Jinja compiler
+    if app.config['TEMPLATE_CACHE_DIR']:
+        os.makedirs(app.config['TEMPLATE_CACHE_DIR'], exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config['TEMPLATE_CACHE_DIR'])
+
     # Initialize database
     init_app(app)
+    metrics.init_app(app)
+    assets.init_app(app)
+    compression.init_app(app)
+    snapshot.init_app(app)
+    admission.init_app(app)
 
     with app.app_context():
         init_db()
@@ -19,6 +32,9 @@ def create_app():
     from routes.quiz import quiz_bp
     from routes.flashcard import flashcard_bp
     from routes.syllabus import syllabus_bp
+    from routes.search import search_bp
+    from routes.assets import assets_bp
+    from routes.data import data_bp
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(main_bp)
@@ -26,9 +42,17 @@ def create_app():
     app.register_blueprint(quiz_bp, url_prefix='/quiz')
     app.register_blueprint(flashcard_bp, url_prefix='/flashcard')
     app.register_blueprint(syllabus_bp, url_prefix='/syllabus')
+    app.register_blueprint(search_bp, url_prefix='/search')
+    app.register_blueprint(assets_bp, url_prefix='/assets')
+    app.register_blueprint(data_bp, url_prefix='/data')
 
     return app
 
+def precompile_templates(app):
+    """Compile every template now, e.g. in a preforking master so workers inherit them"""
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+
 if __name__ == '__main__':
     app = create_app()
     app.run(debug=True, port=5000)
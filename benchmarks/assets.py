@@ -0,0 +1,113 @@
+"""Measure bytes transferred per page view with and without built assets.
+
+Renders the main pages for a guest with a deck and a quiz, then fetches the
+stylesheets and scripts each page references the way a browser accepting
+gzip and brotli would:
+
+    source   static files as written, through Flask's static handler
+    built    minified, fingerprinted and precompressed (flask assets build)
+
+A first view downloads everything. On a repeat view, source assets are
+revalidated (one request each, answered 304) while built ones are served
+from the browser cache without a request.
+
+Usage:
+    python -m benchmarks.assets
+"""
+import argparse
+import gzip
+import os
+import re
+import tempfile
+from config import Config
+from services import assets
+
+ASSET_URL = re.compile(r'(?:src|href)="(/(?:static|assets)/[^"]+)"')
+ACCEPT = {'Accept-Encoding': 'br, gzip'}
+
+
+def make_client(workdir):
+    Config.DATABASE = os.path.join(workdir, 'assets.db')
+    from app import create_app
+    app = create_app()
+    client = app.test_client()
+    client.get('/guest')
+    deck = client.post('/flashcard/api/deck', json={'name': 'Deck', 'description': '', 'subject': ''}).get_json()
+    client.post(f'/flashcard/api/deck/{deck["id"]}/card', json={'front': 'Front', 'back': 'Back'})
+    quiz = client.post('/quiz/api/quiz', json={'title': 'Quiz', 'description': '', 'subject': ''}).get_json()
+    pages = {
+        'dashboard': '/dashboard',
+        'pomodoro': '/pomodoro/',
+        'flashcards': '/flashcard/',
+        'study': f'/flashcard/{deck["id"]}/study',
+        'edit deck': f'/flashcard/edit/{deck["id"]}',
+        'quizzes': '/quiz/',
+        'take quiz': f'/quiz/{quiz["id"]}/take',
+        'edit quiz': f'/quiz/edit/{quiz["id"]}',
+        'syllabus': '/syllabus/create',
+        'search': '/search/',
+    }
+    return app, client, pages
+
+
+def decode(response):
+    """Text of a page the app compressed with Content-Encoding"""
+    data = response.data
+    if response.headers.get('Content-Encoding') == 'br':
+        import brotli
+        data = brotli.decompress(data)
+    elif response.headers.get('Content-Encoding') == 'gzip':
+        data = gzip.decompress(data)
+    return data.decode('utf-8')
+
+
+def page_view(client, path):
+    """(html bytes, asset bytes, repeat-view asset bytes, repeat-view requests)"""
+    html = client.get(path, headers=ACCEPT)
+    assert html.status_code == 200, (path, html.status_code)
+    asset_bytes = repeat_bytes = repeat_requests = 0
+    for url in dict.fromkeys(ASSET_URL.findall(decode(html))):
+        response = client.get(url, headers=ACCEPT)
+        asset_bytes += len(response.data)
+        if 'immutable' in response.headers.get('Cache-Control', ''):
+            continue
+        repeat_requests += 1
+        revalidated = client.get(url, headers={**ACCEPT, 'If-None-Match': response.headers.get('ETag', '')})
+        repeat_bytes += len(revalidated.data)
+    return len(html.data), asset_bytes, repeat_bytes, repeat_requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.parse_args()
+
+    os.environ.setdefault('LLM_PROVIDER', 'mock')
+    with tempfile.TemporaryDirectory() as workdir:
+        app, client, pages = make_client(workdir)
+
+        results = {}
+        app.extensions['asset_manifest'] = {}
+        results['source'] = {name: page_view(client, path) for name, path in pages.items()}
+
+        app.config['ASSETS_DIR'] = os.path.join(workdir, 'dist')
+        assets.build(app.static_folder, app.config['ASSETS_DIR'])
+        app.extensions['asset_manifest'] = assets.load_manifest(app.config['ASSETS_DIR'])
+        results['built'] = {name: page_view(client, path) for name, path in pages.items()}
+
+    print(f'{"page":12} {"mode":7} {"html":>7} {"assets":>8} {"first view":>11} {"repeat view":>12} {"requests":>9}')
+    totals = {}
+    for name in pages:
+        for mode in ('source', 'built'):
+            html, asset_bytes, repeat_bytes, repeat_requests = results[mode][name]
+            first, repeat = html + asset_bytes, html + repeat_bytes
+            total = totals.setdefault(mode, [0, 0])
+            total[0] += first
+            total[1] += repeat
+            print(f'{name:12} {mode:7} {html:7} {asset_bytes:8} {first:11} {repeat:12} {repeat_requests:9}')
+    print()
+    for mode, (first, repeat) in totals.items():
+        print(f'{mode:7} mean bytes per view: first {first / len(pages):8.0f}  repeat {repeat / len(pages):8.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Report syllabus storage savings from compression and deduplication.
+
+Seeds a corpus where many users upload the same popular course material
+and compares storing the text inline per row with the content store.
+
+Usage:
+    python -m benchmarks.content_store [--syllabi 5000] [--courses 200]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+from services import content_store
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'schema.sql')
+
+TOPICS = ['cell biology', 'thermodynamics', 'linear algebra', 'european history', 'organic chemistry',
+          'microeconomics', 'data structures', 'statistics', 'macroeconomics', 'genetics']
+
+
+def make_course(rng, i):
+    lines = [f'Course {i}: Introduction to {rng.choice(TOPICS)}']
+    for week in range(1, 15):
+        topic = rng.choice(TOPICS)
+        lines.append(f'Week {week}: {topic.title()} - lecture, readings (chapter {rng.randint(1, 30)}) and '
+                     f'problem set {week}. Learning outcomes: explain the core ideas of {topic}, apply them to '
+                     f'worked examples and evaluate common misconceptions.')
+        lines.append(f'Assessment: quiz {week} worth {rng.randint(2, 10)}% of the final grade.')
+    lines.append('Office hours are held weekly. Late submissions lose 10% per day.')
+    return '\n'.join(lines)
+
+
+def create_db(path):
+    db = sqlite3.connect(path)
+    db.row_factory = sqlite3.Row
+    with open(SCHEMA_PATH) as f:
+        db.executescript(f.read())
+    return db
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--syllabi', type=int, default=5000)
+    parser.add_argument('--courses', type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    courses = [make_course(rng, i) for i in range(args.courses)]
+    # Popular courses are uploaded far more often (Zipf-like)
+    weights = [1 / (rank + 1) for rank in range(args.courses)]
+    uploads = rng.choices(courses, weights=weights, k=args.syllabi)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        inline = create_db(os.path.join(tmp, 'inline.db'))
+        inline.executemany('INSERT INTO syllabi (user_id, name, content) VALUES (?, ?, ?)',
+                           [(i, 'Syllabus', text) for i, text in enumerate(uploads)])
+        inline.commit()
+
+        store = create_db(os.path.join(tmp, 'store.db'))
+        for i, text in enumerate(uploads):
+            digest = content_store.put(store, text)
+            store.execute('INSERT INTO syllabi (user_id, name, content_hash) VALUES (?, ?, ?)', (i, 'Syllabus', digest))
+        store.commit()
+
+        inline_stats = content_store.storage_stats(inline)
+        store_stats = content_store.storage_stats(store)
+
+        print(f"syllabi: {args.syllabi}, distinct texts: {store_stats['blobs']}")
+        print(f"inline text bytes:   {inline_stats['stored_bytes']:>12,}")
+        print(f"unique text bytes:   {store_stats['unique_bytes']:>12,}")
+        print(f"stored blob bytes:   {store_stats['stored_bytes']:>12,}")
+        print(f"savings:             {store_stats['savings_pct']:>11}%")
+
+        inline.close()
+        store.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""Compare separate vs combined syllabus generation on the mock provider.
+
+Usage:
+    python -m benchmarks.generation_modes [--runs 5]
+"""
+import argparse
+import time
+from services.llm import MockClient
+from services.generator import Generator, GENERATE_TYPES
+
+SAMPLE_SYLLABUS = "\n".join(
+    f"Week {i + 1}: Lecture on topic {i + 1}. Readings cover the key definitions, "
+    f"worked examples and the assessment criteria for unit {i + 1}."
+    for i in range(60)
+)
+
+
+def run(mode, runs, broken_sections=()):
+    totals = {'calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+    elapsed = 0.0
+    for _ in range(runs):
+        generator = Generator(MockClient(broken_sections=broken_sections))
+        start = time.perf_counter()
+        generator.generate(SAMPLE_SYLLABUS, GENERATE_TYPES['all'], mode=mode)
+        elapsed += time.perf_counter() - start
+        for key, value in generator.usage.items():
+            totals[key] += value
+    return {key: value / runs for key, value in totals.items()}, elapsed / runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    scenarios = [
+        ('separate', 'separate', ()),
+        ('combined', 'combined', ()),
+        ('combined (plan fails validation)', 'combined', ('study_plan',)),
+    ]
+
+    print(f"{'mode':<34}{'calls':>7}{'prompt tok':>12}{'compl tok':>11}{'total tok':>11}{'latency ms':>12}")
+    for label, mode, broken in scenarios:
+        usage, latency = run(mode, args.runs, broken)
+        print(f"{label:<34}{usage['calls']:>7.0f}{usage['prompt_tokens']:>12.0f}"
+              f"{usage['completion_tokens']:>11.0f}{usage['total_tokens']:>11.0f}{latency * 1000:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Compare JSON serialization and compression costs for the largest API responses.
+
+Builds one large deck and one large quiz, then times each endpoint two ways:
+
+    jsonify   rows fetched as sqlite3.Row, copied to dicts, encoded by Flask
+    sqljson   the body built by SQLite's json_group_array (what routes use)
+
+Times are CPU seconds per request in this process, so they include the
+query itself. Payload sizes are reported as sent with no Accept-Encoding,
+with gzip and with brotli.
+
+Usage:
+    python -m benchmarks.json_api [--cards 5000] [--questions 1000] [--repeat 20]
+"""
+import argparse
+import os
+import tempfile
+import time
+from flask import jsonify, session
+from config import Config
+from database.db import get_db
+from services import decks as deck_service
+
+
+def make_app(workdir, cards, questions):
+    Config.DATABASE = os.path.join(workdir, 'json_api.db')
+    from app import create_app
+    app = create_app()
+    client = app.test_client()
+    client.get('/guest')
+    with client.session_transaction() as sess:
+        user_id = sess['user_id']
+    deck_id = client.post('/flashcard/api/deck', json={'name': 'Deck', 'description': '', 'subject': ''}).get_json()['id']
+    quiz_id = client.post('/quiz/api/quiz', json={'title': 'Quiz', 'description': '', 'subject': ''}).get_json()['id']
+    with app.app_context():
+        db = get_db()
+        db.executemany(
+            'INSERT INTO flashcards (deck_id, front, back) VALUES (?, ?, ?)',
+            ((deck_id, f'Term {i}', f'Definition of term {i}, long enough to look like real notes.') for i in range(cards))
+        )
+        db.executemany(
+            '''INSERT INTO quiz_questions (quiz_id, question_text, question_type, options, correct_answer, order_num)
+               VALUES (?, ?, 'multiple_choice', ?, ?, ?)''',
+            ((quiz_id, f'Question {i}?', '["Option A", "Option B", "Option C", "Option D"]', 'Option A', i)
+             for i in range(questions))
+        )
+        db.commit()
+    return app, client, user_id, deck_id, quiz_id
+
+
+def legacy_views(user_id, deck_id, quiz_id):
+    """The dict + jsonify versions of the routes, for comparison"""
+    def deck():
+        db = get_db()
+        row = db.execute('SELECT * FROM flashcard_decks WHERE id = ?', (deck_id,)).fetchone()
+        cards = deck_service.deck_cards(db, deck_id, user_id)
+        return jsonify({'deck': dict(row), 'cards': [dict(c) for c in cards]})
+
+    def due():
+        return jsonify([dict(c) for c in deck_service.due_cards(get_db(), deck_id, user_id)])
+
+    def quiz():
+        db = get_db()
+        row = db.execute('SELECT * FROM quizzes WHERE id = ?', (quiz_id,)).fetchone()
+        questions = db.execute('SELECT * FROM quiz_questions WHERE quiz_id = ? ORDER BY order_num', (quiz_id,)).fetchall()
+        return jsonify({'quiz': dict(row), 'questions': [dict(q) for q in questions]})
+
+    return {'deck': deck, 'due cards': due, 'quiz': quiz}
+
+
+def cpu_per_call(fn, repeat):
+    fn()
+    start = time.process_time()
+    for _ in range(repeat):
+        fn()
+    return (time.process_time() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cards', type=int, default=5000)
+    parser.add_argument('--questions', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    os.environ.setdefault('LLM_PROVIDER', 'mock')
+    with tempfile.TemporaryDirectory() as workdir:
+        app, client, user_id, deck_id, quiz_id = make_app(workdir, args.cards, args.questions)
+        urls = {
+            'deck': f'/flashcard/api/deck/{deck_id}',
+            'due cards': f'/flashcard/api/deck/{deck_id}/due',
+            'quiz': f'/quiz/api/quiz/{quiz_id}',
+        }
+        legacy = legacy_views(user_id, deck_id, quiz_id)
+
+        print(f'{"endpoint":10} {"jsonify ms":>11} {"sqljson ms":>11} {"speedup":>8} '
+              f'{"identity":>9} {"gzip":>8} {"br":>8}')
+        for name, url in urls.items():
+            endpoint, kwargs = app.url_map.bind('').match(url)
+            view = app.view_functions[endpoint]
+            with app.test_request_context(url):
+                session['user_id'] = user_id
+                old = cpu_per_call(lambda: legacy[name]().get_data(), args.repeat)
+                new = cpu_per_call(lambda: view(**kwargs).get_data(), args.repeat)
+            sizes = [len(client.get(url, headers={'Accept-Encoding': encoding}).data)
+                     for encoding in ('identity', 'gzip', 'br')]
+            print(f'{name:10} {old * 1000:11.1f} {new * 1000:11.1f} {old / new:7.1f}x '
+                  f'{sizes[0]:9} {sizes[1]:8} {sizes[2]:8}')
+
+
+if __name__ == '__main__':
+    main()
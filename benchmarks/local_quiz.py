@@ -0,0 +1,55 @@
+"""Time local quiz generation from a large flashcard deck.
+
+Usage:
+    python -m benchmarks.local_quiz [--cards 10000] [--questions 50]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import time
+from services.local_quiz import create_quiz_from_deck
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'schema.sql')
+
+
+def seed(db, num_cards, rng):
+    vocabulary = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(3, 10)))
+                  for _ in range(5000)]
+    db.execute("INSERT INTO users (username) VALUES ('bench')")
+    db.execute("INSERT INTO flashcard_decks (user_id, name, subject) VALUES (1, 'Bench deck', 'bench')")
+    db.executemany('INSERT INTO flashcards (deck_id, front, back) VALUES (1, ?, ?)', [
+        (f"Term {i}", ' '.join(rng.choice(vocabulary) for _ in range(rng.randint(4, 16))))
+        for i in range(num_cards)
+    ])
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cards', type=int, default=10000)
+    parser.add_argument('--questions', type=int, default=50)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    db = sqlite3.connect(':memory:')
+    db.row_factory = sqlite3.Row
+    with open(SCHEMA_PATH) as f:
+        db.executescript(f.read())
+    seed(db, args.cards, rng)
+    deck = db.execute('SELECT * FROM flashcard_decks WHERE id = 1').fetchone()
+
+    timings = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        create_quiz_from_deck(db, 1, deck, args.questions, rng=rng)
+        timings.append(time.perf_counter() - start)
+
+    timings.sort()
+    print(f"{args.questions} questions from {args.cards} cards: "
+          f"median {timings[len(timings) // 2] * 1000:.1f} ms, max {timings[-1] * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""Measure latency of ordinary endpoints while the login form is flooded.
+
+Runs the app in a threaded server on a temporary database. Attacker threads
+post wrong passwords for existing usernames (credential stuffing from one IP)
+while a probe client polls /pomodoro/api/settings. Scenarios:
+
+    idle            no attack, for reference
+    inline          hashing in the request threads, no throttling
+    pool            hashing in the process pool, no throttling
+    pool+throttle   pool plus per-username/per-IP token buckets
+
+Usage:
+    python -m benchmarks.login_storm [--attackers 8] [--duration 5]
+"""
+import argparse
+import logging
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+import requests
+from werkzeug.security import generate_password_hash
+from werkzeug.serving import make_server
+from config import Config
+from services import passwords
+
+SCENARIOS = ('idle', 'inline', 'pool', 'pool+throttle')
+ACCOUNTS = 1000
+
+
+def start_server(scenario, workers):
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    os.remove(path)
+    Config.DATABASE = path
+
+    from app import create_app
+    app = create_app()
+    app.config['PASSWORD_HASH_WORKERS'] = 0 if scenario == 'inline' else workers
+
+    unlimited = (float('inf'), 1.0)
+    passwords.username_throttle = passwords.Throttle(*(passwords.USERNAME_BUCKET if scenario == 'pool+throttle' else unlimited))
+    passwords.ip_throttle = passwords.Throttle(*(passwords.IP_BUCKET if scenario == 'pool+throttle' else unlimited))
+
+    db = sqlite3.connect(path)
+    password_hash = generate_password_hash('correct horse', app.config['PASSWORD_HASH_METHOD'])
+    db.executemany('INSERT INTO users (username, password_hash) VALUES (?, ?)',
+                   [(f'user{i}', password_hash) for i in range(ACCOUNTS)])
+    db.commit()
+    db.close()
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, path
+
+
+def attack(base, stop, counts):
+    client = requests.Session()
+    while not stop.is_set():
+        r = client.post(f'{base}/login', data={'username': f'user{random.randrange(ACCOUNTS)}', 'password': 'hunter2'},
+                        allow_redirects=False)
+        counts[r.status_code] = counts.get(r.status_code, 0) + 1
+
+
+def probe(base, stop, latencies):
+    client = requests.Session()
+    client.get(f'{base}/guest')
+    while not stop.is_set():
+        start = time.perf_counter()
+        client.get(f'{base}/pomodoro/api/settings')
+        latencies.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.01)
+
+
+def run(scenario, attackers, duration, workers):
+    server, path = start_server(scenario, workers)
+    base = f'http://127.0.0.1:{server.server_port}'
+
+    # Warm the pool so worker start-up is not measured
+    requests.post(f'{base}/login', data={'username': 'user0', 'password': 'correct horse'})
+
+    stop = threading.Event()
+    latencies, counts = [], {}
+    threads = [threading.Thread(target=probe, args=(base, stop, latencies))]
+    if scenario != 'idle':
+        threads += [threading.Thread(target=attack, args=(base, stop, counts)) for _ in range(attackers)]
+    for t in threads:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    server.shutdown()
+    os.remove(path)
+
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    attempts = ', '.join(f'{code}: {n}' for code, n in sorted(counts.items())) or '-'
+    print(f'{scenario:14} probes {len(latencies):5}  p50 {statistics.median(latencies):8.1f} ms  '
+          f'p99 {p99:8.1f} ms  login responses [{attempts}]')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--attackers', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per scenario')
+    parser.add_argument('--workers', type=int, default=2, help='hashing processes for the pool scenarios')
+    args = parser.parse_args()
+
+    os.environ.setdefault('LLM_PROVIDER', 'mock')
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    print(f'{args.attackers} attackers, {args.duration:.0f}s per scenario, {os.cpu_count()} CPUs\n')
+    for scenario in SCENARIOS:
+        run(scenario, args.attackers, args.duration, args.workers)
+
+
+if __name__ == '__main__':
+    main()
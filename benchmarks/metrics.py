@@ -0,0 +1,68 @@
+"""Check that request metrics attribute SQLite time to each endpoint.
+
+Creates an app with METRICS_ENABLED on a fresh database, logs in as a guest
+with a deck and a card, then requests read-only pages and APIs a few times.
+Exits with status 1 if /metrics reports zero request_db_seconds for any of
+them, which happens when queries bypass the timed connection.
+
+Usage:
+    python -m benchmarks.metrics [--repeat 5]
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+from config import Config
+
+DB_SECONDS = re.compile(r'^\w*request_db_seconds_sum\{endpoint="([^"]+)"\} (\S+)$', re.M)
+
+
+def make_client(workdir):
+    Config.DATABASE = os.path.join(workdir, 'metrics.db')
+    Config.METRICS_ENABLED = True
+    Config.METRICS_DIR = None
+    from app import create_app
+    client = create_app().test_client()
+    client.get('/guest')
+    deck = client.post('/flashcard/api/deck', json={'name': 'Deck', 'description': '', 'subject': ''}).get_json()
+    client.post(f'/flashcard/api/deck/{deck["id"]}/card', json={'front': 'Front', 'back': 'Back'})
+    endpoints = {
+        'flashcard.index': '/flashcard/',
+        'flashcard.get_deck': f'/flashcard/api/deck/{deck["id"]}',
+        'flashcard.get_deck_stats': f'/flashcard/api/deck/{deck["id"]}/stats',
+        'main.dashboard': '/dashboard',
+    }
+    return client, endpoints
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ.setdefault('LLM_PROVIDER', 'mock')
+    with tempfile.TemporaryDirectory() as workdir:
+        client, endpoints = make_client(workdir)
+        for path in endpoints.values():
+            for _ in range(args.repeat):
+                response = client.get(path)
+                assert response.status_code == 200, (path, response.status_code)
+        reported = {endpoint: float(total) for endpoint, total in
+                    DB_SECONDS.findall(client.get('/metrics').get_data(as_text=True))}
+
+    failures = []
+    for endpoint in endpoints:
+        seconds = reported.get(endpoint, 0.0)
+        print(f'{endpoint:24} {seconds * 1000:8.2f} ms in SQLite over {args.repeat} requests')
+        if not seconds:
+            failures.append(f'{endpoint} reported no DB time')
+    for failure in failures:
+        print(f'\nFAIL: {failure}')
+    if failures:
+        sys.exit(1)
+    print('\nOK: every endpoint reported DB time')
+
+
+if __name__ == '__main__':
+    main()
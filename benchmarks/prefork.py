@@ -0,0 +1,112 @@
+"""Compare the Werkzeug dev server with the preforked gunicorn setup.
+
+Starts each server on its own copy of a seeded database, drives it with the
+benchmarks.workload scenarios over HTTP, then stops it with SIGTERM:
+
+    dev       flask run (one process, a thread per request)
+    prefork   gunicorn -c gunicorn.conf.py wsgi:app (WEB_CONCURRENCY x WEB_THREADS)
+
+Usage:
+    python -m benchmarks.prefork [--db /tmp/bench.db] [--clients 16] [--duration 15] [--workers 4]
+"""
+import argparse
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import requests
+from benchmarks.seed import PASSWORD_METHOD, seed
+from benchmarks.workload import SCENARIOS, Fixtures, HTTPTransport, run
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def command(server, port):
+    if server == 'dev':
+        return [sys.executable, '-m', 'flask', '--app', 'wsgi', 'run', '--port', str(port)]
+    return [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app']
+
+
+def start(server, path, port, workers, threads):
+    env = dict(
+        os.environ,
+        DATABASE=path,
+        LLM_PROVIDER='mock',
+        # Seeded hashes already use this method, so logins are not rehashed
+        PASSWORD_HASH_METHOD=PASSWORD_METHOD,
+        BIND=f'127.0.0.1:{port}',
+        WEB_CONCURRENCY=str(workers),
+        WEB_THREADS=str(threads),
+    )
+    process = subprocess.Popen(command(server, port), cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f'http://127.0.0.1:{port}'
+    for _ in range(100):
+        try:
+            requests.get(base + '/', timeout=1)
+            return process, base
+        except requests.ConnectionError:
+            if process.poll() is not None:
+                raise RuntimeError(f'{server} server exited with status {process.returncode}')
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f'{server} server did not start')
+
+
+def stop(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        return process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        return process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', help='database created by benchmarks.seed (default: seed a small one)')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=15.0, help='seconds per server')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--threads', type=int, default=4)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    source = args.db
+    if source is None:
+        source = os.path.join(workdir, 'seed.db')
+        seed(source, users=200, cards=20_000, reviews=100_000, attempts=2000, sessions_per_user=50, days=30)
+        print()
+
+    results = {}
+    for server in ('dev', 'prefork'):
+        path = os.path.join(workdir, f'{server}.db')
+        shutil.copyfile(source, path)
+        process, base = start(server, path, free_port(), args.workers, args.threads)
+        results[server] = run(lambda: HTTPTransport(base), Fixtures(path), list(SCENARIOS), args.clients, args.duration)
+        status = stop(process)
+        print(f'{server:8} {results[server]["requests"]:6} requests  {results[server]["throughput"]:7.1f} req/s  '
+              f'exit status after SIGTERM {status}')
+    shutil.rmtree(workdir)
+
+    dev, prefork = results['dev']['endpoints'], results['prefork']['endpoints']
+    print(f'\n{args.clients} clients, {args.workers} workers x {args.threads} threads, {os.cpu_count()} CPUs\n')
+    print(f'{"endpoint":40} {"dev p50":>8} {"p99":>8} {"prefork p50":>12} {"p99":>8}')
+    for endpoint in sorted(set(dev) | set(prefork)):
+        row = [dev.get(endpoint, {}).get(k, float('nan')) for k in ('p50_ms', 'p99_ms')]
+        row += [prefork.get(endpoint, {}).get(k, float('nan')) for k in ('p50_ms', 'p99_ms')]
+        print(f'{endpoint:40} {row[0]:8.1f} {row[1]:8.1f} {row[2]:12.1f} {row[3]:8.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""Compare FTS5 search with LIKE '%term%' scans on a large seeded database.
+
+Usage:
+    python -m benchmarks.search [--rows 1000000] [--users 1000] [--db /tmp/search_bench.db]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import time
+from services.search import search, rebuild_search_index
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'schema.sql')
+
+TERMS = ['photosynthesis', 'mitochondria', 'derivative', 'revolution', 'enzyme', 'matrix']
+
+
+def seed(db, rows, users, rng):
+    with open(SCHEMA_PATH) as f:
+        schema = f.read()
+    db.executescript(schema)
+    # Index once at the end instead of row by row through the trigger
+    db.execute('DROP TRIGGER flashcards_fts_insert')
+
+    vocabulary = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(3, 10)))
+                  for _ in range(20000)] + TERMS * 200
+    decks_per_user = 10
+
+    db.executemany('INSERT INTO users (id, username) VALUES (?, ?)',
+                   [(u, f'user{u}') for u in range(1, users + 1)])
+    db.executemany('INSERT INTO flashcard_decks (id, user_id, name) VALUES (?, ?, ?)',
+                   [(u * decks_per_user + k, u, f'Deck {k}') for u in range(1, users + 1) for k in range(decks_per_user)])
+
+    batch = []
+    for i in range(rows):
+        deck_id = rng.randint(1, users) * decks_per_user + rng.randrange(decks_per_user)
+        front = ' '.join(rng.choice(vocabulary) for _ in range(rng.randint(1, 4)))
+        back = ' '.join(rng.choice(vocabulary) for _ in range(rng.randint(5, 20)))
+        batch.append((deck_id, front, back))
+        if len(batch) == 50000:
+            db.executemany('INSERT INTO flashcards (deck_id, front, back) VALUES (?, ?, ?)', batch)
+            batch = []
+    if batch:
+        db.executemany('INSERT INTO flashcards (deck_id, front, back) VALUES (?, ?, ?)', batch)
+    db.commit()
+
+    rebuild_search_index(db)
+    db.executescript(schema)
+
+
+def like_search(db, user_id, term, limit=20):
+    pattern = f'%{term}%'
+    return db.execute('''
+        SELECT f.id FROM flashcards f
+        JOIN flashcard_decks d ON d.id = f.deck_id
+        WHERE d.user_id = ? AND (f.front LIKE ? OR f.back LIKE ?)
+        LIMIT ?
+    ''', (user_id, pattern, pattern, limit)).fetchall()
+
+
+def like_count(db, term):
+    pattern = f'%{term}%'
+    return db.execute('SELECT COUNT(*) FROM flashcards WHERE front LIKE ? OR back LIKE ?',
+                      (pattern, pattern)).fetchone()[0]
+
+
+def fts_count(db, term):
+    return db.execute('SELECT COUNT(*) FROM flashcards_fts WHERE flashcards_fts MATCH ?',
+                      (f'{{front back}} : "{term}"*',)).fetchone()[0]
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--db', default='/tmp/search_bench.db')
+    parser.add_argument('--reseed', action='store_true')
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    fresh = args.reseed or not os.path.exists(args.db)
+    if args.reseed and os.path.exists(args.db):
+        os.remove(args.db)
+    db = sqlite3.connect(args.db)
+    db.row_factory = sqlite3.Row
+    if fresh:
+        start = time.perf_counter()
+        seed(db, args.rows, args.users, rng)
+        print(f'seeded {args.rows} cards in {time.perf_counter() - start:.1f}s')
+
+    users = [rng.randint(1, args.users) for _ in range(len(TERMS))]
+
+    print(f"{'query':<28}{'LIKE ms':>10}{'FTS ms':>10}")
+    rows = [
+        ('per-user top 20', lambda t, u: like_search(db, u, t), lambda t, u: search(db, u, t, ['card'])),
+        ('prefix per-user top 20', lambda t, u: like_search(db, u, t[:4]), lambda t, u: search(db, u, t[:4], ['card'])),
+        ('global count', lambda t, u: like_count(db, t), lambda t, u: fts_count(db, t)),
+    ]
+    for label, like_fn, fts_fn in rows:
+        like_ms = statistics.median(timed(like_fn, t, u) for t, u in zip(TERMS, users))
+        fts_ms = statistics.median(timed(fts_fn, t, u) for t, u in zip(TERMS, users))
+        print(f'{label:<28}{like_ms:>10.2f}{fts_ms:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
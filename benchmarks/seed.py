@@ -0,0 +1,257 @@
+"""Seed a database with synthetic users, decks, reviews, quizzes and sessions.
+
+Defaults match a large deployment (100k users, 10M flashcards, 50M reviews,
+1M quiz attempts); use --scale to shrink every count proportionally. Rows are
+streamed through executemany with journaling off and triggers dropped, then
+the triggers are restored and the derived tables (session rollups, deck
+statistics, search index) rebuilt once at the end.
+
+Usage:
+    python -m benchmarks.seed --db /tmp/bench.db [--scale 0.01] [--no-search-index]
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import time
+from datetime import date, datetime, timedelta
+from werkzeug.security import generate_password_hash
+from database.db import MIGRATIONS
+from services import deck_stats
+from services.search import rebuild_search_index
+from services.sessions import rebuild_rollups
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'schema.sql')
+
+DECKS_PER_USER = 10
+QUIZZES_PER_USER = 2
+QUESTIONS_PER_QUIZ = 10
+# Share of a user's cards that have been reviewed at least once
+REVIEWED_SHARE = 0.6
+HISTORY_DAYS = 90
+# Every seeded account logs in with this password. The hash is deliberately
+# cheap so load tests are not dominated by logins; the app upgrades it on
+# first login.
+PASSWORD = 'benchmark'
+PASSWORD_METHOD = 'pbkdf2:sha256:1000'
+
+WORDS = ('cell', 'energy', 'protein', 'market', 'theorem', 'empire', 'enzyme', 'vector', 'climate',
+         'language', 'orbit', 'contract', 'neuron', 'ledger', 'reaction', 'matrix', 'treaty', 'genome')
+
+
+class Layout:
+    """Deterministic ids, so related rows can be generated without lookups"""
+
+    def __init__(self, users, cards):
+        self.users = users
+        self.cards_per_deck = max(1, cards // (users * DECKS_PER_USER))
+
+    def deck_id(self, user_id, k):
+        return (user_id - 1) * DECKS_PER_USER + k + 1
+
+    def card_id(self, deck_id, j):
+        return (deck_id - 1) * self.cards_per_deck + j + 1
+
+    def quiz_id(self, user_id, k):
+        return (user_id - 1) * QUIZZES_PER_USER + k + 1
+
+    def random_card(self, rng, user_id):
+        return self.card_id(self.deck_id(user_id, rng.randrange(DECKS_PER_USER)), rng.randrange(self.cards_per_deck))
+
+
+def phrase(rng, n):
+    return ' '.join(rng.choice(WORDS) for _ in range(n))
+
+
+def timestamps(rng, count=5000):
+    now = datetime.utcnow()
+    return [(now - timedelta(seconds=rng.randrange(HISTORY_DAYS * 86400))).strftime('%Y-%m-%d %H:%M:%S')
+            for _ in range(count)]
+
+
+def users_rows(layout):
+    password_hash = generate_password_hash(PASSWORD, PASSWORD_METHOD)
+    for u in range(1, layout.users + 1):
+        yield u, f'user{u}', f'user{u}@example.com', password_hash
+
+
+def decks_rows(layout, rng):
+    for u in range(1, layout.users + 1):
+        for k in range(DECKS_PER_USER):
+            yield layout.deck_id(u, k), u, f'Deck {k + 1}', phrase(rng, 3), rng.choice(WORDS), int(k == 0 and u % 50 == 0)
+
+
+def cards_rows(layout, rng):
+    for d in range(1, layout.users * DECKS_PER_USER + 1):
+        for j in range(layout.cards_per_deck):
+            yield layout.card_id(d, j), d, phrase(rng, 2), phrase(rng, 8)
+
+
+def card_states_rows(layout, rng, stamps):
+    today = date.today()
+    for u in range(1, layout.users + 1):
+        for k in range(DECKS_PER_USER):
+            for j in range(layout.cards_per_deck):
+                if rng.random() >= REVIEWED_SHARE:
+                    continue
+                interval = rng.choice((1, 1, 6, 15, 38))
+                due = today + timedelta(days=rng.randint(-10, interval))
+                yield (u, layout.card_id(layout.deck_id(u, k), j), round(rng.uniform(1.3, 2.8), 2),
+                       interval, rng.randint(1, 6), due.isoformat(), rng.choice(stamps))
+
+
+def reviews_rows(layout, rng, stamps, count):
+    for _ in range(count):
+        u = rng.randint(1, layout.users)
+        yield layout.random_card(rng, u), u, rng.randint(0, 5), rng.choice(stamps)
+
+
+def quizzes_rows(layout, rng):
+    for u in range(1, layout.users + 1):
+        for k in range(QUIZZES_PER_USER):
+            yield layout.quiz_id(u, k), u, f'Quiz {k + 1}', phrase(rng, 4), rng.choice(WORDS)
+
+
+def questions_rows(layout, rng):
+    options = json.dumps(['True', 'False'])
+    for q in range(1, layout.users * QUIZZES_PER_USER + 1):
+        for i in range(QUESTIONS_PER_QUIZ):
+            yield q, phrase(rng, 6) + '?', 'true_false', rng.choice(('True', 'False')), options, phrase(rng, 5), i + 1
+
+
+def attempts_rows(layout, rng, stamps, count):
+    for _ in range(count):
+        u = rng.randint(1, layout.users)
+        score = rng.randint(0, QUESTIONS_PER_QUIZ)
+        yield (layout.quiz_id(u, rng.randrange(QUIZZES_PER_USER)), u, score, QUESTIONS_PER_QUIZ,
+               100.0 * score / QUESTIONS_PER_QUIZ, rng.randint(30, 600), rng.choice(stamps), '{}')
+
+
+def sessions_rows(layout, rng, stamps, per_user):
+    for u in range(1, layout.users + 1):
+        for _ in range(per_user):
+            completed = rng.choice(stamps)
+            kind = rng.choice(('focus', 'focus', 'focus', 'short_break', 'long_break'))
+            yield u, kind, 25 if kind == 'focus' else 5, completed, completed[:10]
+
+
+def daily_stats_rows(layout, rng, days):
+    today = date.today()
+    for u in range(1, layout.users + 1):
+        for offset in sorted(rng.sample(range(HISTORY_DAYS), min(days, HISTORY_DAYS))):
+            pomodoros = rng.randint(0, 8)
+            yield (u, (today - timedelta(days=offset)).isoformat(), pomodoros, pomodoros * 25,
+                   rng.randint(0, 60), rng.randint(0, 3), round(rng.uniform(40, 100), 1))
+
+
+def seed(path, users, cards, reviews, attempts, sessions_per_user, days, search_index=True, rng=None):
+    rng = rng or random.Random(42)
+    layout = Layout(users, cards)
+    stamps = timestamps(rng)
+
+    db = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES)
+    db.row_factory = sqlite3.Row
+    for pragma in ('journal_mode = OFF', 'synchronous = OFF', 'locking_mode = EXCLUSIVE',
+                   'cache_size = -262144', 'temp_store = MEMORY'):
+        db.execute(f'PRAGMA {pragma}')
+
+    with open(SCHEMA_PATH) as f:
+        schema = f.read()
+    db.executescript(schema)
+    db.execute(f'PRAGMA user_version = {len(MIGRATIONS)}')
+    # Per-row triggers (FTS, rollups, deck statistics) are replaced by one rebuild at the
+    # end; the blob refcount ones need none, as no syllabi are seeded
+    for row in db.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'").fetchall():
+        db.execute(f'DROP TRIGGER {row[0]}')
+
+    tables = [
+        ('users', 'INSERT INTO users (id, username, email, password_hash) VALUES (?, ?, ?, ?)',
+         users_rows(layout)),
+        ('pomodoro_settings', 'INSERT INTO pomodoro_settings (user_id) VALUES (?)',
+         ((u,) for u in range(1, users + 1))),
+        ('flashcard_decks', 'INSERT INTO flashcard_decks (id, user_id, name, description, subject, is_public) VALUES (?, ?, ?, ?, ?, ?)',
+         decks_rows(layout, rng)),
+        ('flashcards', 'INSERT INTO flashcards (id, deck_id, front, back) VALUES (?, ?, ?, ?)',
+         cards_rows(layout, rng)),
+        ('card_states', 'INSERT INTO card_states VALUES (?, ?, ?, ?, ?, ?, ?)',
+         card_states_rows(layout, rng, stamps)),
+        ('flashcard_reviews', 'INSERT INTO flashcard_reviews (flashcard_id, user_id, quality, reviewed_at) VALUES (?, ?, ?, ?)',
+         reviews_rows(layout, rng, stamps, reviews)),
+        ('quizzes', 'INSERT INTO quizzes (id, user_id, title, description, subject) VALUES (?, ?, ?, ?, ?)',
+         quizzes_rows(layout, rng)),
+        ('quiz_questions', 'INSERT INTO quiz_questions (quiz_id, question_text, question_type, correct_answer, options, explanation, order_num) VALUES (?, ?, ?, ?, ?, ?, ?)',
+         questions_rows(layout, rng)),
+        ('quiz_attempts', 'INSERT INTO quiz_attempts (quiz_id, user_id, score, total_points, percentage, time_taken_seconds, completed_at, answers) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+         attempts_rows(layout, rng, stamps, attempts)),
+        ('pomodoro_sessions', 'INSERT INTO pomodoro_sessions (user_id, session_type, duration_minutes, completed_at, local_date) VALUES (?, ?, ?, ?, ?)',
+         sessions_rows(layout, rng, stamps, sessions_per_user)),
+        ('daily_stats', 'INSERT INTO daily_stats (user_id, date, pomodoro_count, focus_minutes, cards_reviewed, quizzes_taken, average_quiz_score) VALUES (?, ?, ?, ?, ?, ?, ?)',
+         daily_stats_rows(layout, rng, days)),
+    ]
+
+    for table, sql, rows in tables:
+        start = time.perf_counter()
+        with db:
+            db.executemany(sql, rows)
+        count = db.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+        elapsed = time.perf_counter() - start
+        print(f'{table:20} {count:>12,} rows  {elapsed:7.1f} s  {count / max(elapsed, 1e-9):>10,.0f} rows/s')
+
+    db.executescript(schema)
+    start = time.perf_counter()
+    rebuild_rollups(db)
+    # Same rule as migration 7: a recall follows a review of the card on an earlier day
+    db.execute('''
+        UPDATE flashcard_reviews SET is_recall = 1 WHERE id IN (
+            SELECT id FROM (
+                SELECT id, reviewed_at,
+                       LAG(reviewed_at) OVER (PARTITION BY flashcard_id, user_id ORDER BY reviewed_at, id) as previous
+                FROM flashcard_reviews
+            ) WHERE DATE(previous, 'localtime') < DATE(reviewed_at, 'localtime')
+        )
+    ''')
+    deck_stats.rebuild(db)
+    if search_index:
+        rebuild_search_index(db)
+    db.execute('ANALYZE')
+    db.commit()
+    print(f'{"derived tables":20} {"":>12}       {time.perf_counter() - start:7.1f} s')
+
+    db.close()
+    return layout
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', required=True, help='database file to create')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiplier applied to every count below')
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--cards', type=int, default=10_000_000)
+    parser.add_argument('--reviews', type=int, default=50_000_000)
+    parser.add_argument('--attempts', type=int, default=1_000_000)
+    parser.add_argument('--sessions-per-user', type=int, default=50)
+    parser.add_argument('--days', type=int, default=30, help='days of daily_stats per user')
+    parser.add_argument('--no-search-index', dest='search_index', action='store_false',
+                        help='leave the FTS tables empty (much faster for large seeds)')
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        parser.error(f'{args.db} already exists')
+
+    start = time.perf_counter()
+    seed(
+        args.db,
+        users=max(1, int(args.users * args.scale)),
+        cards=max(1, int(args.cards * args.scale)),
+        reviews=int(args.reviews * args.scale),
+        attempts=int(args.attempts * args.scale),
+        sessions_per_user=args.sessions_per_user,
+        days=args.days,
+        search_index=args.search_index,
+    )
+    print(f'\nSeeded {args.db} ({os.path.getsize(args.db) / 1e6:,.0f} MB) in {time.perf_counter() - start:.1f} s')
+
+
+if __name__ == '__main__':
+    main()
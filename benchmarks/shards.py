@@ -0,0 +1,139 @@
+"""Measure write throughput against the number of SQLite shards.
+
+Writer processes each play a set of users and commit review-shaped
+transactions (card state upsert, review insert, daily stats upsert) as fast
+as they can, against 1, 2, 4, ... database files with users spread over
+them the way SHARD_COUNT does (user id modulo shard count). SQLite allows
+one writer per file, so with a single shard every commit queues behind the
+same lock. Reports commits per second and the time a writer spends per
+commit, waiting for the lock included.
+
+More shards only help while writers are waiting on each other rather than
+on the CPU or the disk: on a machine with fewer cores than writers, expect
+throughput to stay roughly flat (try --synchronous FULL, where each commit
+waits for an fsync, to see the lock contention).
+
+Usage:
+    python -m benchmarks.shards [--shards 1 2 4 8] [--writers 8] [--duration 5] [--synchronous NORMAL]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from database.db import SCHEMA_PATH, shard_path
+
+USERS = 64
+CARDS_PER_USER = 200
+
+
+def create(path, shards):
+    with open(SCHEMA_PATH) as f:
+        schema = f.read()
+    for shard in range(shards):
+        db = sqlite3.connect(shard_path(path, shard))
+        db.execute('PRAGMA journal_mode = WAL')
+        db.executescript(schema)
+        users = [u for u in range(1, USERS + 1) if u % shards == shard]
+        db.executemany('INSERT INTO users (id, username) VALUES (?, ?)', [(u, f'user{u}') for u in users])
+        db.executemany('INSERT INTO flashcard_decks (id, user_id, name) VALUES (?, ?, ?)', [(u, u, 'Deck') for u in users])
+        db.executemany(
+            'INSERT INTO flashcards (id, deck_id, front, back) VALUES (?, ?, ?, ?)',
+            [(u * CARDS_PER_USER + c, u, f'front {c}', f'back {c}') for u in users for c in range(CARDS_PER_USER)]
+        )
+        db.commit()
+        db.close()
+
+
+def review(db, rng, user_id):
+    card_id = user_id * CARDS_PER_USER + rng.randrange(CARDS_PER_USER)
+    db.execute('BEGIN IMMEDIATE')
+    db.execute('''
+        INSERT INTO card_states (user_id, flashcard_id, ease_factor, interval_days, repetitions, next_review_date, last_reviewed_at)
+        VALUES (?, ?, 2.5, 1, 1, DATE('now', '+1 day'), CURRENT_TIMESTAMP)
+        ON CONFLICT (user_id, flashcard_id) DO UPDATE SET
+            repetitions = repetitions + 1, interval_days = interval_days * 2, last_reviewed_at = CURRENT_TIMESTAMP
+    ''', (user_id, card_id))
+    db.execute('INSERT INTO flashcard_reviews (flashcard_id, user_id, quality) VALUES (?, ?, 4)', (card_id, user_id))
+    db.execute('''
+        INSERT INTO daily_stats (user_id, date, cards_reviewed) VALUES (?, DATE('now'), 1)
+        ON CONFLICT (user_id, date) DO UPDATE SET cards_reviewed = cards_reviewed + 1
+    ''', (user_id,))
+    db.commit()
+
+
+def writer(path, shards, users, synchronous, start, duration, seed, results):
+    rng = random.Random(seed)
+    connections = {}
+    for shard in range(shards):
+        db = sqlite3.connect(shard_path(path, shard), timeout=30, isolation_level=None)
+        db.execute(f'PRAGMA synchronous = {synchronous}')
+        connections[shard] = db
+    commits = 0
+    spent = 0.0
+    while time.time() < start:
+        time.sleep(0.001)
+    deadline = start + duration
+    while time.time() < deadline:
+        user_id = rng.choice(users)
+        began = time.perf_counter()
+        review(connections[user_id % shards], rng, user_id)
+        spent += time.perf_counter() - began
+        commits += 1
+    results.put((commits, spent))
+
+
+def measure(shards, writers, duration, synchronous):
+    directory = tempfile.mkdtemp(prefix='shards_bench_')
+    path = os.path.join(directory, 'bench.db')
+    create(path, shards)
+
+    users = list(range(1, USERS + 1))
+    results = multiprocessing.Queue()
+    start = time.time() + 0.5
+    processes = [
+        multiprocessing.Process(
+            target=writer,
+            args=(path, shards, users[w::writers], synchronous, start, duration, w, results)
+        )
+        for w in range(writers)
+    ]
+    for process in processes:
+        process.start()
+    totals = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    commits = sum(c for c, _ in totals)
+    seconds_per_commit = sum(w for _, w in totals) / commits if commits else 0.0
+    for shard in range(shards):
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(shard_path(path, shard) + suffix):
+                os.remove(shard_path(path, shard) + suffix)
+    os.rmdir(directory)
+    return commits / duration, seconds_per_commit * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--shards', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--writers', type=int, default=8, help='writer processes')
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per shard count')
+    parser.add_argument('--synchronous', default='NORMAL', choices=['OFF', 'NORMAL', 'FULL'],
+                        help='PRAGMA synchronous for the writers (the app uses NORMAL)')
+    args = parser.parse_args()
+
+    print(f'{args.writers} writers, {USERS} users, synchronous={args.synchronous}, '
+          f'{os.cpu_count()} CPUs, SQLite {sqlite3.sqlite_version}')
+    print(f'{"shards":>6} {"commits/s":>10} {"ms/commit":>10} {"speedup":>8}')
+    baseline = None
+    for shards in args.shards:
+        rate, latency = measure(shards, args.writers, args.duration, args.synchronous)
+        baseline = baseline or rate
+        print(f'{shards:>6} {rate:>10.0f} {latency:>10.2f} {rate / baseline:>7.2f}x')
+
+
+if __name__ == '__main__':
+    main()
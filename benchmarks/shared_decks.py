@@ -0,0 +1,79 @@
+"""Compare copying a class deck per student with subscribing to one shared deck.
+
+Usage:
+    python -m benchmarks.shared_decks [--students 300] [--cards 2000] [--reviews 50]
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import date
+from services import decks as deck_service
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'schema.sql')
+
+
+def create_db(path, students, cards):
+    db = sqlite3.connect(path)
+    db.row_factory = sqlite3.Row
+    with open(SCHEMA_PATH) as f:
+        db.executescript(f.read())
+    db.executemany('INSERT INTO users (id, username) VALUES (?, ?)',
+                   [(u, f'user{u}') for u in range(1, students + 2)])
+    db.execute("INSERT INTO flashcard_decks (id, user_id, name, is_public) VALUES (1, 1, 'Class deck', 1)")
+    db.executemany('INSERT INTO flashcards (deck_id, front, back) VALUES (1, ?, ?)',
+                   [(f'Term {i}', f'Definition of term {i}, with a sentence of context.') for i in range(cards)])
+    db.commit()
+    return db
+
+
+def import_by_copy(db, students):
+    for user_id in range(2, students + 2):
+        deck_id = db.execute("INSERT INTO flashcard_decks (user_id, name) VALUES (?, 'Class deck')",
+                             (user_id,)).lastrowid
+        db.execute('INSERT INTO flashcards (deck_id, front, back) SELECT ?, front, back FROM flashcards WHERE deck_id = 1',
+                   (deck_id,))
+    db.commit()
+
+
+def import_by_subscription(db, students):
+    db.executemany('INSERT INTO deck_subscriptions (user_id, deck_id) VALUES (?, 1)',
+                   [(u,) for u in range(2, students + 2)])
+    db.commit()
+
+
+def review_some(db, students, reviews):
+    today = date.today().isoformat()
+    for user_id in range(2, students + 2):
+        for card in deck_service.due_cards(db, 1, user_id, today)[:reviews]:
+            deck_service.save_state(db, card['id'], user_id, 2.6, 1, 1, '2099-01-01')
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--students', type=int, default=300)
+    parser.add_argument('--cards', type=int, default=2000)
+    parser.add_argument('--reviews', type=int, default=50, help='cards each student reviews after import')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, importer in (('copy per student', import_by_copy), ('shared subscription', import_by_subscription)):
+            path = os.path.join(tmp, label.replace(' ', '_') + '.db')
+            db = create_db(path, args.students, args.cards)
+            start = time.perf_counter()
+            importer(db, args.students)
+            import_time = time.perf_counter() - start
+            if importer is import_by_subscription:
+                review_some(db, args.students, args.reviews)
+            db.execute('VACUUM')
+            rows = db.execute('SELECT COUNT(*) FROM flashcards').fetchone()[0]
+            states = db.execute('SELECT COUNT(*) FROM card_states').fetchone()[0]
+            db.close()
+            print(f'{label:<22} import {import_time * 1000:>9.1f} ms  flashcards {rows:>9,}  '
+                  f'card_states {states:>7,}  file {os.path.getsize(path) / 1e6:>7.1f} MB')
+
+
+if __name__ == '__main__':
+    main()
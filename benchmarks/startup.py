@@ -0,0 +1,98 @@
+"""Check cold start time against a budget.
+
+Starts a fresh interpreter that imports the app and calls create_app() on an
+existing database, the way every worker spawn and test run does, and reports
+the median wall time over several runs. The slowest top-level packages are
+taken from `python -X importtime`. Exits with status 1 if the median exceeds
+--budget-ms, or if a module that should only load on first use (the PDF,
+HTML and LLM client libraries) was imported at startup.
+
+Usage:
+    python -m benchmarks.startup [--runs 10] [--budget-ms 300]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only needed by syllabus parsing and generation
+DEFERRED = ('requests', 'bs4', 'PyPDF2', 'groq', 'httpx')
+
+PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+create_app()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'create_ms': (time.perf_counter() - imported) * 1000,
+    'deferred': sorted(m for m in %r if m in sys.modules),
+}))
+''' % (DEFERRED,)
+
+
+def start_once(env):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', PROBE], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    wall_ms = (time.perf_counter() - start) * 1000
+    return wall_ms, json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def slowest_packages(importtime, limit=10):
+    """Import time per top-level package (its modules' self times), from -X importtime output"""
+    totals = {}
+    for line in importtime.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        own, _, name = line[len('import time:'):].split('|')
+        package = name.strip().split('.')[0]
+        totals[package] = totals.get(package, 0) + int(own) / 1000
+    return sorted(totals.items(), key=lambda item: -item[1])[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--budget-ms', type=float, default=300.0, help='maximum median wall time')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ, DATABASE=os.path.join(workdir, 'startup.db'), LLM_PROVIDER='mock')
+        env.pop('TEMPLATE_CACHE_DIR', None)
+        # The first start creates the database; later ones find it up to date
+        start_once(env)
+        runs = [start_once(env) for _ in range(args.runs)]
+
+    wall = statistics.median(r[0] for r in runs)
+    imported = statistics.median(r[1]['import_ms'] for r in runs)
+    created = statistics.median(r[1]['create_ms'] for r in runs)
+    deferred = sorted({m for r in runs for m in r[1]['deferred']})
+
+    print(f'cold start (median of {args.runs}): {wall:.0f} ms wall, '
+          f'{imported:.0f} ms importing app, {created:.0f} ms in create_app()\n')
+    print('slowest top-level imports:')
+    for package, ms in slowest_packages(runs[-1][2]):
+        print(f'  {package:24} {ms:7.1f} ms')
+
+    failures = []
+    if wall > args.budget_ms:
+        failures.append(f'median cold start {wall:.0f} ms exceeds the {args.budget_ms:.0f} ms budget')
+    if deferred:
+        failures.append(f'imported at startup but should load on first use: {", ".join(deferred)}')
+    for failure in failures:
+        print(f'\nFAIL: {failure}')
+    if failures:
+        sys.exit(1)
+    print(f'\nOK: within the {args.budget_ms:.0f} ms budget')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,313 @@
+"""Replay scripted user workloads and report latency per endpoint.
+
+Each client logs in as a random seeded user and loops over weighted scenarios
+until the duration is up:
+
+    dashboard   the dashboard page and the daily stats API
+    study       fetch a deck's due cards, then review a few of them
+    quiz        load a quiz, then submit answers
+    pomodoro    read the timer settings, then log a focus session
+    browse      the deck list, a deck's cards and the public decks page
+
+Requests go through the Flask test client on a copy of the seeded database,
+or to a running server with --url. Throughput and p50/p95/p99 per endpoint
+are printed and written as JSON, so runs can be compared with --compare.
+
+Usage:
+    python -m benchmarks.seed --db /tmp/bench.db --scale 0.01
+    python -m benchmarks.workload --db /tmp/bench.db [--clients 16] [--duration 30]
+    python -m benchmarks.workload --db /tmp/bench.db --compare benchmarks/results/<earlier>.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from benchmarks.seed import PASSWORD
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+# Relative frequency of each scenario in the mix
+WEIGHTS = {'dashboard': 3, 'study': 4, 'quiz': 1, 'pomodoro': 2, 'browse': 2}
+REVIEWS_PER_STUDY = 5
+PERCENTILES = (50, 95, 99)
+
+
+class Fixtures:
+    """Ids each scenario needs, read once from the seeded database"""
+
+    def __init__(self, path):
+        db = sqlite3.connect(f'file:{path}?mode=ro', uri=True, check_same_thread=False)
+        self.users = db.execute('SELECT MAX(id) FROM users WHERE is_guest = 0').fetchone()[0]
+        self._db = db
+        self._lock = threading.Lock()
+
+    def for_user(self, user_id):
+        with self._lock:
+            decks = [r[0] for r in self._db.execute('SELECT id FROM flashcard_decks WHERE user_id = ?', (user_id,))]
+            quizzes = {}
+            for quiz_id, question_id, answer in self._db.execute('''
+                SELECT q.id, qq.id, qq.correct_answer
+                FROM quizzes q JOIN quiz_questions qq ON qq.quiz_id = q.id
+                WHERE q.user_id = ?
+            ''', (user_id,)):
+                quizzes.setdefault(quiz_id, []).append((question_id, answer))
+        return decks, quizzes
+
+
+class TestClientTransport:
+    """Requests through app.test_client(); logs in by writing the session"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def login(self, user_id):
+        with self.client.session_transaction() as sess:
+            sess['user_id'] = user_id
+            sess['username'] = f'user{user_id}'
+            sess['is_guest'] = False
+
+    def request(self, method, path, json_body=None):
+        response = self.client.open(path, method=method, json=json_body)
+        response.close()
+        return response.status_code, response
+
+    @staticmethod
+    def json(response):
+        return response.get_json(silent=True)
+
+
+class HTTPTransport:
+    """Requests to a running server; logs in through the login form"""
+
+    def __init__(self, base):
+        import requests
+        self.errors = requests.ConnectionError
+        self.base = base.rstrip('/')
+        self.session = requests.Session()
+
+    def login(self, user_id):
+        self.session.post(f'{self.base}/login', data={'username': f'user{user_id}', 'password': PASSWORD},
+                          allow_redirects=False)
+
+    def request(self, method, path, json_body=None):
+        try:
+            response = self.session.request(method, self.base + path, json=json_body, allow_redirects=False)
+        except self.errors:
+            return 'error', None
+        return response.status_code, response
+
+    @staticmethod
+    def json(response):
+        return response.json() if response is not None and 'json' in response.headers.get('Content-Type', '') else None
+
+
+class Recorder:
+    """Latencies and status codes per endpoint, shared by all clients"""
+
+    def __init__(self):
+        self.samples = {}
+        self.statuses = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, seconds, status):
+        with self._lock:
+            self.samples.setdefault(endpoint, []).append(seconds)
+            counts = self.statuses.setdefault(endpoint, {})
+            counts[status] = counts.get(status, 0) + 1
+
+
+def timed(transport, recorder, endpoint, method, path, json_body=None):
+    start = time.perf_counter()
+    status, response = transport.request(method, path, json_body)
+    recorder.record(endpoint, time.perf_counter() - start, status)
+    return response
+
+
+def dashboard(t, rec, rng, decks, quizzes):
+    timed(t, rec, 'GET /dashboard', 'GET', '/dashboard')
+    timed(t, rec, 'GET /api/stats/daily', 'GET', '/api/stats/daily')
+
+
+def study(t, rec, rng, decks, quizzes):
+    deck_id = rng.choice(decks)
+    response = timed(t, rec, 'GET /flashcard/api/deck/<id>/due', 'GET', f'/flashcard/api/deck/{deck_id}/due')
+    cards = t.json(response) or []
+    for card in rng.sample(cards, min(REVIEWS_PER_STUDY, len(cards))):
+        timed(t, rec, 'POST /flashcard/api/card/<id>/review', 'POST', f'/flashcard/api/card/{card["id"]}/review',
+              {'quality': rng.randint(2, 5)})
+
+
+def quiz(t, rec, rng, decks, quizzes):
+    quiz_id = rng.choice(list(quizzes))
+    timed(t, rec, 'GET /quiz/api/quiz/<id>', 'GET', f'/quiz/api/quiz/{quiz_id}')
+    answers = {str(q): (a if rng.random() < 0.7 else '') for q, a in quizzes[quiz_id]}
+    timed(t, rec, 'POST /quiz/api/quiz/<id>/submit', 'POST', f'/quiz/api/quiz/{quiz_id}/submit',
+          {'answers': answers, 'time_taken': rng.randint(30, 600)})
+
+
+def pomodoro(t, rec, rng, decks, quizzes):
+    timed(t, rec, 'GET /pomodoro/api/settings', 'GET', '/pomodoro/api/settings')
+    timed(t, rec, 'POST /pomodoro/api/session', 'POST', '/pomodoro/api/session',
+          {'session_type': 'focus', 'duration_minutes': 25})
+
+
+def browse(t, rec, rng, decks, quizzes):
+    timed(t, rec, 'GET /flashcard/', 'GET', '/flashcard/')
+    timed(t, rec, 'GET /flashcard/api/deck/<id>', 'GET', f'/flashcard/api/deck/{rng.choice(decks)}')
+    timed(t, rec, 'GET /flashcard/public', 'GET', '/flashcard/public')
+
+
+SCENARIOS = {'dashboard': dashboard, 'study': study, 'quiz': quiz, 'pomodoro': pomodoro, 'browse': browse}
+
+
+def client_loop(make_transport, fixtures, recorder, scenarios, deadline, seed):
+    rng = random.Random(seed)
+    transport = make_transport()
+    user_id = rng.randint(1, fixtures.users)
+    transport.login(user_id)
+    decks, quizzes = fixtures.for_user(user_id)
+
+    names = [s for s in scenarios if (s != 'study' and s != 'browse' or decks) and (s != 'quiz' or quizzes)]
+    weights = [WEIGHTS[s] for s in names]
+    while names and time.monotonic() < deadline:
+        SCENARIOS[rng.choices(names, weights)[0]](transport, recorder, rng, decks, quizzes)
+
+
+def run(make_transport, fixtures, scenarios, clients, duration):
+    """Drive `clients` concurrent users for `duration` seconds and summarize"""
+    recorder = Recorder()
+    deadline = time.monotonic() + duration
+    threads = [threading.Thread(target=client_loop, args=(make_transport, fixtures, recorder, scenarios, deadline, i))
+               for i in range(clients)]
+    started = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return summarize(recorder, time.monotonic() - started)
+
+
+def percentile(ordered, p):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def summarize(recorder, elapsed):
+    endpoints = {}
+    for endpoint, samples in sorted(recorder.samples.items()):
+        ordered = sorted(samples)
+        endpoints[endpoint] = {
+            'requests': len(ordered),
+            'throughput': len(ordered) / elapsed,
+            **{f'p{p}_ms': percentile(ordered, p) * 1000 for p in PERCENTILES},
+            'statuses': {str(k): v for k, v in sorted(recorder.statuses[endpoint].items(), key=str)},
+        }
+    total = sum(e['requests'] for e in endpoints.values())
+    return {'requests': total, 'throughput': total / elapsed, 'endpoints': endpoints}
+
+
+def report(summary, baseline=None):
+    def delta(endpoint, key):
+        if not baseline or endpoint not in baseline['endpoints']:
+            return ''
+        before = baseline['endpoints'][endpoint][key]
+        return f' ({(summary["endpoints"][endpoint][key] - before) / before * 100:+.0f}%)' if before else ''
+
+    print(f'{"endpoint":40} {"reqs":>7} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}  statuses')
+    for endpoint, e in summary['endpoints'].items():
+        print(f'{endpoint:40} {e["requests"]:7} {e["throughput"]:8.1f} {e["p50_ms"]:8.1f} {e["p95_ms"]:8.1f} '
+              f'{e["p99_ms"]:8.1f}  {e["statuses"]}')
+        if baseline and endpoint in baseline['endpoints']:
+            print(f'{"  vs baseline":40} {"":7} {delta(endpoint, "throughput"):>8} {delta(endpoint, "p50_ms"):>8} '
+                  f'{delta(endpoint, "p95_ms"):>8} {delta(endpoint, "p99_ms"):>8}')
+    print(f'\n{summary["requests"]} requests, {summary["throughput"]:.1f} req/s overall', end='')
+    if baseline:
+        print(f' (baseline {baseline["throughput"]:.1f} req/s)', end='')
+    print()
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(RESULTS_DIR)).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def make_app(path):
+    from config import Config
+    Config.DATABASE = path
+    from app import create_app
+    app = create_app()
+    app.config['PASSWORD_HASH_WORKERS'] = 0
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', required=True, help='database created by benchmarks.seed')
+    parser.add_argument('--url', help='base URL of a running server seeded from --db; default is the test client')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='comma-separated subset to run')
+    parser.add_argument('--in-place', action='store_true', help='write to --db itself instead of a copy')
+    parser.add_argument('--out', help='results file (default benchmarks/results/<timestamp>.json)')
+    parser.add_argument('--compare', help='earlier results file to show deltas against')
+    args = parser.parse_args()
+
+    scenarios = args.scenarios.split(',')
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f'unknown scenarios: {", ".join(sorted(unknown))}')
+
+    os.environ.setdefault('LLM_PROVIDER', 'mock')
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    workdir = None
+    path = args.db
+    if args.url:
+        make_transport = lambda: HTTPTransport(args.url)
+    else:
+        if not args.in_place:
+            workdir = tempfile.mkdtemp()
+            path = os.path.join(workdir, os.path.basename(args.db))
+            shutil.copyfile(args.db, path)
+        app = make_app(path)
+        make_transport = lambda: TestClientTransport(app)
+
+    summary = run(make_transport, Fixtures(path), scenarios, args.clients, args.duration)
+    if workdir:
+        shutil.rmtree(workdir)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['summary']
+    report(summary, baseline)
+
+    started_at = datetime.now(timezone.utc)
+    out = args.out or os.path.join(RESULTS_DIR, started_at.strftime('%Y%m%dT%H%M%SZ') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump({
+            'started_at': started_at.isoformat(),
+            'commit': git_commit(),
+            'target': args.url or 'test-client',
+            'python': platform.python_version(),
+            'cpus': os.cpu_count(),
+            'args': {'db': args.db, 'clients': args.clients, 'duration': args.duration, 'scenarios': scenarios},
+            'summary': summary,
+        }, f, indent=2)
+    print(f'Results written to {out}')
+
+
+if __name__ == '__main__':
+    main()
@@ -6,5 +6,46 @@ load_dotenv()
 
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'myzenbrain-secret-key-change-in-production'
-    DATABASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'myzenbrain.db')
+    DATABASE = os.environ.get('DATABASE') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'myzenbrain.db')
     GROQ_API_KEY = os.environ.get('GROQ_API_KEY')
+    LLM_PROVIDER = os.environ.get('LLM_PROVIDER', 'groq')  # 'groq' or 'mock'
+    GENERATION_MODE = os.environ.get('GENERATION_MODE', 'combined')  # 'combined' or 'separate'
+    # Seconds between checks for cache entries invalidated by other workers; 0 disables
+    CACHE_SYNC_INTERVAL = float(os.environ.get('CACHE_SYNC_INTERVAL', 1.0))
+    # Guest accounts expire after this many hours without activity
+    GUEST_TTL_HOURS = float(os.environ.get('GUEST_TTL_HOURS', 168))
+    # Werkzeug hash method and cost, e.g. 'scrypt:32768:8:1' or 'pbkdf2:sha256:600000'.
+    # Stored hashes made with other parameters are upgraded on the next login.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    # Processes that hash passwords off the request workers; 0 hashes inline
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    # Request metrics in Prometheus format at /metrics. With several worker
+    # processes, point METRICS_DIR at a directory they share.
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '').lower() in ('1', 'true', 'yes')
+    METRICS_DIR = os.environ.get('METRICS_DIR')
+    # gzip/brotli for responses of at least COMPRESS_MIN_BYTES; turn off if a proxy compresses
+    COMPRESS_RESPONSES = os.environ.get('COMPRESS_RESPONSES', '1').lower() in ('1', 'true', 'yes')
+    COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', 1024))
+    # Read-only copy that heavy reports query, refreshed by `flask data snapshot`;
+    # unset, reports read the live database. Older snapshots are not used.
+    SNAPSHOT_PATH = os.environ.get('SNAPSHOT_PATH')
+    SNAPSHOT_MAX_AGE = float(os.environ.get('SNAPSHOT_MAX_AGE', 300))
+    # New cards introduced per deck per day by the study session planner
+    STUDY_NEW_CARDS_PER_DAY = int(os.environ.get('STUDY_NEW_CARDS_PER_DAY', 20))
+    # Expensive endpoints (syllabus parsing and generation) per worker process: at
+    # most ADMISSION_SLOTS run and ADMISSION_QUEUE wait, at most ADMISSION_PER_USER
+    # of them from one user, for up to ADMISSION_QUEUE_TIMEOUT seconds; the rest
+    # get a 429. Keep slots + queue below WEB_THREADS. 0 slots turns this off.
+    ADMISSION_SLOTS = int(os.environ.get('ADMISSION_SLOTS', 1))
+    ADMISSION_QUEUE = int(os.environ.get('ADMISSION_QUEUE', 1))
+    ADMISSION_PER_USER = int(os.environ.get('ADMISSION_PER_USER', 1))
+    ADMISSION_QUEUE_TIMEOUT = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', 15))
+    # Database files users are spread over; shard n > 0 lives next to DATABASE as
+    # <name>.shard<n>.db, and DATABASE keeps accounts and the routing table
+    SHARD_COUNT = max(1, int(os.environ.get('SHARD_COUNT', 1)))
+    # Where `flask data backup` writes; unset, a backups/ directory next to the database
+    BACKUP_DIR = os.environ.get('BACKUP_DIR')
+    # Output of `flask assets build`; scripts and stylesheets are served from here once it exists
+    ASSETS_DIR = os.environ.get('ASSETS_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'dist')
+    # Directory for compiled Jinja templates, shared across restarts; unset keeps them in memory only
+    TEMPLATE_CACHE_DIR = os.environ.get('TEMPLATE_CACHE_DIR')
@@ -1,27 +1,469 @@
+import itertools
+import re
 import sqlite3
 import os
-from flask import g, current_app
+import time
+from contextlib import contextmanager
+from functools import wraps
+from flask import g, current_app, has_app_context, has_request_context, jsonify, session
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that adds the time spent in SQLite to g.db_seconds"""
+
+    def _timed(self, method, *args):
+        start = time.perf_counter()
+        try:
+            return method(self, *args)
+        finally:
+            g.db_seconds = g.get('db_seconds', 0.0) + time.perf_counter() - start
+
+    def execute(self, *args):
+        return self._timed(sqlite3.Cursor.execute, *args)
+
+    def executemany(self, *args):
+        return self._timed(sqlite3.Cursor.executemany, *args)
+
+    def executescript(self, *args):
+        return self._timed(sqlite3.Cursor.executescript, *args)
+
+    def fetchone(self):
+        return self._timed(sqlite3.Cursor.fetchone)
+
+    def fetchmany(self, *args):
+        return self._timed(sqlite3.Cursor.fetchmany, *args)
+
+    def fetchall(self):
+        return self._timed(sqlite3.Cursor.fetchall)
+
+class Connection(sqlite3.Connection):
+    """sqlite3 connection that remembers the file it was opened on"""
+    path = None
+
+class TimedConnection(Connection):
+    """Connection whose cursors, and commits, are timed for the metrics"""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    # The built-in shortcuts open a plain sqlite3.Cursor, bypassing cursor()
+    def execute(self, *args):
+        return self.cursor().execute(*args)
+
+    def executemany(self, *args):
+        return self.cursor().executemany(*args)
+
+    def executescript(self, *args):
+        return self.cursor().executescript(*args)
+
+    def commit(self):
+        start = time.perf_counter()
+        try:
+            super().commit()
+        finally:
+            g.db_seconds = g.get('db_seconds', 0.0) + time.perf_counter() - start
+
+class ShardMoving(Exception):
+    """The current user's data is being moved to another shard"""
+
+def connect(path):
+    db = sqlite3.connect(
+        path,
+        detect_types=sqlite3.PARSE_DECLTYPES,
+        factory=TimedConnection if current_app.config['METRICS_ENABLED'] else Connection
+    )
+    db.path = path
+    db.row_factory = sqlite3.Row
+    # Off by default in SQLite; without it ON DELETE CASCADE never fires
+    db.execute('PRAGMA foreign_keys = ON')
+    # With WAL, commits skip the fsync; a power cut can lose the last
+    # few transactions but never corrupts the database
+    db.execute('PRAGMA synchronous = NORMAL')
+    return db
+
+def shard_path(path, shard):
+    """File of `shard` for a database (or snapshot) path; shard 0 is the path itself"""
+    if not shard:
+        return path
+    root, ext = os.path.splitext(path)
+    return f'{root}.shard{shard}{ext}'
+
+def connect_shard(shard):
+    """New connection to a shard's file; the caller closes it"""
+    return connect(shard_path(current_app.config['DATABASE'], shard))
+
+def shard_label(shard):
+    """Prefix for admin command output about one shard; empty when unsharded"""
+    return f'shard {shard}: ' if current_app.config['SHARD_COUNT'] > 1 else ''
+
+def user_shard(db, user_id):
+    """Shard holding a user's data, from the main database's routing table"""
+    row = db.execute('SELECT shard, moving FROM user_shards WHERE user_id = ?', (user_id,)).fetchone()
+    if row is None:
+        return 0
+    if row['moving']:
+        raise ShardMoving()
+    return row['shard']
+
+def _forget_forked():
+    # A connection must not be used, or even closed, in a process forked
+    # after it was opened: the child would share and release the parent's
+    # locks. Leave it for the parent and open a fresh one.
+    if 'db_pid' in g and g.db_pid != os.getpid():
+        g.pop('db', None)
+        g.pop('directory_db', None)
+        g.pop('db_pid')
+    g.db_pid = os.getpid()
+
+def get_directory_db():
+    """Connection to the main database, which holds accounts and the shard routing table"""
+    _forget_forked()
+    if 'directory_db' not in g:
+        g.directory_db = connect(current_app.config['DATABASE'])
+    return g.directory_db
 
 def get_db():
+    """Connection to the database holding the current user's data.
+
+    With SHARD_COUNT > 1 that is the shard the user is routed to (raising
+    ShardMoving while a move is under way); without a logged-in user, or
+    unsharded, it is the main database.
+    """
+    _forget_forked()
     if 'db' not in g:
-        g.db = sqlite3.connect(
-            current_app.config['DATABASE'],
-            detect_types=sqlite3.PARSE_DECLTYPES
-        )
-        g.db.row_factory = sqlite3.Row
+        g.shard = 0
+        if current_app.config['SHARD_COUNT'] > 1 and has_request_context() and 'user_id' in session:
+            g.shard = user_shard(get_directory_db(), session['user_id'])
+        if g.shard:
+            g.db = connect_shard(g.shard)
+        else:
+            g.db = get_directory_db()
     return g.db
 
+def each_shard():
+    """Yield (shard, connection) for every shard, for admin commands that fan out.
+
+    Shard 0 is the main database; the others are opened one at a time.
+    """
+    yield 0, get_directory_db()
+    for shard in range(1, current_app.config['SHARD_COUNT']):
+        db = connect_shard(shard)
+        try:
+            yield shard, db
+        finally:
+            db.close()
+
 def close_db(e=None):
     db = g.pop('db', None)
-    if db is not None:
-        db.close()
+    directory = g.pop('directory_db', None)
+    if g.pop('db_pid', None) == os.getpid():
+        for connection in {id(c): c for c in (db, directory) if c is not None}.values():
+            connection.close()
+
+def after_fork():
+    """Forget transaction state inherited from the process that forked us"""
+    _depths.clear()
+
+# Open transaction() blocks per connection; nested blocks become savepoints
+_depths = {}
+_savepoint_ids = itertools.count()
+
+@contextmanager
+def transaction(db=None):
+    """Run a block of writes as one unit of work.
+
+    The outermost block starts with BEGIN IMMEDIATE, taking the write lock
+    up front rather than failing to upgrade a read lock halfway through,
+    and commits once at the end. Nested blocks become savepoints, so a
+    failing step can be rolled back without losing the rest. An exception
+    rolls back the block it leaves and propagates.
+    """
+    db = db or get_db()
+    key = id(db)
+    depth = _depths.get(key, 0)
+    _depths[key] = depth + 1
+    try:
+        if depth:
+            name = f'sp{next(_savepoint_ids)}'
+            db.execute(f'SAVEPOINT {name}')
+            try:
+                yield db
+            except BaseException:
+                db.execute(f'ROLLBACK TO {name}')
+                db.execute(f'RELEASE {name}')
+                raise
+            db.execute(f'RELEASE {name}')
+        else:
+            if not db.in_transaction:
+                db.execute('BEGIN IMMEDIATE')
+            changes = db.total_changes
+            try:
+                yield db
+            except BaseException:
+                db.rollback()
+                raise
+            db.commit()
+            if db.total_changes != changes and has_app_context():
+                g.db_commits = g.get('db_commits', 0) + 1
+    finally:
+        if depth:
+            _depths[key] = depth
+        else:
+            del _depths[key]
+
+def transactional(f):
+    """Run a view inside transaction() so all its writes commit together"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        with transaction():
+            return f(*args, **kwargs)
+    return decorated_function
+
+def count_commits(response):
+    # Commits that wrote something during this request, for spotting
+    # handlers that still commit piecemeal
+    if current_app.debug or current_app.testing:
+        response.headers['X-DB-Commits'] = str(g.get('db_commits', 0))
+    return response
+
+# Upgrades for databases created from an older schema.sql, applied in order
+# and tracked with PRAGMA user_version. schema.sql always describes the latest
+# schema, so fresh databases skip straight to the last version.
+MIGRATIONS = [
+    # 1: syllabus text moves to content_blobs
+    '''
+    ALTER TABLE syllabi ADD COLUMN content_hash TEXT REFERENCES content_blobs(hash);
+    DROP TRIGGER IF EXISTS syllabi_fts_update;
+    ''',
+    # 2: SM-2 state moves from flashcards to per-user card_states
+    '''
+    ALTER TABLE flashcard_decks ADD COLUMN is_public BOOLEAN DEFAULT 0;
+    CREATE TABLE card_states (
+        user_id INTEGER NOT NULL,
+        flashcard_id INTEGER NOT NULL,
+        ease_factor REAL NOT NULL DEFAULT 2.5,
+        interval_days INTEGER NOT NULL DEFAULT 1,
+        repetitions INTEGER NOT NULL DEFAULT 0,
+        next_review_date DATE NOT NULL,
+        last_reviewed_at TIMESTAMP,
+        PRIMARY KEY (user_id, flashcard_id),
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+        FOREIGN KEY (flashcard_id) REFERENCES flashcards(id) ON DELETE CASCADE
+    ) WITHOUT ROWID;
+    INSERT INTO card_states (user_id, flashcard_id, ease_factor, interval_days, repetitions, next_review_date, last_reviewed_at)
+    SELECT d.user_id, f.id, f.ease_factor, f.interval_days, f.repetitions, f.next_review_date, f.last_reviewed_at
+    FROM flashcards f JOIN flashcard_decks d ON d.id = f.deck_id
+    WHERE f.last_reviewed_at IS NOT NULL;
+    ALTER TABLE flashcards DROP COLUMN ease_factor;
+    ALTER TABLE flashcards DROP COLUMN interval_days;
+    ALTER TABLE flashcards DROP COLUMN repetitions;
+    ALTER TABLE flashcards DROP COLUMN next_review_date;
+    ALTER TABLE flashcards DROP COLUMN last_reviewed_at;
+    ''',
+    # 3: idempotency keys for batched pomodoro session sync
+    '''
+    ALTER TABLE pomodoro_sessions ADD COLUMN client_event_id TEXT;
+    ''',
+    # 4: local day per session and day/week/month rollups
+    '''
+    ALTER TABLE pomodoro_sessions ADD COLUMN local_date DATE;
+    UPDATE pomodoro_sessions SET local_date = DATE(completed_at);
+    CREATE TABLE session_rollups (
+        user_id INTEGER NOT NULL,
+        granularity TEXT NOT NULL CHECK(granularity IN ('day', 'week', 'month')),
+        period_start DATE NOT NULL,
+        focus_minutes INTEGER NOT NULL DEFAULT 0,
+        focus_sessions INTEGER NOT NULL DEFAULT 0,
+        break_sessions INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, granularity, period_start),
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    ) WITHOUT ROWID;
+    INSERT INTO session_rollups
+    SELECT user_id, granularity, period_start,
+           SUM(CASE WHEN session_type = 'focus' THEN duration_minutes ELSE 0 END),
+           SUM(session_type = 'focus'), SUM(session_type != 'focus')
+    FROM (
+        SELECT user_id, session_type, duration_minutes, 'day' as granularity, local_date as period_start
+        FROM pomodoro_sessions
+        UNION ALL
+        SELECT user_id, session_type, duration_minutes, 'week', DATE(local_date, 'weekday 0', '-6 days')
+        FROM pomodoro_sessions
+        UNION ALL
+        SELECT user_id, session_type, duration_minutes, 'month', DATE(local_date, 'start of month')
+        FROM pomodoro_sessions
+    )
+    GROUP BY user_id, granularity, period_start;
+    ''',
+    # 5: guest expiry; existing guests get a week before they can be reaped
+    '''
+    ALTER TABLE users ADD COLUMN expires_at TIMESTAMP;
+    UPDATE users SET expires_at = DATETIME('now', '+7 days') WHERE is_guest = 1;
+    ''',
+    # 6: per-deck statistics; reviews logged before this one never count
+    # towards retention, as their interval is unknown
+    '''
+    ALTER TABLE flashcard_reviews ADD COLUMN last_interval INTEGER;
+    -- Only ever created by schema.sql, which runs after the migrations
+    CREATE TABLE IF NOT EXISTS deck_subscriptions (
+        user_id INTEGER NOT NULL,
+        deck_id INTEGER NOT NULL,
+        subscribed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (user_id, deck_id),
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+        FOREIGN KEY (deck_id) REFERENCES flashcard_decks(id) ON DELETE CASCADE
+    ) WITHOUT ROWID;
+    CREATE TABLE deck_stats (
+        deck_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        cards INTEGER NOT NULL DEFAULT 0,
+        learning INTEGER NOT NULL DEFAULT 0,
+        young INTEGER NOT NULL DEFAULT 0,
+        mature INTEGER NOT NULL DEFAULT 0,
+        ease_sum REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (deck_id, user_id),
+        FOREIGN KEY (deck_id) REFERENCES flashcard_decks(id) ON DELETE CASCADE,
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    ) WITHOUT ROWID;
+    CREATE TABLE deck_due_dates (
+        deck_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        due_date DATE NOT NULL,
+        cards INTEGER NOT NULL,
+        PRIMARY KEY (deck_id, user_id, due_date),
+        FOREIGN KEY (deck_id) REFERENCES flashcard_decks(id) ON DELETE CASCADE,
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    ) WITHOUT ROWID;
+    CREATE TABLE deck_review_days (
+        deck_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        day DATE NOT NULL,
+        reviews INTEGER NOT NULL DEFAULT 0,
+        recalls INTEGER NOT NULL DEFAULT 0,
+        recalls_passed INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (deck_id, user_id, day),
+        FOREIGN KEY (deck_id) REFERENCES flashcard_decks(id) ON DELETE CASCADE,
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    ) WITHOUT ROWID;
+    INSERT INTO deck_stats
+    SELECT m.deck_id, m.user_id, COUNT(f.id),
+           COALESCE(SUM(s.repetitions = 0), 0),
+           COALESCE(SUM(s.repetitions > 0 AND s.interval_days < 21), 0),
+           COALESCE(SUM(s.repetitions > 0 AND s.interval_days >= 21), 0),
+           COALESCE(SUM(s.ease_factor), 0)
+    FROM (
+        SELECT id as deck_id, user_id FROM flashcard_decks
+        UNION SELECT deck_id, user_id FROM deck_subscriptions
+    ) m
+    LEFT JOIN flashcards f ON f.deck_id = m.deck_id
+    LEFT JOIN card_states s ON s.flashcard_id = f.id AND s.user_id = m.user_id
+    GROUP BY m.deck_id, m.user_id;
+    INSERT INTO deck_due_dates
+    SELECT f.deck_id, s.user_id, s.next_review_date, COUNT(*)
+    FROM card_states s JOIN flashcards f ON f.id = s.flashcard_id
+    GROUP BY f.deck_id, s.user_id, s.next_review_date;
+    INSERT INTO deck_review_days
+    SELECT f.deck_id, r.user_id, DATE(r.reviewed_at), COUNT(*), 0, 0
+    FROM flashcard_reviews r JOIN flashcards f ON f.id = r.flashcard_id
+    GROUP BY f.deck_id, r.user_id, DATE(r.reviewed_at);
+    ''',
+    # 7: recalls are flagged on the review rather than inferred from
+    # last_interval, which also counted a session's relearning steps; the
+    # log is backfilled by whether the previous review was on an earlier day
+    '''
+    DROP TRIGGER IF EXISTS flashcard_reviews_stats_insert;
+    DROP TRIGGER IF EXISTS flashcard_reviews_stats_delete;
+    ALTER TABLE flashcard_reviews ADD COLUMN is_recall BOOLEAN NOT NULL DEFAULT 0;
+    ALTER TABLE flashcard_reviews DROP COLUMN last_interval;
+    UPDATE flashcard_reviews SET is_recall = 1 WHERE id IN (
+        SELECT id FROM (
+            SELECT id, reviewed_at,
+                   LAG(reviewed_at) OVER (PARTITION BY flashcard_id, user_id ORDER BY reviewed_at, id) as previous
+            FROM flashcard_reviews
+        ) WHERE DATE(previous, 'localtime') < DATE(reviewed_at, 'localtime')
+    );
+    DELETE FROM deck_review_days;
+    INSERT INTO deck_review_days
+    SELECT f.deck_id, r.user_id, DATE(r.reviewed_at), COUNT(*),
+           SUM(r.is_recall), SUM(r.is_recall AND r.quality >= 3)
+    FROM flashcard_reviews r JOIN flashcards f ON f.id = r.flashcard_id
+    GROUP BY f.deck_id, r.user_id, DATE(r.reviewed_at);
+    ''',
+]
+
+def migrate(db):
+    version = db.execute('PRAGMA user_version').fetchone()[0]
+    is_fresh = db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'users'"
+    ).fetchone() is None
+
+    if is_fresh:
+        db.execute(f'PRAGMA user_version = {len(MIGRATIONS)}')
+        return
+
+    # Table rewrites (DROP COLUMN) re-check foreign keys, which fails on
+    # databases that already hold orphaned rows; sweep those separately
+    db.execute('PRAGMA foreign_keys = OFF')
+    for number, sql in enumerate(MIGRATIONS[version:], start=version + 1):
+        db.executescript(f'BEGIN; {sql} PRAGMA user_version = {number}; COMMIT;')
+    db.execute('PRAGMA foreign_keys = ON')
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), 'schema.sql')
+_SCHEMA_OBJECT = re.compile(
+    r'CREATE\s+(?:VIRTUAL\s+|UNIQUE\s+)?(?:TABLE|INDEX|TRIGGER)\s+IF\s+NOT\s+EXISTS\s+(\w+)', re.IGNORECASE
+)
+
+def schema_objects(schema):
+    """Names of the tables, indexes and triggers a schema script creates"""
+    return set(_SCHEMA_OBJECT.findall(schema))
 
 def init_db():
-    db = get_db()
-    schema_path = os.path.join(os.path.dirname(__file__), 'schema.sql')
-    with open(schema_path, 'r') as f:
-        db.executescript(f.read())
+    """Create or upgrade the main database and every shard"""
+    directory = get_directory_db()
+    init_database(directory)
+
+    count = current_app.config['SHARD_COUNT']
+    stranded = directory.execute('SELECT COUNT(*) FROM user_shards WHERE shard >= ?', (count,)).fetchone()[0]
+    if stranded:
+        raise RuntimeError(f'{stranded} users are on shards beyond SHARD_COUNT={count}; move them back first')
+    # services.shards builds on this module
+    from services.shards import relocate_public_decks
+    for shard, db in each_shard():
+        if shard:
+            init_database(db, shard)
+            relocate_public_decks(directory, db)
+
+# Ids handed out by shard n start at n * SHARD_ID_SPACING, so rows keep
+# their ids (and URLs and ETags stay valid) when a user moves between shards
+SHARD_ID_SPACING = 1 << 40
+
+def init_database(db, shard=0):
+    # Readers no longer block the writer (or each other), which matters once
+    # several worker processes share the file. The mode is stored in the
+    # database, so this only does work the first time.
+    db.execute('PRAGMA journal_mode = WAL')
+    migrate(db)
+    with open(SCHEMA_PATH, 'r') as f:
+        schema = f.read()
+    # Everything in schema.sql is CREATE ... IF NOT EXISTS, so running it
+    # can only add what is missing; skip it when nothing is
+    existing = {row[0] for row in db.execute('SELECT name FROM sqlite_master')}
+    if schema_objects(schema) - existing:
+        db.executescript(schema)
+    if shard:
+        first_id = shard * SHARD_ID_SPACING
+        for (table,) in db.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND sql LIKE '%AUTOINCREMENT%'"
+        ).fetchall():
+            db.execute('UPDATE sqlite_sequence SET seq = ? WHERE name = ? AND seq < ?', (first_id, table, first_id))
+            db.execute(
+                'INSERT INTO sqlite_sequence (name, seq) SELECT ?, ? WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = ?)',
+                (table, first_id, table)
+            )
     db.commit()
 
+def shard_moving(e):
+    return jsonify({'error': 'Your data is being moved; try again in a few seconds'}), 503, {'Retry-After': '5'}
+
 def init_app(app):
     app.teardown_appcontext(close_db)
+    app.after_request(count_commits)
+    app.register_error_handler(ShardMoving, shard_moving)
@@ -7,9 +7,12 @@ CREATE TABLE IF NOT EXISTS users (
     email TEXT UNIQUE,
     password_hash TEXT,
     is_guest BOOLEAN DEFAULT 0,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP  -- guests only; reaped once past (services/accounts.py)
 );
 
+CREATE INDEX IF NOT EXISTS idx_users_guest_expiry ON users(expires_at) WHERE is_guest = 1;
+
 -- Pomodoro Settings Table (per user)
 CREATE TABLE IF NOT EXISTS pomodoro_settings (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -24,6 +27,8 @@ CREATE TABLE IF NOT EXISTS pomodoro_settings (
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 );
 
+CREATE INDEX IF NOT EXISTS idx_pomodoro_settings_user ON pomodoro_settings(user_id);
+
 -- Pomodoro Sessions Table
 CREATE TABLE IF NOT EXISTS pomodoro_sessions (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -32,9 +37,59 @@ CREATE TABLE IF NOT EXISTS pomodoro_sessions (
     duration_minutes INTEGER NOT NULL,
     completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     notes TEXT,
+    client_event_id TEXT,
+    local_date DATE,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 );
 
+-- Idempotency key for sessions synced from the client queue
+CREATE UNIQUE INDEX IF NOT EXISTS idx_pomodoro_sessions_event ON pomodoro_sessions(user_id, client_event_id);
+
+-- Keyset pagination of a user's history on (completed_at, id)
+CREATE INDEX IF NOT EXISTS idx_pomodoro_sessions_history ON pomodoro_sessions(user_id, completed_at, id);
+
+-- Session Rollups Table (per user and day/week/month, maintained by triggers;
+-- week periods start on Monday, month periods on the 1st)
+CREATE TABLE IF NOT EXISTS session_rollups (
+    user_id INTEGER NOT NULL,
+    granularity TEXT NOT NULL CHECK(granularity IN ('day', 'week', 'month')),
+    period_start DATE NOT NULL,
+    focus_minutes INTEGER NOT NULL DEFAULT 0,
+    focus_sessions INTEGER NOT NULL DEFAULT 0,
+    break_sessions INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, granularity, period_start),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS pomodoro_sessions_rollup_insert AFTER INSERT ON pomodoro_sessions BEGIN
+    INSERT INTO session_rollups (user_id, granularity, period_start, focus_minutes, focus_sessions, break_sessions)
+    SELECT new.user_id, p.granularity, p.period_start,
+           CASE WHEN new.session_type = 'focus' THEN new.duration_minutes ELSE 0 END,
+           new.session_type = 'focus',
+           new.session_type != 'focus'
+    FROM (
+        SELECT 'day' as granularity, COALESCE(new.local_date, DATE(new.completed_at)) as period_start
+        UNION ALL SELECT 'week', DATE(COALESCE(new.local_date, DATE(new.completed_at)), 'weekday 0', '-6 days')
+        UNION ALL SELECT 'month', DATE(COALESCE(new.local_date, DATE(new.completed_at)), 'start of month')
+    ) p WHERE true
+    ON CONFLICT (user_id, granularity, period_start) DO UPDATE SET
+        focus_minutes = focus_minutes + excluded.focus_minutes,
+        focus_sessions = focus_sessions + excluded.focus_sessions,
+        break_sessions = break_sessions + excluded.break_sessions;
+END;
+
+CREATE TRIGGER IF NOT EXISTS pomodoro_sessions_rollup_delete AFTER DELETE ON pomodoro_sessions BEGIN
+    UPDATE session_rollups SET
+        focus_minutes = focus_minutes - CASE WHEN old.session_type = 'focus' THEN old.duration_minutes ELSE 0 END,
+        focus_sessions = focus_sessions - (old.session_type = 'focus'),
+        break_sessions = break_sessions - (old.session_type != 'focus')
+    WHERE user_id = old.user_id AND (
+        (granularity = 'day' AND period_start = COALESCE(old.local_date, DATE(old.completed_at))) OR
+        (granularity = 'week' AND period_start = DATE(COALESCE(old.local_date, DATE(old.completed_at)), 'weekday 0', '-6 days')) OR
+        (granularity = 'month' AND period_start = DATE(COALESCE(old.local_date, DATE(old.completed_at)), 'start of month'))
+    );
+END;
+
 -- Quiz Table
 CREATE TABLE IF NOT EXISTS quizzes (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -83,26 +138,53 @@ CREATE TABLE IF NOT EXISTS flashcard_decks (
     name TEXT NOT NULL,
     description TEXT,
     subject TEXT,
+    is_public BOOLEAN DEFAULT 0,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 );
 
--- Flashcards Table (with spaced repetition fields)
+-- Flashcards Table (card content only; scheduling lives in card_states)
 CREATE TABLE IF NOT EXISTS flashcards (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     deck_id INTEGER NOT NULL,
     front TEXT NOT NULL,
     back TEXT NOT NULL,
-    ease_factor REAL DEFAULT 2.5,
-    interval_days INTEGER DEFAULT 1,
-    repetitions INTEGER DEFAULT 0,
-    next_review_date DATE DEFAULT CURRENT_DATE,
-    last_reviewed_at TIMESTAMP,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (deck_id) REFERENCES flashcard_decks(id) ON DELETE CASCADE
 );
 
+CREATE INDEX IF NOT EXISTS idx_flashcards_deck ON flashcards(deck_id);
+
+-- Deck Subscriptions Table (users studying someone else's public deck)
+CREATE TABLE IF NOT EXISTS deck_subscriptions (
+    user_id INTEGER NOT NULL,
+    deck_id INTEGER NOT NULL,
+    subscribed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, deck_id),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (deck_id) REFERENCES flashcard_decks(id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_deck_subscriptions_deck ON deck_subscriptions(deck_id);
+
+-- Card States Table (per-user SM-2 scheduling, created on first review;
+-- a card without a row is new and due)
+CREATE TABLE IF NOT EXISTS card_states (
+    user_id INTEGER NOT NULL,
+    flashcard_id INTEGER NOT NULL,
+    ease_factor REAL NOT NULL DEFAULT 2.5,
+    interval_days INTEGER NOT NULL DEFAULT 1,
+    repetitions INTEGER NOT NULL DEFAULT 0,
+    next_review_date DATE NOT NULL,
+    last_reviewed_at TIMESTAMP,
+    PRIMARY KEY (user_id, flashcard_id),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (flashcard_id) REFERENCES flashcards(id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_card_states_due ON card_states(user_id, next_review_date);
+
 -- Flashcard Review Log
 CREATE TABLE IF NOT EXISTS flashcard_reviews (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -110,10 +192,163 @@ CREATE TABLE IF NOT EXISTS flashcard_reviews (
     user_id INTEGER NOT NULL,
     quality INTEGER NOT NULL CHECK(quality >= 0 AND quality <= 5),
     reviewed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    -- Last reviewed on an earlier day and not relearning in a study session
+    is_recall BOOLEAN NOT NULL DEFAULT 0,
     FOREIGN KEY (flashcard_id) REFERENCES flashcards(id) ON DELETE CASCADE,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 );
 
+-- Per-deck statistics (services/deck_stats.py), maintained by the triggers
+-- below and recomputed by `flask flashcard rebuild-stats`. One deck_stats row
+-- per deck for its owner and for each subscriber: cards is the deck's card
+-- count, learning/young/mature count the user's card_states by maturity
+-- (mature from a 21-day interval), so cards without a state are the rest.
+CREATE TABLE IF NOT EXISTS deck_stats (
+    deck_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    cards INTEGER NOT NULL DEFAULT 0,
+    learning INTEGER NOT NULL DEFAULT 0,
+    young INTEGER NOT NULL DEFAULT 0,
+    mature INTEGER NOT NULL DEFAULT 0,
+    ease_sum REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (deck_id, user_id),
+    FOREIGN KEY (deck_id) REFERENCES flashcard_decks(id) ON DELETE CASCADE,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+-- A user's card_states in a deck counted by next review date, so due counts
+-- read one row per date rather than one per card
+CREATE TABLE IF NOT EXISTS deck_due_dates (
+    deck_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    due_date DATE NOT NULL,
+    cards INTEGER NOT NULL,
+    PRIMARY KEY (deck_id, user_id, due_date),
+    FOREIGN KEY (deck_id) REFERENCES flashcard_decks(id) ON DELETE CASCADE,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+-- flashcard_reviews per deck, user and (UTC) day. Recalls are the reviews
+-- flagged is_recall; passed ones had quality >= 3.
+CREATE TABLE IF NOT EXISTS deck_review_days (
+    deck_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    day DATE NOT NULL,
+    reviews INTEGER NOT NULL DEFAULT 0,
+    recalls INTEGER NOT NULL DEFAULT 0,
+    recalls_passed INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (deck_id, user_id, day),
+    FOREIGN KEY (deck_id) REFERENCES flashcard_decks(id) ON DELETE CASCADE,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS flashcard_decks_stats_insert AFTER INSERT ON flashcard_decks BEGIN
+    INSERT OR IGNORE INTO deck_stats (deck_id, user_id) VALUES (new.id, new.user_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS deck_subscriptions_stats_insert AFTER INSERT ON deck_subscriptions BEGIN
+    DELETE FROM deck_stats WHERE deck_id = new.deck_id AND user_id = new.user_id;
+    INSERT INTO deck_stats (deck_id, user_id, cards, learning, young, mature, ease_sum)
+    SELECT new.deck_id, new.user_id, COUNT(f.id),
+           COALESCE(SUM(s.repetitions = 0), 0),
+           COALESCE(SUM(s.repetitions > 0 AND s.interval_days < 21), 0),
+           COALESCE(SUM(s.repetitions > 0 AND s.interval_days >= 21), 0),
+           COALESCE(SUM(s.ease_factor), 0)
+    FROM flashcards f
+    LEFT JOIN card_states s ON s.flashcard_id = f.id AND s.user_id = new.user_id
+    WHERE f.deck_id = new.deck_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS deck_subscriptions_stats_delete AFTER DELETE ON deck_subscriptions BEGIN
+    DELETE FROM deck_stats WHERE deck_id = old.deck_id AND user_id = old.user_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS flashcards_stats_insert AFTER INSERT ON flashcards BEGIN
+    UPDATE deck_stats SET cards = cards + 1 WHERE deck_id = new.deck_id;
+END;
+
+-- BEFORE, and dependents deleted here rather than by the cascade: once the
+-- card is gone their triggers can no longer find its deck
+CREATE TRIGGER IF NOT EXISTS flashcards_stats_delete BEFORE DELETE ON flashcards BEGIN
+    DELETE FROM card_states WHERE flashcard_id = old.id;
+    DELETE FROM flashcard_reviews WHERE flashcard_id = old.id;
+    UPDATE deck_stats SET cards = cards - 1 WHERE deck_id = old.deck_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS card_states_stats_insert AFTER INSERT ON card_states BEGIN
+    UPDATE deck_stats SET
+        learning = learning + (new.repetitions = 0),
+        young = young + (new.repetitions > 0 AND new.interval_days < 21),
+        mature = mature + (new.repetitions > 0 AND new.interval_days >= 21),
+        ease_sum = ease_sum + new.ease_factor
+    WHERE deck_id = (SELECT deck_id FROM flashcards WHERE id = new.flashcard_id) AND user_id = new.user_id;
+    INSERT INTO deck_due_dates (deck_id, user_id, due_date, cards)
+    SELECT deck_id, new.user_id, new.next_review_date, 1 FROM flashcards WHERE id = new.flashcard_id
+    ON CONFLICT (deck_id, user_id, due_date) DO UPDATE SET cards = cards + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS card_states_stats_update AFTER UPDATE ON card_states BEGIN
+    UPDATE deck_stats SET
+        learning = learning - (old.repetitions = 0),
+        young = young - (old.repetitions > 0 AND old.interval_days < 21),
+        mature = mature - (old.repetitions > 0 AND old.interval_days >= 21),
+        ease_sum = ease_sum - old.ease_factor
+    WHERE deck_id = (SELECT deck_id FROM flashcards WHERE id = old.flashcard_id) AND user_id = old.user_id;
+    UPDATE deck_stats SET
+        learning = learning + (new.repetitions = 0),
+        young = young + (new.repetitions > 0 AND new.interval_days < 21),
+        mature = mature + (new.repetitions > 0 AND new.interval_days >= 21),
+        ease_sum = ease_sum + new.ease_factor
+    WHERE deck_id = (SELECT deck_id FROM flashcards WHERE id = new.flashcard_id) AND user_id = new.user_id;
+    UPDATE deck_due_dates SET cards = cards - 1
+    WHERE deck_id = (SELECT deck_id FROM flashcards WHERE id = old.flashcard_id)
+      AND user_id = old.user_id AND due_date = old.next_review_date;
+    DELETE FROM deck_due_dates
+    WHERE deck_id = (SELECT deck_id FROM flashcards WHERE id = old.flashcard_id)
+      AND user_id = old.user_id AND due_date = old.next_review_date AND cards <= 0;
+    INSERT INTO deck_due_dates (deck_id, user_id, due_date, cards)
+    SELECT deck_id, new.user_id, new.next_review_date, 1 FROM flashcards WHERE id = new.flashcard_id
+    ON CONFLICT (deck_id, user_id, due_date) DO UPDATE SET cards = cards + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS card_states_stats_delete AFTER DELETE ON card_states BEGIN
+    UPDATE deck_stats SET
+        learning = learning - (old.repetitions = 0),
+        young = young - (old.repetitions > 0 AND old.interval_days < 21),
+        mature = mature - (old.repetitions > 0 AND old.interval_days >= 21),
+        ease_sum = ease_sum - old.ease_factor
+    WHERE deck_id = (SELECT deck_id FROM flashcards WHERE id = old.flashcard_id) AND user_id = old.user_id;
+    UPDATE deck_due_dates SET cards = cards - 1
+    WHERE deck_id = (SELECT deck_id FROM flashcards WHERE id = old.flashcard_id)
+      AND user_id = old.user_id AND due_date = old.next_review_date;
+    DELETE FROM deck_due_dates
+    WHERE deck_id = (SELECT deck_id FROM flashcards WHERE id = old.flashcard_id)
+      AND user_id = old.user_id AND due_date = old.next_review_date AND cards <= 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS flashcard_reviews_stats_insert AFTER INSERT ON flashcard_reviews BEGIN
+    INSERT INTO deck_review_days (deck_id, user_id, day, reviews, recalls, recalls_passed)
+    SELECT deck_id, new.user_id, DATE(new.reviewed_at), 1,
+           new.is_recall, new.is_recall AND new.quality >= 3
+    FROM flashcards WHERE id = new.flashcard_id
+    ON CONFLICT (deck_id, user_id, day) DO UPDATE SET
+        reviews = reviews + 1,
+        recalls = recalls + excluded.recalls,
+        recalls_passed = recalls_passed + excluded.recalls_passed;
+END;
+
+CREATE TRIGGER IF NOT EXISTS flashcard_reviews_stats_delete AFTER DELETE ON flashcard_reviews BEGIN
+    UPDATE deck_review_days SET
+        reviews = reviews - 1,
+        recalls = recalls - old.is_recall,
+        recalls_passed = recalls_passed - (old.is_recall AND old.quality >= 3)
+    WHERE deck_id = (SELECT deck_id FROM flashcards WHERE id = old.flashcard_id)
+      AND user_id = old.user_id AND day = DATE(old.reviewed_at);
+    DELETE FROM deck_review_days
+    WHERE deck_id = (SELECT deck_id FROM flashcards WHERE id = old.flashcard_id)
+      AND user_id = old.user_id AND day = DATE(old.reviewed_at) AND reviews <= 0;
+END;
+
 -- Daily Statistics Table
 CREATE TABLE IF NOT EXISTS daily_stats (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -128,13 +363,169 @@ CREATE TABLE IF NOT EXISTS daily_stats (
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 );
 
+-- Content Blobs Table (compressed, deduplicated by SHA-256 of the text)
+CREATE TABLE IF NOT EXISTS content_blobs (
+    hash TEXT PRIMARY KEY,
+    data BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    ref_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- Syllabi Table (for AI-generated content)
+-- content is only set on rows created before content_blobs existed
 CREATE TABLE IF NOT EXISTS syllabi (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     user_id INTEGER NOT NULL,
     name TEXT NOT NULL,
     content TEXT,
+    content_hash TEXT REFERENCES content_blobs(hash),
     study_plan TEXT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 );
+
+-- Reference counting for content_blobs; a blob is dropped with its last syllabus
+CREATE TRIGGER IF NOT EXISTS syllabi_blob_ref_insert AFTER INSERT ON syllabi
+WHEN new.content_hash IS NOT NULL BEGIN
+    UPDATE content_blobs SET ref_count = ref_count + 1 WHERE hash = new.content_hash;
+END;
+
+CREATE TRIGGER IF NOT EXISTS syllabi_blob_ref_update AFTER UPDATE OF content_hash ON syllabi
+WHEN new.content_hash IS NOT old.content_hash BEGIN
+    UPDATE content_blobs SET ref_count = ref_count + 1 WHERE hash = new.content_hash;
+    UPDATE content_blobs SET ref_count = ref_count - 1 WHERE hash = old.content_hash;
+    DELETE FROM content_blobs WHERE hash = old.content_hash AND ref_count <= 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS syllabi_blob_ref_delete AFTER DELETE ON syllabi
+WHEN old.content_hash IS NOT NULL BEGIN
+    UPDATE content_blobs SET ref_count = ref_count - 1 WHERE hash = old.content_hash;
+    DELETE FROM content_blobs WHERE hash = old.content_hash AND ref_count <= 0;
+END;
+
+-- Full-text search (FTS5). rowid mirrors the source row id; owner holds
+-- 'u<user_id>' so per-user searches are answered from the index itself.
+CREATE VIRTUAL TABLE IF NOT EXISTS flashcards_fts USING fts5(
+    owner, front, back, tokenize = 'unicode61', prefix = '2 3'
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS quiz_questions_fts USING fts5(
+    owner, question_text, explanation, tokenize = 'unicode61', prefix = '2 3'
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS syllabi_fts USING fts5(
+    owner, name, content, tokenize = 'unicode61', prefix = '2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS flashcards_fts_insert AFTER INSERT ON flashcards BEGIN
+    INSERT INTO flashcards_fts (rowid, owner, front, back)
+    SELECT new.id, 'u' || d.user_id, new.front, new.back FROM flashcard_decks d WHERE d.id = new.deck_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS flashcards_fts_update AFTER UPDATE OF front, back, deck_id ON flashcards BEGIN
+    DELETE FROM flashcards_fts WHERE rowid = old.id;
+    INSERT INTO flashcards_fts (rowid, owner, front, back)
+    SELECT new.id, 'u' || d.user_id, new.front, new.back FROM flashcard_decks d WHERE d.id = new.deck_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS flashcards_fts_delete AFTER DELETE ON flashcards BEGIN
+    DELETE FROM flashcards_fts WHERE rowid = old.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS quiz_questions_fts_insert AFTER INSERT ON quiz_questions BEGIN
+    INSERT INTO quiz_questions_fts (rowid, owner, question_text, explanation)
+    SELECT new.id, 'u' || q.user_id, new.question_text, new.explanation FROM quizzes q WHERE q.id = new.quiz_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS quiz_questions_fts_update AFTER UPDATE OF question_text, explanation, quiz_id ON quiz_questions BEGIN
+    DELETE FROM quiz_questions_fts WHERE rowid = old.id;
+    INSERT INTO quiz_questions_fts (rowid, owner, question_text, explanation)
+    SELECT new.id, 'u' || q.user_id, new.question_text, new.explanation FROM quizzes q WHERE q.id = new.quiz_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS quiz_questions_fts_delete AFTER DELETE ON quiz_questions BEGIN
+    DELETE FROM quiz_questions_fts WHERE rowid = old.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS syllabi_fts_insert AFTER INSERT ON syllabi BEGIN
+    INSERT INTO syllabi_fts (rowid, owner, name, content) VALUES (new.id, 'u' || new.user_id, new.name, new.content);
+END;
+
+-- Text kept in content_blobs is indexed from Python (services/content_store.py),
+-- so only the name is refreshed here
+CREATE TRIGGER IF NOT EXISTS syllabi_fts_update AFTER UPDATE OF name ON syllabi BEGIN
+    UPDATE syllabi_fts SET name = new.name WHERE rowid = new.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS syllabi_fts_delete AFTER DELETE ON syllabi BEGIN
+    DELETE FROM syllabi_fts WHERE rowid = old.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS flashcard_decks_fts_delete AFTER DELETE ON flashcard_decks BEGIN
+    DELETE FROM flashcards_fts WHERE rowid IN (SELECT id FROM flashcards WHERE deck_id = old.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS quizzes_fts_delete AFTER DELETE ON quizzes BEGIN
+    DELETE FROM quiz_questions_fts WHERE rowid IN (SELECT id FROM quiz_questions WHERE quiz_id = old.id);
+END;
+
+-- Keys invalidated in the per-process caches (services/cache.py). Each worker
+-- evicts the keys whose generation is newer than the last one it saw.
+CREATE TABLE IF NOT EXISTS cache_invalidations (
+    name TEXT NOT NULL,
+    key TEXT NOT NULL,
+    generation INTEGER NOT NULL,
+    PRIMARY KEY (name, key)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_cache_invalidations_generation ON cache_invalidations(name, generation);
+
+-- Revision counters behind the ETags of read-heavy API endpoints
+-- (services/revisions.py). Writers bump (name, key) in the transaction
+-- that changes the entity, e.g. ('deck', id) or ('settings', user_id).
+CREATE TABLE IF NOT EXISTS revisions (
+    name TEXT NOT NULL,
+    key TEXT NOT NULL,
+    revision INTEGER NOT NULL,
+    PRIMARY KEY (name, key)
+) WITHOUT ROWID;
+
+-- Shard holding each user's data when SHARD_COUNT > 1 (database/db.py).
+-- Only the main database's copy is used; users without a row are on shard
+-- 0, the main database itself. moving is set while `flask shards move` runs.
+CREATE TABLE IF NOT EXISTS user_shards (
+    user_id INTEGER PRIMARY KEY,
+    shard INTEGER NOT NULL,
+    moving BOOLEAN NOT NULL DEFAULT 0,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- A day's study session per user and deck (services/study.py); starting
+-- again the same day resumes it, so new_seen enforces the daily new-card limit
+CREATE TABLE IF NOT EXISTS study_sessions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    deck_id INTEGER NOT NULL,
+    study_date DATE NOT NULL,
+    position INTEGER NOT NULL DEFAULT 0,
+    new_limit INTEGER NOT NULL,
+    new_seen INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (user_id, deck_id, study_date),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (deck_id) REFERENCES flashcard_decks(id) ON DELETE CASCADE
+);
+
+-- Cards being relearned in a session: shown again once the session's
+-- position reaches due_position
+CREATE TABLE IF NOT EXISTS study_steps (
+    session_id INTEGER NOT NULL,
+    flashcard_id INTEGER NOT NULL,
+    step INTEGER NOT NULL,
+    due_position INTEGER NOT NULL,
+    PRIMARY KEY (session_id, flashcard_id),
+    FOREIGN KEY (session_id) REFERENCES study_sessions(id) ON DELETE CASCADE,
+    FOREIGN KEY (flashcard_id) REFERENCES flashcards(id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_study_steps_due ON study_steps(session_id, due_position);
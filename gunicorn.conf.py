@@ -0,0 +1,75 @@
+"""Gunicorn settings for production.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The app is loaded once in the master (imports, templates, migrations) and
+forked into WEB_CONCURRENCY worker processes of WEB_THREADS threads each.
+Workers are replaced gracefully after MAX_REQUESTS requests, or once their
+resident memory has grown by MAX_MEMORY_GROWTH_MB since they started.
+SIGTERM stops accepting connections and lets in-flight requests finish for
+up to GRACEFUL_TIMEOUT seconds.
+"""
+import os
+import resource
+from dotenv import load_dotenv
+
+load_dotenv()
+
+bind = os.environ.get('BIND', '127.0.0.1:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', os.cpu_count() or 1))
+threads = int(os.environ.get('WEB_THREADS', 4))
+worker_class = 'gthread'
+preload_app = True
+
+max_requests = int(os.environ.get('MAX_REQUESTS', 1000))
+# Spread restarts so workers started together are not all recycled at once
+max_requests_jitter = max_requests // 10
+max_memory_growth = int(os.environ.get('MAX_MEMORY_GROWTH_MB', 256)) * 1024 * 1024
+
+graceful_timeout = int(os.environ.get('GRACEFUL_TIMEOUT', 30))
+# Syllabus generation waits on the LLM provider for up to a minute or so
+timeout = int(os.environ.get('WORKER_TIMEOUT', 120))
+keepalive = 5
+
+accesslog = '-'
+
+
+def rss_bytes():
+    """Current resident set size, or the peak where /proc is unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes on Linux, bytes on macOS
+        return peak if os.uname().sysname == 'Darwin' else peak * 1024
+
+
+def on_starting(server):
+    from config import Config
+    if Config.ADMISSION_SLOTS > 0 and Config.ADMISSION_SLOTS + Config.ADMISSION_QUEUE >= threads:
+        server.log.warning(
+            'ADMISSION_SLOTS + ADMISSION_QUEUE (%d) leave no WEB_THREADS for other requests while '
+            'syllabus parsing and generation are busy', Config.ADMISSION_SLOTS + Config.ADMISSION_QUEUE
+        )
+
+
+def post_fork(server, worker):
+    from database.db import after_fork
+    from services import metrics
+    after_fork()
+    metrics.after_fork()
+
+
+def post_worker_init(worker):
+    worker.rss_baseline = rss_bytes()
+
+
+def post_request(worker, req, environ, resp):
+    if not max_memory_growth or not worker.alive:
+        return
+    growth = rss_bytes() - worker.rss_baseline
+    if growth > max_memory_growth:
+        worker.log.info('Worker grew by %d MB, restarting', growth // (1024 * 1024))
+        # Finishes the requests it has accepted, then the arbiter replaces it
+        worker.alive = False
@@ -0,0 +1,47 @@
+import click
+import mimetypes
+import os
+from flask import Blueprint, current_app, request, send_from_directory
+from werkzeug.utils import safe_join
+from services import assets
+
+assets_bp = Blueprint('assets', __name__)
+
+# Built file names change with their content, so browsers never need to revalidate
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# Precompressed variants written by `flask assets build`, in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+@assets_bp.route('/<path:filename>')
+def serve(filename):
+    directory = current_app.config['ASSETS_DIR']
+    path = safe_join(directory, filename)
+    mimetype = mimetypes.guess_type(filename)[0]
+
+    for encoding, suffix in ENCODINGS:
+        if path and request.accept_encodings[encoding] and os.path.isfile(path + suffix):
+            response = send_from_directory(directory, filename + suffix, mimetype=mimetype)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(directory, filename, mimetype=mimetype)
+
+    response.headers['Cache-Control'] = IMMUTABLE
+    response.vary.add('Accept-Encoding')
+    return response
+
+@assets_bp.cli.command('build')
+def build_command():
+    """Minify, fingerprint and precompress static scripts and stylesheets."""
+    sizes = assets.build(current_app.static_folder, current_app.config['ASSETS_DIR'])
+    click.echo(f'{"asset":28} {"source":>8} {"minified":>9} {"gzip":>7} {"brotli":>7}')
+    for name, size in sizes.items():
+        click.echo(f'{name:28} {size["source"]:8} {size["minified"]:9} '
+                   f'{size["gzip"] or "-":>7} {size["brotli"] or "-":>7}')
+    click.echo(f'Wrote {len(sizes)} assets to {current_app.config["ASSETS_DIR"]}')
+
+@assets_bp.cli.command('prune')
+def prune_command():
+    """Delete built files from earlier builds, once every worker has restarted."""
+    removed = assets.prune(current_app.config['ASSETS_DIR'])
+    click.echo(f'Removed {len(removed)} files from {current_app.config["ASSETS_DIR"]}')
@@ -1,20 +1,50 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash
-from werkzeug.security import generate_password_hash, check_password_hash
-from database.db import get_db
+import click
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash, current_app
+from database.db import each_shard, get_directory_db, shard_label, transaction
+from routes.main import user_cache
+from services import accounts, shards
+from services.passwords import (
+    hash_password, verify_password, needs_rehash, throttle_login, ip_throttle, HashingBusy
+)
+import math
+import sqlite3
 import uuid
 
 auth_bp = Blueprint('auth', __name__)
 
+def too_many_attempts(template, wait):
+    seconds = math.ceil(wait)
+    flash(f'Too many attempts. Please try again in {seconds} seconds.', 'error')
+    return render_template(template), 429, {'Retry-After': str(seconds)}
+
+def server_busy(template):
+    flash('The server is busy. Please try again in a moment.', 'error')
+    return render_template(template), 503, {'Retry-After': '5'}
+
 @auth_bp.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username = request.form.get('username')
         password = request.form.get('password')
 
-        db = get_db()
+        # Throttled before any hashing so a flood of guesses costs us nothing
+        wait = throttle_login(username, request.remote_addr)
+        if wait:
+            return too_many_attempts('login.html', wait)
+
+        db = get_directory_db()
         user = db.execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
 
-        if user and check_password_hash(user['password_hash'], password):
+        try:
+            valid = bool(user and user['password_hash'] and verify_password(user['password_hash'], password))
+            if valid and needs_rehash(user['password_hash']):
+                password_hash = hash_password(password)
+                with transaction(db):
+                    db.execute('UPDATE users SET password_hash = ? WHERE id = ?', (password_hash, user['id']))
+        except HashingBusy:
+            return server_busy('login.html')
+
+        if valid:
             session['user_id'] = user['id']
             session['username'] = user['username']
             session['is_guest'] = False
@@ -32,11 +62,15 @@ def signup():
         password = request.form.get('password')
         confirm_password = request.form.get('confirm_password')
 
+        wait = ip_throttle.take(request.remote_addr or '')
+        if wait:
+            return too_many_attempts('signup.html', wait)
+
         if password != confirm_password:
             flash('Passwords do not match', 'error')
             return render_template('signup.html')
 
-        db = get_db()
+        db = get_directory_db()
 
         # Check if username exists
         existing = db.execute('SELECT id FROM users WHERE username = ?', (username,)).fetchone()
@@ -44,22 +78,23 @@ def signup():
             flash('Username already exists', 'error')
             return render_template('signup.html')
 
-        # Create user
-        password_hash = generate_password_hash(password)
-        cursor = db.execute(
-            'INSERT INTO users (username, email, password_hash, is_guest) VALUES (?, ?, ?, 0)',
-            (username, email, password_hash)
-        )
-        db.commit()
-
-        # Create default pomodoro settings
-        db.execute(
-            'INSERT INTO pomodoro_settings (user_id) VALUES (?)',
-            (cursor.lastrowid,)
-        )
-        db.commit()
-
-        session['user_id'] = cursor.lastrowid
+        # Hash before taking the write lock; UNIQUE catches a name taken meanwhile
+        try:
+            password_hash = hash_password(password)
+        except HashingBusy:
+            return server_busy('signup.html')
+
+        # Create user with default pomodoro settings
+        try:
+            user_id = shards.create_user(
+                db, current_app.config['SHARD_COUNT'],
+                username=username, email=email, password_hash=password_hash, is_guest=0
+            )
+        except sqlite3.IntegrityError:
+            flash('Username already exists', 'error')
+            return render_template('signup.html')
+
+        session['user_id'] = user_id
         session['username'] = username
         session['is_guest'] = False
 
@@ -72,21 +107,13 @@ def guest():
     # Create a temporary guest user
     guest_name = f"Guest_{uuid.uuid4().hex[:8]}"
 
-    db = get_db()
-    cursor = db.execute(
-        'INSERT INTO users (username, is_guest) VALUES (?, 1)',
-        (guest_name,)
-    )
-    db.commit()
-
-    # Create default pomodoro settings
-    db.execute(
-        'INSERT INTO pomodoro_settings (user_id) VALUES (?)',
-        (cursor.lastrowid,)
+    # Created with default pomodoro settings
+    user_id = shards.create_user(
+        get_directory_db(), current_app.config['SHARD_COUNT'],
+        username=guest_name, is_guest=1, expires_at=accounts.guest_expiry(current_app.config['GUEST_TTL_HOURS'])
     )
-    db.commit()
 
-    session['user_id'] = cursor.lastrowid
+    session['user_id'] = user_id
     session['username'] = guest_name
     session['is_guest'] = True
 
@@ -96,9 +123,43 @@ def guest():
 def logout():
     # If guest, delete their data
     if session.get('is_guest'):
-        db = get_db()
-        db.execute('DELETE FROM users WHERE id = ?', (session.get('user_id'),))
-        db.commit()
+        db = get_directory_db()
+        with transaction(db):
+            shards.delete_shard_data(db, [session.get('user_id')])
+            db.execute('DELETE FROM users WHERE id = ?', (session.get('user_id'),))
+            user_cache.invalidate(db, session.get('user_id'))
 
     session.clear()
     return redirect(url_for('auth.login'))
+
+def shard_sizes():
+    return {shard: accounts.table_sizes(db) for shard, db in each_shard()}
+
+def print_sizes(before, after):
+    for shard in before:
+        for table in before[shard]:
+            click.echo(f'{shard_label(shard)}{table:20} {before[shard][table]:>12} -> {after[shard][table]:>12}')
+
+@auth_bp.cli.command('reap-guests')
+@click.option('--batch-size', default=100, show_default=True, help='Guests deleted per transaction.')
+@click.option('--pause', default=0.0, show_default=True, help='Seconds to sleep between batches.')
+def reap_guests_command(batch_size, pause):
+    """Delete expired guest accounts and everything they own."""
+    db = get_directory_db()
+    before = shard_sizes()
+    reaped = accounts.reap_guests(
+        db, batch_size, pause, cache=user_cache, before_delete=lambda ids: shards.delete_shard_data(db, ids)
+    )
+    click.echo(f'Deleted {reaped} expired guests')
+    print_sizes(before, shard_sizes())
+
+@auth_bp.cli.command('sweep-orphans')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows deleted per transaction.')
+@click.option('--pause', default=0.0, show_default=True, help='Seconds to sleep between batches.')
+def sweep_orphans_command(batch_size, pause):
+    """Delete rows left behind by users, decks and quizzes deleted without cascading."""
+    before = shard_sizes()
+    for shard, db in each_shard():
+        swept = accounts.sweep_orphans(db, batch_size, pause)
+        click.echo(f'{shard_label(shard)}Deleted {sum(swept.values())} orphaned rows')
+    print_sizes(before, shard_sizes())
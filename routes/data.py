@@ -0,0 +1,91 @@
+import click
+import os
+import time
+from datetime import date
+from flask import Blueprint, Response, current_app, session, stream_with_context
+from database.db import get_db, get_directory_db, shard_path
+from routes.main import login_required
+from routes.pomodoro import settings_cache
+from services import backup, export, shards, snapshot
+from services.decks import deck_sources
+
+data_bp = Blueprint('data', __name__)
+
+@data_bp.route('/export')
+@login_required
+def export_data():
+    """Everything the user owns as a zip of NDJSON files, streamed as it is built"""
+    filename = f'myzenbrain-export-{date.today().isoformat()}.zip'
+    db = get_db()
+    return Response(
+        stream_with_context(export.export_user(db, session['user_id'], deck_sources(db)[1:])),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename="{filename}"', 'Cache-Control': 'no-store'}
+    )
+
+@data_bp.cli.command('snapshot')
+@click.option('--every', default=0.0, show_default=True,
+              help='Keep refreshing, this many seconds apart (0 = once).')
+def snapshot_command(every):
+    """Refresh the read-only snapshots that reports are served from, one per shard."""
+    path = current_app.config['SNAPSHOT_PATH']
+    if not path:
+        raise click.UsageError('SNAPSHOT_PATH is not set')
+    while True:
+        elapsed = 0.0
+        for shard in range(current_app.config['SHARD_COUNT']):
+            target = shard_path(path, shard)
+            seconds = snapshot.refresh(shard_path(current_app.config['DATABASE'], shard), target)
+            click.echo(f'Wrote {target} in {seconds:.2f}s')
+            elapsed += seconds
+        if not every:
+            return
+        time.sleep(max(0.0, every - elapsed))
+
+@data_bp.cli.command('backup')
+@click.option('--dir', 'directory', default=None,
+              help='Where backups go (default BACKUP_DIR, or backups/ next to the database).')
+@click.option('--keep', default=7, show_default=True, help='Backups to keep; older ones are deleted.')
+@click.option('--pages', default=256, show_default=True, help='Pages copied per step.')
+@click.option('--sleep', default=0.05, show_default=True, help='Seconds writers get between steps.')
+def backup_command(directory, keep, pages, sleep):
+    """Copy the live database to a verified, timestamped backup file.
+
+    With shards, each shard is backed up into a shard<n>/ subdirectory.
+    """
+    database = current_app.config['DATABASE']
+    directory = directory or current_app.config['BACKUP_DIR'] or os.path.join(os.path.dirname(database), 'backups')
+    for shard in range(current_app.config['SHARD_COUNT']):
+        try:
+            path, restarts, elapsed = backup.backup(
+                shard_path(database, shard), os.path.join(directory, f'shard{shard}') if shard else directory,
+                keep, pages, sleep
+            )
+        except backup.BackupError as e:
+            raise click.ClickException(str(e))
+        click.echo(f'Wrote {path} ({os.path.getsize(path)} bytes) in {elapsed:.2f}s, {restarts} restarts')
+
+@data_bp.cli.command('shards')
+def shards_command():
+    """Show how many users each shard holds."""
+    counts = shards.shard_counts(get_directory_db(), current_app.config['SHARD_COUNT'])
+    moving = get_directory_db().execute('SELECT user_id FROM user_shards WHERE moving = 1').fetchall()
+    for shard, users in counts.items():
+        click.echo(f'shard {shard}: {users} users ({shard_path(current_app.config["DATABASE"], shard)})')
+    for row in moving:
+        click.echo(f'user {row["user_id"]} is being moved')
+
+@data_bp.cli.command('move-user')
+@click.argument('user_id', type=int)
+@click.argument('shard', type=int)
+@click.option('--grace', default=10.0, show_default=True,
+              help='Seconds for requests already running to finish before copying.')
+def move_user_command(user_id, shard, grace):
+    """Move a user's data to another shard."""
+    if not 0 <= shard < current_app.config['SHARD_COUNT']:
+        raise click.UsageError(f'SHARD must be between 0 and {current_app.config["SHARD_COUNT"] - 1}')
+    try:
+        counts = shards.move_user(get_directory_db(), user_id, shard, grace, caches=(settings_cache,))
+    except shards.MoveError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'Moved user {user_id} to shard {shard}: ' + ', '.join(f'{n} {t}' for t, n in counts.items() if n))
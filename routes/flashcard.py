@@ -1,26 +1,47 @@
-from flask import Blueprint, render_template, request, jsonify, session
-from database.db import get_db
+import click
+from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for, current_app
+from database.db import each_shard, get_db, get_directory_db, shard_label, transaction, transactional
 from routes.main import login_required
-from datetime import date, datetime, timedelta
+from services import decks as deck_service, deck_stats, revisions, shards, sqljson, study as study_service
+from datetime import date, datetime
 
 flashcard_bp = Blueprint('flashcard', __name__)
 
+def deck_tag(db, user_id, deck_id):
+    """ETag parts for a user's view of a deck: its content and their progress on it"""
+    db = deck_service.deck_db(db, deck_id)
+    if not deck_service.can_study(db, deck_id, user_id):
+        return None
+    return (
+        'deck', deck_id, user_id,
+        revisions.get(db, 'deck', deck_id),
+        revisions.get(db, 'card_states', f'{user_id}:{deck_id}')
+    )
+
+def due_cards_tag(db, user_id, deck_id):
+    tag = deck_tag(db, user_id, deck_id)
+    # Cards fall due as days pass, with nothing written
+    return tag and tag + (date.today().isoformat(),)
+
 @flashcard_bp.route('/')
 @login_required
 def index():
-    db = get_db()
     today = date.today().isoformat()
 
-    decks = db.execute('''
-        SELECT d.*,
-               COUNT(f.id) as card_count,
-               SUM(CASE WHEN f.next_review_date <= ? THEN 1 ELSE 0 END) as due_count
-        FROM flashcard_decks d
-        LEFT JOIN flashcards f ON d.id = f.deck_id
-        WHERE d.user_id = ?
-        GROUP BY d.id
-        ORDER BY d.updated_at DESC
-    ''', (today, session['user_id'])).fetchall()
+    # Counts come from the precomputed deck_stats, not from the cards
+    decks = []
+    for db in deck_service.deck_sources(get_db()):
+        decks += db.execute(f'''
+            SELECT d.*,
+                   d.user_id != :user_id as is_subscribed,
+                   COALESCE(st.cards, 0) as card_count,
+                   {deck_stats.DUE_COUNT} as due_count
+            FROM flashcard_decks d
+            LEFT JOIN deck_stats st ON st.deck_id = d.id AND st.user_id = :user_id
+            WHERE d.id IN ({deck_service.STUDYABLE_DECK_IDS})
+            ORDER BY d.updated_at DESC
+        ''', {'today': today, 'user_id': session['user_id']}).fetchall()
+    decks.sort(key=lambda d: d['updated_at'], reverse=True)
 
     return render_template('flashcard/index.html', decks=decks)
 
@@ -32,12 +53,15 @@ def create():
 @flashcard_bp.route('/edit/<int:deck_id>')
 @login_required
 def edit(deck_id):
-    db = get_db()
+    db = deck_service.deck_db(get_db(), deck_id)
     deck = db.execute(
         'SELECT * FROM flashcard_decks WHERE id = ? AND user_id = ?',
         (deck_id, session['user_id'])
     ).fetchone()
 
+    if not deck:
+        return redirect(url_for('flashcard.index'))
+
     cards = db.execute(
         'SELECT * FROM flashcards WHERE deck_id = ? ORDER BY created_at',
         (deck_id,)
@@ -48,13 +72,34 @@ def edit(deck_id):
 @flashcard_bp.route('/<int:deck_id>/study')
 @login_required
 def study(deck_id):
-    db = get_db()
+    db = deck_service.deck_db(get_db(), deck_id)
+    if not deck_service.can_study(db, deck_id, session['user_id']):
+        return redirect(url_for('flashcard.index'))
     deck = db.execute('SELECT * FROM flashcard_decks WHERE id = ?', (deck_id,)).fetchone()
     return render_template('flashcard/study.html', deck=deck)
 
+@flashcard_bp.route('/public')
+@login_required
+def public():
+    # Public decks of users on every shard are kept in the main database
+    db = get_directory_db()
+    decks = db.execute('''
+        SELECT d.id, d.name, d.description, d.subject, u.username as owner,
+               (SELECT cards FROM deck_stats st WHERE st.deck_id = d.id AND st.user_id = d.user_id) as card_count,
+               (SELECT COUNT(*) FROM deck_subscriptions s WHERE s.deck_id = d.id) as subscriber_count,
+               EXISTS (SELECT 1 FROM deck_subscriptions s WHERE s.deck_id = d.id AND s.user_id = :user_id) as is_subscribed
+        FROM flashcard_decks d
+        JOIN users u ON u.id = d.user_id
+        WHERE d.is_public = 1 AND d.user_id != :user_id
+        ORDER BY subscriber_count DESC, d.updated_at DESC
+    ''', {'user_id': session['user_id']}).fetchall()
+
+    return render_template('flashcard/public.html', decks=decks)
+
 # API Routes
 @flashcard_bp.route('/api/deck', methods=['POST'])
 @login_required
+@transactional
 def create_deck():
     data = request.get_json()
     db = get_db()
@@ -68,102 +113,266 @@ def create_deck():
         data.get('description', ''),
         data.get('subject', '')
     ))
-    db.commit()
 
     return jsonify({'id': cursor.lastrowid, 'success': True})
 
 @flashcard_bp.route('/api/deck/<int:deck_id>', methods=['GET'])
 @login_required
+@revisions.conditional(deck_tag)
 def get_deck(deck_id):
-    db = get_db()
-    deck = db.execute('SELECT * FROM flashcard_decks WHERE id = ?', (deck_id,)).fetchone()
-    cards = db.execute('SELECT * FROM flashcards WHERE deck_id = ?', (deck_id,)).fetchall()
+    db = deck_service.deck_db(get_db(), deck_id)
+    if not deck_service.can_study(db, deck_id, session['user_id']):
+        return jsonify({'error': 'Deck not found'}), 404
 
-    return jsonify({
-        'deck': dict(deck) if deck else None,
-        'cards': [dict(c) for c in cards]
-    })
+    deck = db.execute(
+        f'SELECT {sqljson.object_sql(sqljson.table_columns(db, "flashcard_decks"))} FROM flashcard_decks WHERE id = ?',
+        (deck_id,)
+    ).fetchone()
+    cards = deck_service.deck_cards_json(db, deck_id, session['user_id'])
+
+    return sqljson.response(f'{{"deck": {deck[0] if deck else "null"}, "cards": {cards}}}')
 
 @flashcard_bp.route('/api/deck/<int:deck_id>', methods=['PUT'])
 @login_required
+@transactional
 def update_deck(deck_id):
     data = request.get_json()
-    db = get_db()
+    db = deck_service.deck_db(get_db(), deck_id)
 
-    db.execute('''
-        UPDATE flashcard_decks SET name = ?, description = ?, subject = ?, updated_at = CURRENT_TIMESTAMP
-        WHERE id = ? AND user_id = ?
-    ''', (
-        data.get('name'),
-        data.get('description'),
-        data.get('subject'),
-        deck_id,
-        session['user_id']
-    ))
-    db.commit()
+    with transaction(db):
+        db.execute('''
+            UPDATE flashcard_decks SET name = ?, description = ?, subject = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND user_id = ?
+        ''', (
+            data.get('name'),
+            data.get('description'),
+            data.get('subject'),
+            deck_id,
+            session['user_id']
+        ))
+        revisions.bump(db, 'deck', deck_id)
 
     return jsonify({'success': True})
 
 @flashcard_bp.route('/api/deck/<int:deck_id>', methods=['DELETE'])
 @login_required
+@transactional
 def delete_deck(deck_id):
-    db = get_db()
-    db.execute('DELETE FROM flashcard_decks WHERE id = ? AND user_id = ?', (deck_id, session['user_id']))
-    db.commit()
+    db = deck_service.deck_db(get_db(), deck_id)
+    with transaction(db):
+        db.execute('DELETE FROM flashcard_decks WHERE id = ? AND user_id = ?', (deck_id, session['user_id']))
     return jsonify({'success': True})
 
 @flashcard_bp.route('/api/deck/<int:deck_id>/card', methods=['POST'])
 @login_required
+@transactional
 def add_card(deck_id):
     data = request.get_json()
-    db = get_db()
+    db = deck_service.deck_db(get_db(), deck_id)
 
-    cursor = db.execute('''
-        INSERT INTO flashcards (deck_id, front, back)
-        VALUES (?, ?, ?)
-    ''', (deck_id, data.get('front'), data.get('back')))
-    db.commit()
+    if not deck_service.owns_deck(db, deck_id, session['user_id']):
+        return jsonify({'error': 'Only the deck owner can add cards'}), 403
+
+    with transaction(db):
+        cursor = db.execute('''
+            INSERT INTO flashcards (deck_id, front, back)
+            VALUES (?, ?, ?)
+        ''', (deck_id, data.get('front'), data.get('back')))
+        revisions.bump(db, 'deck', deck_id)
 
     return jsonify({'id': cursor.lastrowid, 'success': True})
 
 @flashcard_bp.route('/api/card/<int:card_id>', methods=['PUT'])
 @login_required
+@transactional
 def update_card(card_id):
     data = request.get_json()
-    db = get_db()
+    db = deck_service.card_db(get_db(), card_id)
 
-    db.execute('''
-        UPDATE flashcards SET front = ?, back = ?
-        WHERE id = ?
-    ''', (data.get('front'), data.get('back'), card_id))
-    db.commit()
+    with transaction(db):
+        updated = db.execute('''
+            UPDATE flashcards SET front = ?, back = ?
+            WHERE id = ? AND deck_id IN (SELECT id FROM flashcard_decks WHERE user_id = ?)
+            RETURNING deck_id
+        ''', (data.get('front'), data.get('back'), card_id, session['user_id'])).fetchall()
+        for card in updated:
+            revisions.bump(db, 'deck', card['deck_id'])
 
     return jsonify({'success': True})
 
 @flashcard_bp.route('/api/card/<int:card_id>', methods=['DELETE'])
 @login_required
+@transactional
 def delete_card(card_id):
-    db = get_db()
-    db.execute('DELETE FROM flashcards WHERE id = ?', (card_id,))
-    db.commit()
+    db = deck_service.card_db(get_db(), card_id)
+    with transaction(db):
+        deleted = db.execute(
+            'DELETE FROM flashcards WHERE id = ? AND deck_id IN (SELECT id FROM flashcard_decks WHERE user_id = ?) RETURNING deck_id',
+            (card_id, session['user_id'])
+        ).fetchall()
+        for card in deleted:
+            revisions.bump(db, 'deck', card['deck_id'])
     return jsonify({'success': True})
 
 @flashcard_bp.route('/api/deck/<int:deck_id>/due', methods=['GET'])
 @login_required
+@revisions.conditional(due_cards_tag)
 def get_due_cards(deck_id):
-    db = get_db()
-    today = date.today().isoformat()
+    db = deck_service.deck_db(get_db(), deck_id)
+    if not deck_service.can_study(db, deck_id, session['user_id']):
+        return jsonify({'error': 'Deck not found'}), 404
 
-    cards = db.execute('''
-        SELECT * FROM flashcards
-        WHERE deck_id = ? AND next_review_date <= ?
-        ORDER BY next_review_date ASC
-    ''', (deck_id, today)).fetchall()
+    return sqljson.response(deck_service.due_cards_json(db, deck_id, session['user_id']))
 
-    return jsonify([dict(c) for c in cards])
+@flashcard_bp.route('/api/deck/<int:deck_id>/stats', methods=['GET'])
+@login_required
+@revisions.conditional(due_cards_tag)
+def get_deck_stats(deck_id):
+    """Maturity, due counts, ease and retention of the user's cards in a deck"""
+    db = deck_service.deck_db(get_db(), deck_id)
+    stats = None
+    if deck_service.can_study(db, deck_id, session['user_id']):
+        stats = deck_stats.summary(db, deck_id, session['user_id'])
+    if stats is None:
+        return jsonify({'error': 'Deck not found'}), 404
+
+    return jsonify(stats)
+
+def prefetch_count(data):
+    try:
+        count = int(data.get('count', study_service.PREFETCH))
+    except (TypeError, ValueError):
+        count = study_service.PREFETCH
+    return min(max(count, 1), study_service.MAX_PREFETCH)
+
+def study_state(db, study_session, count):
+    return {
+        'session_id': study_session['id'],
+        'remaining': study_service.remaining(db, study_session),
+        'cards': study_service.plan(db, study_session, count)
+    }
+
+@flashcard_bp.route('/api/deck/<int:deck_id>/study', methods=['POST'])
+@login_required
+@transactional
+def start_study(deck_id):
+    """Start or resume today's study session and hand out its first cards"""
+    data = request.get_json(silent=True) or {}
+    db = deck_service.deck_db(get_db(), deck_id)
+    if not deck_service.can_study(db, deck_id, session['user_id']):
+        return jsonify({'error': 'Deck not found'}), 404
+
+    with transaction(db):
+        study_session = study_service.start(db, deck_id, session['user_id'], current_app.config['STUDY_NEW_CARDS_PER_DAY'])
+    return jsonify(study_state(db, study_session, prefetch_count(data)))
+
+@flashcard_bp.route('/api/study/<int:session_id>/answer', methods=['POST'])
+@login_required
+@transactional
+def answer_study_card(session_id):
+    """Review a card of a study session; returns the next cards to show"""
+    data = request.get_json() or {}
+    quality = data.get('quality', 3)
+    home = get_db()
+    db = deck_service.session_db(home, session_id)
+    user_id = session['user_id']
+
+    study_session = study_service.get_session(db, session_id, user_id)
+    if not study_session or not deck_service.can_study(db, study_session['deck_id'], user_id):
+        return jsonify({'error': 'Session not found'}), 404
+    card = db.execute(
+        'SELECT id, deck_id FROM flashcards WHERE id = ? AND deck_id = ?', (data.get('card_id'), study_session['deck_id'])
+    ).fetchone()
+    if not card:
+        return jsonify({'error': 'Card not found'}), 404
+
+    with transaction(db):
+        next_review, interval = study_service.answer(db, study_session, card, quality, stats_db=home)
+    study_session = study_service.get_session(db, session_id, user_id)
+
+    return jsonify(dict(
+        study_state(db, study_session, prefetch_count(data)),
+        success=True, next_review_date=next_review.isoformat(), interval_days=interval
+    ))
+
+@flashcard_bp.route('/api/deck/<int:deck_id>/share', methods=['PUT'])
+@login_required
+def share_deck(deck_id):
+    """Make a deck public or private; returns its id, which changes if it moves database"""
+    data = request.get_json()
+    is_public = bool(data.get('is_public'))
+    home = get_db()
+    directory = get_directory_db()
+    db = deck_service.deck_db(home, deck_id)
+    if not deck_service.owns_deck(db, deck_id, session['user_id']):
+        return jsonify({'error': 'Deck not found'}), 404
+
+    # Public decks live in the main database, private ones on their owner's shard
+    if is_public and db is not directory:
+        deck_id, db = shards.publish_deck(directory, db, deck_id), directory
+    elif not is_public and db is not home:
+        deck_id, db = shards.withdraw_deck(directory, home, deck_id), home
+
+    with transaction(db):
+        db.execute('UPDATE flashcard_decks SET is_public = ? WHERE id = ?', (int(is_public), deck_id))
+        revisions.bump(db, 'deck', deck_id)
+
+    return jsonify({'id': deck_id, 'success': True})
+
+@flashcard_bp.route('/api/deck/<int:deck_id>/subscribe', methods=['POST'])
+@login_required
+def subscribe_deck(deck_id):
+    db = get_directory_db()
+    deck = db.execute(
+        'SELECT * FROM flashcard_decks WHERE id = ? AND is_public = 1 AND user_id != ?',
+        (deck_id, session['user_id'])
+    ).fetchone()
+    if not deck:
+        return jsonify({'error': 'Deck not found'}), 404
+
+    # One row per subscriber; card states are created lazily on first review
+    with transaction(db):
+        db.execute(
+            'INSERT OR IGNORE INTO deck_subscriptions (user_id, deck_id) VALUES (?, ?)',
+            (session['user_id'], deck_id)
+        )
+
+    return jsonify({'success': True})
+
+@flashcard_bp.route('/api/deck/<int:deck_id>/subscribe', methods=['DELETE'])
+@login_required
+def unsubscribe_deck(deck_id):
+    db = get_directory_db()
+    user_id = session['user_id']
+
+    with transaction(db):
+        db.execute('DELETE FROM deck_subscriptions WHERE user_id = ? AND deck_id = ?', (user_id, deck_id))
+        db.execute(
+            'DELETE FROM card_states WHERE user_id = ? AND flashcard_id IN (SELECT id FROM flashcards WHERE deck_id = ?)',
+            (user_id, deck_id)
+        )
+        revisions.bump(db, 'card_states', f'{user_id}:{deck_id}')
+
+    return jsonify({'success': True})
+
+@flashcard_bp.route('/api/deck/<int:deck_id>/fork', methods=['POST'])
+@login_required
+@transactional
+def fork_deck(deck_id):
+    home = get_db()
+    db = deck_service.deck_db(home, deck_id)
+    user_id = session['user_id']
+
+    if deck_service.owns_deck(db, deck_id, user_id) or not deck_service.can_study(db, deck_id, user_id):
+        return jsonify({'error': 'Deck not found'}), 404
+
+    new_deck_id = deck_service.fork_deck(db, deck_id, user_id, target=home)
+
+    return jsonify({'id': new_deck_id, 'success': True})
 
 @flashcard_bp.route('/api/card/<int:card_id>/review', methods=['POST'])
 @login_required
+@transactional
 def review_card(card_id):
     """
     SM-2 Spaced Repetition Algorithm
@@ -176,79 +385,26 @@ def review_card(card_id):
     """
     data = request.get_json()
     quality = data.get('quality', 3)
-    db = get_db()
+    home = get_db()
+    db = deck_service.card_db(home, card_id)
     user_id = session['user_id']
 
-    card = db.execute('SELECT * FROM flashcards WHERE id = ?', (card_id,)).fetchone()
-    if not card:
+    card = db.execute('SELECT id, deck_id FROM flashcards WHERE id = ?', (card_id,)).fetchone()
+    if not card or not deck_service.can_study(db, card['deck_id'], user_id):
         return jsonify({'error': 'Card not found'}), 404
 
-    # Get current values
-    ease_factor = card['ease_factor']
-    interval = card['interval_days']
-    repetitions = card['repetitions']
-
-    # Apply SM-2 algorithm
-    if quality < 3:
-        # Failed - reset
-        repetitions = 0
-        interval = 1
-    else:
-        # Success
-        if repetitions == 0:
-            interval = 1
-        elif repetitions == 1:
-            interval = 6
-        else:
-            interval = int(interval * ease_factor)
-
-        repetitions += 1
-
-    # Update ease factor
-    ease_factor = max(1.3, ease_factor + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
-
-    # Calculate next review date
-    next_review = date.today() + timedelta(days=interval)
-
-    # Update card
-    db.execute('''
-        UPDATE flashcards SET
-            ease_factor = ?,
-            interval_days = ?,
-            repetitions = ?,
-            next_review_date = ?,
-            last_reviewed_at = CURRENT_TIMESTAMP
-        WHERE id = ?
-    ''', (ease_factor, interval, repetitions, next_review.isoformat(), card_id))
-
-    # Log review
-    db.execute('''
-        INSERT INTO flashcard_reviews (flashcard_id, user_id, quality)
-        VALUES (?, ?, ?)
-    ''', (card_id, user_id, quality))
-
-    # Update daily stats
-    today = date.today().isoformat()
-    existing = db.execute(
-        'SELECT * FROM daily_stats WHERE user_id = ? AND date = ?',
-        (user_id, today)
-    ).fetchone()
-
-    if existing:
-        db.execute('''
-            UPDATE daily_stats SET cards_reviewed = cards_reviewed + 1
-            WHERE user_id = ? AND date = ?
-        ''', (user_id, today))
-    else:
-        db.execute('''
-            INSERT INTO daily_stats (user_id, date, cards_reviewed)
-            VALUES (?, ?, 1)
-        ''', (user_id, today))
-
-    db.commit()
+    with transaction(db):
+        next_review, interval = deck_service.review(db, card, user_id, quality, stats_db=home)
 
     return jsonify({
         'success': True,
         'next_review_date': next_review.isoformat(),
         'interval_days': interval
     })
+
+@flashcard_bp.cli.command('rebuild-stats')
+def rebuild_stats_command():
+    """Recompute deck statistics, reporting rows that were out of date."""
+    for shard, db in each_shard():
+        for table, (rows, differed) in deck_stats.rebuild(db).items():
+            click.echo(f'{shard_label(shard)}{table}: {rows} rows, {differed} differed')
@@ -1,15 +1,42 @@
-from flask import Blueprint, render_template, session, redirect, url_for, jsonify
-from database.db import get_db
+from flask import Blueprint, render_template, session, redirect, url_for, jsonify, g, current_app
+from database.db import get_db, get_directory_db, transaction
+from services.accounts import guest_expiry, needs_touch
+from services.cache import UserCache
+from services.decks import STUDYABLE_DECK_IDS, deck_sources
+from services import revisions
+from services.snapshot import get_report_db
 from functools import wraps
 from datetime import date
 
 main_bp = Blueprint('main', __name__)
 
+def load_user(db, user_id):
+    user = db.execute(
+        'SELECT id, username, email, is_guest, created_at, expires_at FROM users WHERE id = ?', (user_id,)
+    ).fetchone()
+    return dict(user) if user else None
+
+user_cache = UserCache('users', load_user)
+
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if 'user_id' not in session:
             return redirect(url_for('auth.login'))
+
+        # Sessions can outlive their user (e.g. a guest deleted elsewhere)
+        g.user = user_cache.get(get_directory_db(), session['user_id'])
+        if g.user is None:
+            session.clear()
+            return redirect(url_for('auth.login'))
+
+        # Keep active guests from being reaped
+        ttl_hours = current_app.config['GUEST_TTL_HOURS']
+        if needs_touch(g.user, ttl_hours):
+            db = get_directory_db()
+            with transaction(db):
+                db.execute('UPDATE users SET expires_at = ? WHERE id = ?', (guest_expiry(ttl_hours), g.user['id']))
+                user_cache.invalidate(db, g.user['id'])
         return f(*args, **kwargs)
     return decorated_function
 
@@ -32,23 +59,28 @@ def dashboard():
         (user_id, today)
     ).fetchone()
 
-    # Get counts
-    deck_count = db.execute(
-        'SELECT COUNT(*) as count FROM flashcard_decks WHERE user_id = ?',
-        (user_id,)
-    ).fetchone()['count']
-
-    quiz_count = db.execute(
+    # Counts come from the report snapshot when it is fresh enough
+    reports = get_report_db()
+    quiz_count = reports.execute(
         'SELECT COUNT(*) as count FROM quizzes WHERE user_id = ?',
         (user_id,)
     ).fetchone()['count']
 
-    # Get due flashcards count
-    due_cards = db.execute('''
-        SELECT COUNT(*) as count FROM flashcards f
-        JOIN flashcard_decks d ON f.deck_id = d.id
-        WHERE d.user_id = ? AND f.next_review_date <= ?
-    ''', (user_id, today)).fetchone()['count']
+    # Users on a shard have public decks in the main database too, read live
+    deck_count = due_cards = 0
+    for decks in [reports] + deck_sources(db)[1:]:
+        deck_count += decks.execute(
+            'SELECT COUNT(*) as count FROM flashcard_decks WHERE user_id = ?',
+            (user_id,)
+        ).fetchone()['count']
+
+        # Get due flashcards count (own and subscribed decks, this user's schedule)
+        due_cards += decks.execute(f'''
+            SELECT COUNT(*) as count FROM flashcards f
+            LEFT JOIN card_states s ON s.flashcard_id = f.id AND s.user_id = :user_id
+            WHERE f.deck_id IN ({STUDYABLE_DECK_IDS})
+              AND (s.next_review_date IS NULL OR s.next_review_date <= :today)
+        ''', {'user_id': user_id, 'today': today}).fetchone()['count']
 
     return render_template('index.html',
         stats=stats,
@@ -57,8 +89,12 @@ def dashboard():
         due_cards=due_cards
     )
 
+def daily_stats_tag(db, user_id):
+    return ('daily_stats', user_id, revisions.get(db, 'daily_stats', user_id), date.today().isoformat())
+
 @main_bp.route('/api/stats/daily')
 @login_required
+@revisions.conditional(daily_stats_tag)
 def daily_stats():
     db = get_db()
     user_id = session['user_id']
@@ -1,10 +1,47 @@
+import click
 from flask import Blueprint, render_template, request, jsonify, session
-from database.db import get_db
+from database.db import each_shard, get_db, shard_label, transaction
 from routes.main import login_required
-from datetime import date, datetime
+from services.cache import UserCache
+from services import revisions, sqljson
+from services.sessions import (
+    apply_session_events, session_history, session_rollups, rebuild_rollups, MAX_BATCH_SIZE, GRANULARITIES
+)
+from datetime import date, datetime, timedelta
 
 pomodoro_bp = Blueprint('pomodoro', __name__)
 
+SETTINGS_DEFAULTS = {
+    'focus_duration': 25,
+    'short_break_duration': 5,
+    'long_break_duration': 15,
+    'sessions_until_long_break': 4,
+    'auto_start_breaks': False,
+    'auto_start_focus': False,
+    'sound_enabled': True
+}
+
+def load_settings(db, user_id):
+    settings = db.execute(
+        'SELECT * FROM pomodoro_settings WHERE user_id = ?', (user_id,)
+    ).fetchone()
+    if settings is None:
+        return dict(SETTINGS_DEFAULTS)
+    return {
+        'focus_duration': settings['focus_duration'],
+        'short_break_duration': settings['short_break_duration'],
+        'long_break_duration': settings['long_break_duration'],
+        'sessions_until_long_break': settings['sessions_until_long_break'],
+        'auto_start_breaks': bool(settings['auto_start_breaks']),
+        'auto_start_focus': bool(settings['auto_start_focus']),
+        'sound_enabled': bool(settings['sound_enabled'])
+    }
+
+settings_cache = UserCache('pomodoro_settings', load_settings)
+
+def settings_tag(db, user_id):
+    return ('settings', user_id, revisions.get(db, 'settings', user_id))
+
 @pomodoro_bp.route('/')
 @login_required
 def index():
@@ -12,61 +49,27 @@ def index():
 
 @pomodoro_bp.route('/api/settings', methods=['GET'])
 @login_required
+@revisions.conditional(settings_tag)
 def get_settings():
-    db = get_db()
-    settings = db.execute(
-        'SELECT * FROM pomodoro_settings WHERE user_id = ?',
-        (session['user_id'],)
-    ).fetchone()
-
-    if settings:
-        return jsonify({
-            'focus_duration': settings['focus_duration'],
-            'short_break_duration': settings['short_break_duration'],
-            'long_break_duration': settings['long_break_duration'],
-            'sessions_until_long_break': settings['sessions_until_long_break'],
-            'auto_start_breaks': bool(settings['auto_start_breaks']),
-            'auto_start_focus': bool(settings['auto_start_focus']),
-            'sound_enabled': bool(settings['sound_enabled'])
-        })
-
-    return jsonify({
-        'focus_duration': 25,
-        'short_break_duration': 5,
-        'long_break_duration': 15,
-        'sessions_until_long_break': 4,
-        'auto_start_breaks': False,
-        'auto_start_focus': False,
-        'sound_enabled': True
-    })
+    return jsonify(settings_cache.get(get_db(), session['user_id']))
 
 @pomodoro_bp.route('/api/settings', methods=['PUT'])
 @login_required
 def update_settings():
-    data = request.get_json()
+    data = request.get_json() or {}
     db = get_db()
 
-    db.execute('''
-        UPDATE pomodoro_settings SET
-            focus_duration = ?,
-            short_break_duration = ?,
-            long_break_duration = ?,
-            sessions_until_long_break = ?,
-            auto_start_breaks = ?,
-            auto_start_focus = ?,
-            sound_enabled = ?
-        WHERE user_id = ?
-    ''', (
-        data.get('focus_duration', 25),
-        data.get('short_break_duration', 5),
-        data.get('long_break_duration', 15),
-        data.get('sessions_until_long_break', 4),
-        data.get('auto_start_breaks', False),
-        data.get('auto_start_focus', False),
-        data.get('sound_enabled', True),
-        session['user_id']
-    ))
-    db.commit()
+    # Only write the columns the client sent
+    changes = {k: data[k] for k in SETTINGS_DEFAULTS if k in data}
+    if changes:
+        assignments = ', '.join(f'{k} = :{k}' for k in changes)
+        with transaction(db):
+            db.execute(
+                f'UPDATE pomodoro_settings SET {assignments} WHERE user_id = :user_id',
+                dict(changes, user_id=session['user_id'])
+            )
+            settings_cache.invalidate(db, session['user_id'])
+            revisions.bump(db, 'settings', session['user_id'])
 
     return jsonify({'success': True})
 
@@ -75,55 +78,94 @@ def update_settings():
 def log_session():
     data = request.get_json()
     db = get_db()
-    user_id = session['user_id']
-
-    # Log the session
-    db.execute('''
-        INSERT INTO pomodoro_sessions (user_id, session_type, duration_minutes, notes)
-        VALUES (?, ?, ?, ?)
-    ''', (
-        user_id,
-        data.get('session_type', 'focus'),
-        data.get('duration_minutes', 25),
-        data.get('notes', '')
-    ))
-
-    # Update daily stats
-    today = date.today().isoformat()
-    existing = db.execute(
-        'SELECT * FROM daily_stats WHERE user_id = ? AND date = ?',
-        (user_id, today)
-    ).fetchone()
 
-    if existing:
-        if data.get('session_type') == 'focus':
-            db.execute('''
-                UPDATE daily_stats SET
-                    pomodoro_count = pomodoro_count + 1,
-                    focus_minutes = focus_minutes + ?
-                WHERE user_id = ? AND date = ?
-            ''', (data.get('duration_minutes', 25), user_id, today))
-    else:
-        focus_mins = data.get('duration_minutes', 25) if data.get('session_type') == 'focus' else 0
-        pomo_count = 1 if data.get('session_type') == 'focus' else 0
-        db.execute('''
-            INSERT INTO daily_stats (user_id, date, pomodoro_count, focus_minutes)
-            VALUES (?, ?, ?, ?)
-        ''', (user_id, today, pomo_count, focus_mins))
-
-    db.commit()
+    # Single-event form of /api/sessions/batch; 'id' is optional here
+    accepted, duplicates, rejected = apply_session_events(db, session['user_id'], [data])
+    if rejected:
+        return jsonify({'error': rejected[0]['error']}), 400
 
     return jsonify({'success': True})
 
+@pomodoro_bp.route('/api/sessions/batch', methods=['POST'])
+@login_required
+def sync_sessions():
+    """Ingest queued session events from the client in one transaction"""
+    data = request.get_json()
+    events = data.get('events', []) if isinstance(data, dict) else []
+
+    if not isinstance(events, list) or not all(isinstance(e, dict) for e in events):
+        return jsonify({'error': 'events must be a list of objects'}), 400
+    if len(events) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'At most {MAX_BATCH_SIZE} events per batch'}), 413
+    if any(not e.get('id') for e in events):
+        return jsonify({'error': 'Every event needs an id'}), 400
+
+    db = get_db()
+    accepted, duplicates, rejected = apply_session_events(db, session['user_id'], events)
+
+    return jsonify({
+        'success': True,
+        'accepted': accepted,
+        'duplicates': duplicates,
+        'rejected': rejected
+    })
+
 @pomodoro_bp.route('/api/sessions', methods=['GET'])
 @login_required
 def get_sessions():
     db = get_db()
-    sessions_list = db.execute('''
+    sessions_list = db.execute(sqljson.array_sql('''
         SELECT * FROM pomodoro_sessions
         WHERE user_id = ?
-        ORDER BY completed_at DESC
+        ORDER BY completed_at DESC, id DESC
         LIMIT 20
-    ''', (session['user_id'],)).fetchall()
+    ''', sqljson.table_columns(db, 'pomodoro_sessions')), (session['user_id'],)).fetchone()[0]
+
+    return sqljson.response(sessions_list)
+
+@pomodoro_bp.route('/api/sessions/history', methods=['GET'])
+@login_required
+def get_session_history():
+    """Page through all sessions, newest first; pass back next_cursor for the next page"""
+    limit = max(1, min(request.args.get('limit', 50, type=int), 200))
+    cursor = request.args.get('cursor')
+
+    try:
+        sessions_list, next_cursor = session_history(get_db(), session['user_id'], limit, cursor)
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+
+    return jsonify({'sessions': sessions_list, 'next_cursor': next_cursor})
+
+@pomodoro_bp.route('/api/stats/rollup', methods=['GET'])
+@login_required
+def get_rollup():
+    """Focus minutes and session counts per day, week or month over a date range"""
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in GRANULARITIES:
+        return jsonify({'error': f"granularity must be one of {', '.join(GRANULARITIES)}"}), 400
+
+    try:
+        end = date.fromisoformat(request.args['end']) if request.args.get('end') else date.today()
+        start = date.fromisoformat(request.args['start']) if request.args.get('start') else end - timedelta(days=364)
+    except ValueError:
+        return jsonify({'error': 'start and end must be YYYY-MM-DD dates'}), 400
+
+    if start > end:
+        return jsonify({'error': 'start must not be after end'}), 400
+
+    periods = session_rollups(get_db(), session['user_id'], granularity, start, end)
+
+    return jsonify({
+        'granularity': granularity,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'periods': periods
+    })
 
-    return jsonify([dict(s) for s in sessions_list])
+@pomodoro_bp.cli.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Recompute session rollups from the session log."""
+    for shard, db in each_shard():
+        count = rebuild_rollups(db)
+        click.echo(f'{shard_label(shard)}Rebuilt {count} rollup rows')
@@ -1,16 +1,23 @@
-from flask import Blueprint, render_template, request, jsonify, session
-from database.db import get_db
+from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for
+from database.db import get_db, transactional
 from routes.main import login_required
+from services.local_quiz import create_quiz_from_deck
+from services import decks as deck_service, revisions, sqljson
+from services.snapshot import get_report_db
 from datetime import date, datetime
 import json
 
 quiz_bp = Blueprint('quiz', __name__)
 
+def quiz_tag(db, user_id, quiz_id):
+    if db.execute('SELECT 1 FROM quizzes WHERE id = ?', (quiz_id,)).fetchone() is None:
+        return None
+    return ('quiz', quiz_id, revisions.get(db, 'quiz', quiz_id))
+
 @quiz_bp.route('/')
 @login_required
 def index():
-    db = get_db()
-    quizzes = db.execute('''
+    quizzes = get_report_db().execute('''
         SELECT q.*, COUNT(qq.id) as question_count,
                (SELECT MAX(percentage) FROM quiz_attempts WHERE quiz_id = q.id) as best_score
         FROM quizzes q
@@ -71,6 +78,7 @@ def take(quiz_id):
 # API Routes
 @quiz_bp.route('/api/quiz', methods=['POST'])
 @login_required
+@transactional
 def create_quiz():
     data = request.get_json()
     db = get_db()
@@ -84,27 +92,59 @@ def create_quiz():
         data.get('description', ''),
         data.get('subject', '')
     ))
-    db.commit()
 
     return jsonify({'id': cursor.lastrowid, 'success': True})
 
+@quiz_bp.route('/api/quiz/from-deck/<int:deck_id>', methods=['POST'])
+@login_required
+@transactional
+def create_quiz_from_flashcards(deck_id):
+    """Build a quiz locally from a flashcard deck, without calling the LLM"""
+    data = request.get_json(silent=True) or {}
+    db = get_db()
+    source = deck_service.deck_db(db, deck_id)
+
+    deck = source.execute(
+        'SELECT * FROM flashcard_decks WHERE id = ? AND user_id = ?',
+        (deck_id, session['user_id'])
+    ).fetchone()
+    if not deck:
+        return jsonify({'error': 'Deck not found'}), 404
+
+    try:
+        num_questions = max(1, min(int(data.get('num_questions', 10)), 100))
+        true_false_ratio = max(0.0, min(float(data.get('true_false_ratio', 0.3)), 1.0))
+    except (TypeError, ValueError, OverflowError):
+        return jsonify({'error': 'num_questions and true_false_ratio must be numbers'}), 400
+
+    quiz_id, question_count = create_quiz_from_deck(
+        db, session['user_id'], deck, num_questions, true_false_ratio, deck_db=source
+    )
+    if not quiz_id:
+        return jsonify({'error': 'Deck needs at least 2 cards to build a quiz'}), 400
+
+    return jsonify({'id': quiz_id, 'question_count': question_count, 'success': True})
+
 @quiz_bp.route('/api/quiz/<int:quiz_id>', methods=['GET'])
 @login_required
+@revisions.conditional(quiz_tag)
 def get_quiz(quiz_id):
     db = get_db()
-    quiz = db.execute('SELECT * FROM quizzes WHERE id = ?', (quiz_id,)).fetchone()
+    quiz = db.execute(
+        f'SELECT {sqljson.object_sql(sqljson.table_columns(db, "quizzes"))} FROM quizzes WHERE id = ?',
+        (quiz_id,)
+    ).fetchone()
     questions = db.execute(
-        'SELECT * FROM quiz_questions WHERE quiz_id = ? ORDER BY order_num',
+        sqljson.array_sql('SELECT * FROM quiz_questions WHERE quiz_id = ? ORDER BY order_num',
+                          sqljson.table_columns(db, 'quiz_questions')),
         (quiz_id,)
-    ).fetchall()
+    ).fetchone()[0]
 
-    return jsonify({
-        'quiz': dict(quiz) if quiz else None,
-        'questions': [dict(q) for q in questions]
-    })
+    return sqljson.response(f'{{"quiz": {quiz[0] if quiz else "null"}, "questions": {questions}}}')
 
 @quiz_bp.route('/api/quiz/<int:quiz_id>', methods=['PUT'])
 @login_required
+@transactional
 def update_quiz(quiz_id):
     data = request.get_json()
     db = get_db()
@@ -119,20 +159,21 @@ def update_quiz(quiz_id):
         quiz_id,
         session['user_id']
     ))
-    db.commit()
+    revisions.bump(db, 'quiz', quiz_id)
 
     return jsonify({'success': True})
 
 @quiz_bp.route('/api/quiz/<int:quiz_id>', methods=['DELETE'])
 @login_required
+@transactional
 def delete_quiz(quiz_id):
     db = get_db()
     db.execute('DELETE FROM quizzes WHERE id = ? AND user_id = ?', (quiz_id, session['user_id']))
-    db.commit()
     return jsonify({'success': True})
 
 @quiz_bp.route('/api/quiz/<int:quiz_id>/question', methods=['POST'])
 @login_required
+@transactional
 def add_question(quiz_id):
     data = request.get_json()
     db = get_db()
@@ -156,17 +197,18 @@ def add_question(quiz_id):
         data.get('points', 1),
         max_order + 1
     ))
-    db.commit()
+    revisions.bump(db, 'quiz', quiz_id)
 
     return jsonify({'id': cursor.lastrowid, 'success': True})
 
 @quiz_bp.route('/api/question/<int:question_id>', methods=['PUT'])
 @login_required
+@transactional
 def update_question(question_id):
     data = request.get_json()
     db = get_db()
 
-    db.execute('''
+    updated = db.execute('''
         UPDATE quiz_questions SET
             question_text = ?,
             question_type = ?,
@@ -175,6 +217,7 @@ def update_question(question_id):
             explanation = ?,
             points = ?
         WHERE id = ?
+        RETURNING quiz_id
     ''', (
         data.get('question_text'),
         data.get('question_type'),
@@ -183,21 +226,25 @@ def update_question(question_id):
         data.get('explanation', ''),
         data.get('points', 1),
         question_id
-    ))
-    db.commit()
+    )).fetchall()
+    for question in updated:
+        revisions.bump(db, 'quiz', question['quiz_id'])
 
     return jsonify({'success': True})
 
 @quiz_bp.route('/api/question/<int:question_id>', methods=['DELETE'])
 @login_required
+@transactional
 def delete_question(question_id):
     db = get_db()
-    db.execute('DELETE FROM quiz_questions WHERE id = ?', (question_id,))
-    db.commit()
+    deleted = db.execute('DELETE FROM quiz_questions WHERE id = ? RETURNING quiz_id', (question_id,)).fetchall()
+    for question in deleted:
+        revisions.bump(db, 'quiz', question['quiz_id'])
     return jsonify({'success': True})
 
 @quiz_bp.route('/api/quiz/<int:quiz_id>/submit', methods=['POST'])
 @login_required
+@transactional
 def submit_quiz(quiz_id):
     data = request.get_json()
     answers = data.get('answers', {})
@@ -267,8 +314,8 @@ def submit_quiz(quiz_id):
             INSERT INTO daily_stats (user_id, date, quizzes_taken, average_quiz_score)
             VALUES (?, ?, 1, ?)
         ''', (user_id, today, percentage))
+    revisions.bump(db, 'daily_stats', user_id)
 
-    db.commit()
 
     return jsonify({
         'score': score,
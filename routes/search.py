@@ -0,0 +1,47 @@
+import click
+from flask import Blueprint, render_template, request, jsonify, session
+from database.db import each_shard, get_db, shard_label
+from routes.main import login_required
+from services.decks import deck_sources
+from services.search import search as run_search, rebuild_search_index, KIND_QUERIES
+
+search_bp = Blueprint('search', __name__)
+
+@search_bp.route('/')
+@login_required
+def index():
+    return render_template('search.html', query=request.args.get('q', ''))
+
+@search_bp.route('/api/search', methods=['GET'])
+@login_required
+def api_search():
+    query = request.args.get('q', '').strip()
+    kinds = request.args.get('kinds')
+    page = max(1, request.args.get('page', 1, type=int))
+    per_page = max(1, min(request.args.get('per_page', 20, type=int), 50))
+    prefix = request.args.get('prefix', '1') != '0'
+
+    if not query:
+        return jsonify({'error': 'Missing search query'}), 400
+
+    kinds = [k for k in kinds.split(',') if k in KIND_QUERIES] if kinds else None
+
+    db = get_db()
+    results, has_more = run_search(
+        db, session['user_id'], query, kinds, page, per_page, prefix, shared=deck_sources(db)[1:]
+    )
+
+    return jsonify({
+        'query': query,
+        'page': page,
+        'per_page': per_page,
+        'has_more': has_more,
+        'results': results
+    })
+
+@search_bp.cli.command('rebuild')
+def rebuild_command():
+    """Rebuild the full-text search index from the source tables."""
+    for shard, db in each_shard():
+        for table, count in rebuild_search_index(db).items():
+            click.echo(f'{shard_label(shard)}{table}: {count} rows')
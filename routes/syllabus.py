@@ -1,33 +1,24 @@
-from flask import Blueprint, render_template, request, jsonify, session, current_app
-from database.db import get_db
+from flask import Blueprint, render_template, request, jsonify, session, current_app, redirect, url_for
+from database.db import each_shard, get_db, shard_label, transaction, transactional
 from routes.main import login_required
 from datetime import date, datetime
 import os
 import json
-import requests
-from bs4 import BeautifulSoup
-from PyPDF2 import PdfReader
+import sqlite3
+import click
 from io import BytesIO
+from services.llm import get_llm_client
+from services.generator import Generator, GENERATE_TYPES
+from services import admission, content_store, metrics
 
 syllabus_bp = Blueprint('syllabus', __name__)
 
-# Initialize Groq client
-def get_groq_client():
-    try:
-        from groq import Groq
-        api_key = os.environ.get('GROQ_API_KEY')
-        if api_key:
-            return Groq(api_key=api_key)
-    except Exception as e:
-        print(f"Groq init error: {e}")
-    return None
-
 @syllabus_bp.route('/')
 @login_required
 def index():
     db = get_db()
     syllabi = db.execute('''
-        SELECT * FROM syllabi WHERE user_id = ? ORDER BY created_at DESC
+        SELECT id, name, created_at FROM syllabi WHERE user_id = ? ORDER BY created_at DESC
     ''', (session['user_id'],)).fetchall()
 
     return render_template('syllabus/index.html', syllabi=syllabi)
@@ -39,6 +30,7 @@ def create():
 
 @syllabus_bp.route('/api/parse', methods=['POST'])
 @login_required
+@admission.expensive
 def parse_syllabus():
     """Parse syllabus from PDF or URL"""
     content = ""
@@ -48,6 +40,9 @@ def parse_syllabus():
         if source_type == 'pdf' and 'pdf_file' in request.files:
             pdf_file = request.files['pdf_file']
             if pdf_file.filename:
+                # Imported here rather than at the top: these are slow to load
+                # and most workers never parse a syllabus
+                from PyPDF2 import PdfReader
                 pdf_reader = PdfReader(BytesIO(pdf_file.read()))
                 for page in pdf_reader.pages:
                     content += page.extract_text() or ""
@@ -55,6 +50,8 @@ def parse_syllabus():
         elif source_type == 'url':
             url = request.form.get('url', '')
             if url:
+                import requests
+                from bs4 import BeautifulSoup
                 headers = {'User-Agent': 'Mozilla/5.0 (compatible; MyZenBrain/1.0)'}
                 response = requests.get(url, headers=headers, timeout=10)
                 soup = BeautifulSoup(response.text, 'html.parser')
@@ -81,204 +78,108 @@ def parse_syllabus():
 
 @syllabus_bp.route('/api/generate', methods=['POST'])
 @login_required
+@admission.expensive
 def generate_content():
     """Generate quizzes and study plan from syllabus using Groq"""
     data = request.get_json()
     syllabus_content = data.get('content', '')
     syllabus_name = data.get('name', 'My Syllabus')
     generate_type = data.get('type', 'all')  # 'quizzes', 'flashcards', 'plan', 'all'
+    mode = data.get('mode', current_app.config['GENERATION_MODE'])  # 'combined', 'separate'
 
     if not syllabus_content:
         return jsonify({'error': 'No syllabus content provided'}), 400
 
-    client = get_groq_client()
+    client = get_llm_client(current_app.config['LLM_PROVIDER'])
     if not client:
         return jsonify({'error': 'Groq API key not configured. Set GROQ_API_KEY environment variable.'}), 400
 
     db = get_db()
     user_id = session['user_id']
     results = {'quizzes': [], 'flashcards': [], 'study_plan': None}
+    errors = {}
 
     try:
-        # Save syllabus first
-        cursor = db.execute('''
-            INSERT INTO syllabi (user_id, name, content) VALUES (?, ?, ?)
-        ''', (user_id, syllabus_name, syllabus_content[:5000]))
-        syllabus_id = cursor.lastrowid
-        db.commit()
-
-        # Generate quizzes
-        if generate_type in ['quizzes', 'all']:
-            quiz_prompt = f"""Based on this syllabus/course content, generate 10 quiz questions.
-
-SYLLABUS CONTENT:
-{syllabus_content[:8000]}
-
-Return ONLY a valid JSON array with this exact format (no markdown, no explanation):
-[
-  {{
-    "question": "What is...?",
-    "type": "multiple_choice",
-    "options": ["Option A", "Option B", "Option C", "Option D"],
-    "correct_answer": "Option A",
-    "explanation": "Brief explanation why this is correct"
-  }}
-]
-
-Include a mix of multiple_choice and true_false questions. For true_false, options should be ["True", "False"]."""
-
-            response = client.chat.completions.create(
-                model="llama-3.1-8b-instant",
-                messages=[{"role": "user", "content": quiz_prompt}],
-                temperature=0.7,
-                max_tokens=3000
-            )
-
-            quiz_text = response.choices[0].message.content.strip()
-            # Clean up response
-            if quiz_text.startswith('```'):
-                quiz_text = quiz_text.split('```')[1]
-                if quiz_text.startswith('json'):
-                    quiz_text = quiz_text[4:]
-
-            try:
-                questions = json.loads(quiz_text)
-
-                # Create quiz in database
-                cursor = db.execute('''
-                    INSERT INTO quizzes (user_id, title, description, subject)
-                    VALUES (?, ?, ?, ?)
-                ''', (user_id, f"{syllabus_name} - Quiz", f"Auto-generated from syllabus", syllabus_name))
-                quiz_id = cursor.lastrowid
-
-                for i, q in enumerate(questions[:10]):
-                    q_type = q.get('type', 'multiple_choice')
-                    if q_type == 'true_false':
-                        q_type = 'true_false'
-                    else:
-                        q_type = 'multiple_choice'
-
-                    db.execute('''
-                        INSERT INTO quiz_questions (quiz_id, question_text, question_type, correct_answer, options, explanation, order_num)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        quiz_id,
-                        q.get('question', ''),
-                        q_type,
-                        q.get('correct_answer', ''),
-                        json.dumps(q.get('options', [])),
-                        q.get('explanation', ''),
-                        i + 1
-                    ))
-
-                db.commit()
-                results['quizzes'].append({'id': quiz_id, 'title': f"{syllabus_name} - Quiz", 'question_count': len(questions)})
-
-            except json.JSONDecodeError:
-                pass
-
-        # Generate flashcards
-        if generate_type in ['flashcards', 'all']:
-            flashcard_prompt = f"""Based on this syllabus/course content, generate 15 flashcards for key terms and concepts.
-
-SYLLABUS CONTENT:
-{syllabus_content[:8000]}
-
-Return ONLY a valid JSON array with this exact format (no markdown, no explanation):
-[
-  {{
-    "front": "Term or question",
-    "back": "Definition or answer"
-  }}
-]"""
-
-            response = client.chat.completions.create(
-                model="llama-3.1-8b-instant",
-                messages=[{"role": "user", "content": flashcard_prompt}],
-                temperature=0.7,
-                max_tokens=2000
-            )
-
-            flashcard_text = response.choices[0].message.content.strip()
-            if flashcard_text.startswith('```'):
-                flashcard_text = flashcard_text.split('```')[1]
-                if flashcard_text.startswith('json'):
-                    flashcard_text = flashcard_text[4:]
-
-            try:
-                cards = json.loads(flashcard_text)
-
-                # Create deck in database
-                cursor = db.execute('''
-                    INSERT INTO flashcard_decks (user_id, name, description, subject)
-                    VALUES (?, ?, ?, ?)
-                ''', (user_id, f"{syllabus_name} - Flashcards", "Auto-generated from syllabus", syllabus_name))
-                deck_id = cursor.lastrowid
-
-                for card in cards[:15]:
-                    db.execute('''
-                        INSERT INTO flashcards (deck_id, front, back)
-                        VALUES (?, ?, ?)
-                    ''', (deck_id, card.get('front', ''), card.get('back', '')))
-
-                db.commit()
-                results['flashcards'].append({'id': deck_id, 'name': f"{syllabus_name} - Flashcards", 'card_count': len(cards)})
-
-            except json.JSONDecodeError:
-                pass
-
-        # Generate study plan
-        if generate_type in ['plan', 'all']:
-            plan_prompt = f"""Based on this syllabus, create a study plan with topics and recommended Pomodoro sessions.
-
-SYLLABUS CONTENT:
-{syllabus_content[:6000]}
-
-Return ONLY a valid JSON object with this format (no markdown):
-{{
-  "topics": [
-    {{
-      "name": "Topic Name",
-      "description": "Brief description",
-      "estimated_pomodoros": 4,
-      "priority": "high"
-    }}
-  ],
-  "total_study_hours": 20,
-  "recommended_daily_pomodoros": 4
-}}"""
-
-            response = client.chat.completions.create(
-                model="llama-3.1-8b-instant",
-                messages=[{"role": "user", "content": plan_prompt}],
-                temperature=0.7,
-                max_tokens=1500
-            )
-
-            plan_text = response.choices[0].message.content.strip()
-            if plan_text.startswith('```'):
-                plan_text = plan_text.split('```')[1]
-                if plan_text.startswith('json'):
-                    plan_text = plan_text[4:]
-
-            try:
-                study_plan = json.loads(plan_text)
+        # Generate before taking the write lock; nothing is held during the LLM calls
+        generator = Generator(client)
+        sections = generator.generate(syllabus_content, GENERATE_TYPES.get(generate_type, []), mode=mode)
+        metrics.add_provider_time(generator.provider_seconds)
+
+        with transaction(db):
+            # The text itself goes to the shared blob store
+            content_hash = content_store.put(db, syllabus_content)
+            cursor = db.execute('''
+                INSERT INTO syllabi (user_id, name, content_hash) VALUES (?, ?, ?)
+            ''', (user_id, syllabus_name, content_hash))
+            syllabus_id = cursor.lastrowid
+            content_store.index_syllabus(db, syllabus_id, syllabus_content)
+
+            # Each section is saved under its own savepoint, so one that fails
+            # to save is reported without losing the syllabus or the others
+            questions = sections.get('quizzes')
+            if questions:
+                try:
+                    with transaction(db):
+                        cursor = db.execute('''
+                            INSERT INTO quizzes (user_id, title, description, subject)
+                            VALUES (?, ?, ?, ?)
+                        ''', (user_id, f"{syllabus_name} - Quiz", f"Auto-generated from syllabus", syllabus_name))
+                        quiz_id = cursor.lastrowid
+
+                        for i, q in enumerate(questions[:10]):
+                            db.execute('''
+                                INSERT INTO quiz_questions (quiz_id, question_text, question_type, correct_answer, options, explanation, order_num)
+                                VALUES (?, ?, ?, ?, ?, ?, ?)
+                            ''', (
+                                quiz_id,
+                                q['question'],
+                                q['type'],
+                                q['correct_answer'],
+                                json.dumps(q['options']),
+                                q['explanation'],
+                                i + 1
+                            ))
+                    results['quizzes'].append({'id': quiz_id, 'title': f"{syllabus_name} - Quiz", 'question_count': len(questions[:10])})
+                except (sqlite3.Error, KeyError, TypeError) as e:
+                    errors['quizzes'] = str(e)
+
+            cards = sections.get('flashcards')
+            if cards:
+                try:
+                    with transaction(db):
+                        cursor = db.execute('''
+                            INSERT INTO flashcard_decks (user_id, name, description, subject)
+                            VALUES (?, ?, ?, ?)
+                        ''', (user_id, f"{syllabus_name} - Flashcards", "Auto-generated from syllabus", syllabus_name))
+                        deck_id = cursor.lastrowid
+
+                        for card in cards[:15]:
+                            db.execute('''
+                                INSERT INTO flashcards (deck_id, front, back)
+                                VALUES (?, ?, ?)
+                            ''', (deck_id, card['front'], card['back']))
+                    results['flashcards'].append({'id': deck_id, 'name': f"{syllabus_name} - Flashcards", 'card_count': len(cards[:15])})
+                except (sqlite3.Error, KeyError, TypeError) as e:
+                    errors['flashcards'] = str(e)
+
+            study_plan = sections.get('study_plan')
+            if study_plan:
                 results['study_plan'] = study_plan
 
                 # Save study plan to syllabus record
                 db.execute('''
                     UPDATE syllabi SET study_plan = ? WHERE id = ?
                 ''', (json.dumps(study_plan), syllabus_id))
-                db.commit()
 
-            except json.JSONDecodeError:
-                pass
-
-        return jsonify({
+        response = {
             'success': True,
             'syllabus_id': syllabus_id,
-            'results': results
-        })
+            'results': results,
+            'usage': generator.usage
+        }
+        if errors:
+            response['errors'] = errors
+        return jsonify(response)
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -302,12 +203,35 @@ def view(syllabus_id):
         except:
             pass
 
-    return render_template('syllabus/view.html', syllabus=syllabus, study_plan=study_plan)
+    content = content_store.syllabus_content(db, syllabus)
+
+    return render_template('syllabus/view.html', syllabus=syllabus, study_plan=study_plan, content=content)
 
 @syllabus_bp.route('/api/syllabus/<int:syllabus_id>', methods=['DELETE'])
 @login_required
+@transactional
 def delete_syllabus(syllabus_id):
     db = get_db()
     db.execute('DELETE FROM syllabi WHERE id = ? AND user_id = ?', (syllabus_id, session['user_id']))
-    db.commit()
     return jsonify({'success': True})
+
+@syllabus_bp.cli.command('compact')
+def compact_command():
+    """Move inline syllabus text into the compressed content store."""
+    for shard, db in each_shard():
+        moved = content_store.compact_legacy(db)
+        click.echo(f'{shard_label(shard)}Moved {moved} syllabi into the content store')
+
+@syllabus_bp.cli.command('gc')
+def gc_command():
+    """Recount blob references and delete unreferenced blobs."""
+    for shard, db in each_shard():
+        deleted = content_store.collect_garbage(db)
+        click.echo(f'{shard_label(shard)}Deleted {deleted} unreferenced blobs')
+
+@syllabus_bp.cli.command('storage')
+def storage_command():
+    """Report syllabus text storage and savings from compression and dedup."""
+    for shard, db in each_shard():
+        for key, value in content_store.storage_stats(db).items():
+            click.echo(f'{shard_label(shard)}{key}: {value}')
@@ -0,0 +1,132 @@
+import time
+from datetime import datetime, timedelta
+from database.db import transaction
+
+# A guest's expiry is pushed forward on activity at most this often, so an
+# active guest costs one write per interval rather than one per request
+GUEST_TOUCH_INTERVAL = timedelta(hours=1)
+
+# Tables holding per-user data, reported before and after cleanup
+USER_TABLES = (
+    'users', 'pomodoro_settings', 'pomodoro_sessions', 'session_rollups', 'daily_stats',
+    'quizzes', 'quiz_questions', 'quiz_attempts', 'flashcard_decks', 'flashcards',
+    'deck_subscriptions', 'card_states', 'flashcard_reviews', 'deck_stats', 'study_sessions', 'study_steps',
+    'syllabi', 'content_blobs',
+)
+
+# (table, row key, column, parent table) for every reference to a parent's id.
+# Rows are swept top-down so deleting an orphaned deck or quiz cascades to
+# its children before those are checked themselves.
+ORPHAN_RULES = (
+    ('pomodoro_settings', 'rowid', 'user_id', 'users'),
+    ('pomodoro_sessions', 'rowid', 'user_id', 'users'),
+    ('session_rollups', 'user_id, granularity, period_start', 'user_id', 'users'),
+    ('daily_stats', 'rowid', 'user_id', 'users'),
+    ('syllabi', 'rowid', 'user_id', 'users'),
+    ('quizzes', 'rowid', 'user_id', 'users'),
+    ('flashcard_decks', 'rowid', 'user_id', 'users'),
+    ('quiz_questions', 'rowid', 'quiz_id', 'quizzes'),
+    ('quiz_attempts', 'rowid', 'quiz_id', 'quizzes'),
+    ('quiz_attempts', 'rowid', 'user_id', 'users'),
+    ('flashcards', 'rowid', 'deck_id', 'flashcard_decks'),
+    ('deck_subscriptions', 'user_id, deck_id', 'deck_id', 'flashcard_decks'),
+    ('deck_subscriptions', 'user_id, deck_id', 'user_id', 'users'),
+    ('card_states', 'user_id, flashcard_id', 'flashcard_id', 'flashcards'),
+    ('card_states', 'user_id, flashcard_id', 'user_id', 'users'),
+    ('flashcard_reviews', 'rowid', 'flashcard_id', 'flashcards'),
+    ('flashcard_reviews', 'rowid', 'user_id', 'users'),
+    ('deck_stats', 'deck_id, user_id', 'deck_id', 'flashcard_decks'),
+    ('deck_stats', 'deck_id, user_id', 'user_id', 'users'),
+    ('deck_due_dates', 'deck_id, user_id, due_date', 'deck_id', 'flashcard_decks'),
+    ('deck_due_dates', 'deck_id, user_id, due_date', 'user_id', 'users'),
+    ('deck_review_days', 'deck_id, user_id, day', 'deck_id', 'flashcard_decks'),
+    ('deck_review_days', 'deck_id, user_id, day', 'user_id', 'users'),
+    ('study_sessions', 'rowid', 'user_id', 'users'),
+    ('study_sessions', 'rowid', 'deck_id', 'flashcard_decks'),
+)
+
+
+def guest_expiry(ttl_hours):
+    """Expiry timestamp for a guest active now, as stored in users.expires_at"""
+    return (datetime.utcnow() + timedelta(hours=ttl_hours)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def needs_touch(user, ttl_hours):
+    """Whether a guest's expiry is old enough to be pushed forward"""
+    if not user['is_guest'] or user['expires_at'] is None:
+        return False
+    return user['expires_at'] < datetime.utcnow() + timedelta(hours=ttl_hours) - GUEST_TOUCH_INTERVAL
+
+
+def table_sizes(db):
+    sizes = {table: db.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] for table in USER_TABLES}
+    page_size = db.execute('PRAGMA page_size').fetchone()[0]
+    sizes['file_bytes'] = db.execute('PRAGMA page_count').fetchone()[0] * page_size
+    sizes['free_bytes'] = db.execute('PRAGMA freelist_count').fetchone()[0] * page_size
+    return sizes
+
+
+def _run_batches(db, delete, batch_size, pause):
+    """Call delete(batch_size) in its own write transaction until it deletes nothing.
+
+    Each batch holds the write lock only briefly; `pause` seconds between
+    batches lets waiting writers in. Returns the total rows deleted.
+    """
+    total = 0
+    while True:
+        with transaction(db):
+            deleted = delete(batch_size)
+        total += deleted
+        if deleted < batch_size:
+            return total
+        if pause:
+            time.sleep(pause)
+
+
+def reap_guests(db, batch_size=100, pause=0.0, cache=None, before_delete=None):
+    """Delete expired guest accounts with all their data, `batch_size` guests at a time.
+
+    Dependent rows go with each guest through ON DELETE CASCADE (get_db
+    enables foreign keys). Reaped ids are invalidated in `cache`, if given,
+    so no worker keeps serving a cached user row. `before_delete(ids)`, if
+    given, runs first in each batch, e.g. to delete data held on other
+    shards. Returns the number of guests deleted.
+    """
+    def delete(limit):
+        ids = [row[0] for row in db.execute('''
+            SELECT id FROM users
+            WHERE is_guest = 1 AND expires_at <= CURRENT_TIMESTAMP
+            LIMIT ?
+        ''', (limit,))]
+        if before_delete is not None:
+            before_delete(ids)
+        db.executemany('DELETE FROM users WHERE id = ?', [(i,) for i in ids])
+        if cache is not None:
+            for user_id in ids:
+                cache.invalidate(db, user_id)
+        return len(ids)
+
+    return _run_batches(db, delete, batch_size, pause)
+
+
+def sweep_orphans(db, batch_size=1000, pause=0.0):
+    """Delete rows whose parent no longer exists, in batches of `batch_size` rows.
+
+    Cleans up after deletions made while foreign keys were not enforced.
+    Returns {table: rows deleted} for tables that had orphans.
+    """
+    swept = {}
+    for table, key, column, parent in ORPHAN_RULES:
+        def delete(limit):
+            return db.execute(f'''
+                DELETE FROM {table} WHERE ({key}) IN (
+                    SELECT {key} FROM {table}
+                    WHERE {column} NOT IN (SELECT id FROM {parent})
+                    LIMIT ?
+                )
+            ''', (limit,)).rowcount
+
+        deleted = _run_batches(db, delete, batch_size, pause)
+        if deleted:
+            swept[table] = swept.get(table, 0) + deleted
+    return swept
@@ -0,0 +1,150 @@
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from functools import wraps
+from flask import current_app, jsonify, request, session
+from services import metrics
+
+# Weight of the latest request in the running average of slot hold times
+HOLD_SMOOTHING = 0.2
+MAX_RETRY_AFTER = 60
+
+
+class Rejected(Exception):
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Gate:
+    """Bounded concurrency for expensive requests in one worker process.
+
+    At most `slots` requests hold the gate at once and at most `queue_size`
+    wait for it; anything beyond that is rejected at once, so the worker's
+    remaining threads stay free for cheap requests. Each user may have
+    `per_user` requests running or waiting. A freed slot goes to the
+    waiting user with the fewest requests running, oldest first among
+    equals, so one user's burst cannot starve everyone else. A request
+    that waits longer than `timeout` seconds is rejected.
+    """
+
+    def __init__(self, name, slots, queue_size, per_user, timeout):
+        self.name = name
+        self.slots = slots
+        self.queue_size = queue_size
+        self.per_user = per_user
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._running = {}
+        self._waiting = OrderedDict()
+        self._depth = 0
+        self._hold = 1.0
+
+    def _retry_after(self):
+        # Roughly when a slot frees up for a request joining the back of the queue
+        seconds = self._hold * (self._depth + 1) / max(1, self.slots)
+        return min(MAX_RETRY_AFTER, max(1, math.ceil(seconds)))
+
+    def _grant(self, user):
+        self._running[user] = self._running.get(user, 0) + 1
+
+    def _dispatch(self):
+        while self._waiting and sum(self._running.values()) < self.slots:
+            user = min(self._waiting, key=lambda u: self._running.get(u, 0))
+            tickets = self._waiting[user]
+            ticket = tickets.popleft()
+            if tickets:
+                # Back of the line behind the other waiting users
+                self._waiting.move_to_end(user)
+            else:
+                del self._waiting[user]
+            self._depth -= 1
+            ticket['granted'] = True
+            self._grant(user)
+        self._cond.notify_all()
+
+    def acquire(self, user):
+        """Take a slot for `user`, waiting in line if need be; raises Rejected"""
+        with self._cond:
+            queued = len(self._waiting.get(user, ()))
+            if self._running.get(user, 0) + queued >= self.per_user:
+                raise Rejected('user quota', self._retry_after())
+            if not self._waiting and sum(self._running.values()) < self.slots:
+                self._grant(user)
+                return 0.0
+            if self._depth >= self.queue_size:
+                raise Rejected('queue full', self._retry_after())
+
+            ticket = {'granted': False}
+            self._waiting.setdefault(user, deque()).append(ticket)
+            self._depth += 1
+            metrics.registry.add('admission_queue_depth', metrics.labels(gate=self.name), 1)
+            started = time.monotonic()
+            try:
+                if not self._cond.wait_for(lambda: ticket['granted'], self.timeout):
+                    self._waiting[user].remove(ticket)
+                    if not self._waiting[user]:
+                        del self._waiting[user]
+                    self._depth -= 1
+                    raise Rejected('queue timeout', self._retry_after())
+            finally:
+                metrics.registry.add('admission_queue_depth', metrics.labels(gate=self.name), -1)
+            return time.monotonic() - started
+
+    def release(self, user, held):
+        with self._cond:
+            self._running[user] -= 1
+            if not self._running[user]:
+                del self._running[user]
+            self._hold += HOLD_SMOOTHING * (held - self._hold)
+            self._dispatch()
+
+
+def _user():
+    return session.get('user_id') or f'ip:{request.remote_addr}'
+
+
+def expensive(f):
+    """Run a view under the app's admission gate, answering 429 when it is full.
+
+    Apply below login_required so requests are queued per user.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        gate = current_app.extensions.get('admission')
+        if gate is None:
+            return f(*args, **kwargs)
+
+        user = _user()
+        labels = metrics.labels(gate=gate.name)
+        try:
+            waited = gate.acquire(user)
+        except Rejected as e:
+            metrics.registry.inc('admission_rejected_total', metrics.labels(gate=gate.name, reason=e.reason))
+            message = f'The server is busy with requests like this one. Please try again in {e.retry_after} seconds.'
+            return jsonify({'error': message}), 429, {'Retry-After': str(e.retry_after)}
+
+        metrics.registry.observe('admission_wait_seconds', labels, waited)
+        metrics.registry.add('admission_in_use', labels, 1)
+        started = time.monotonic()
+        try:
+            return f(*args, **kwargs)
+        finally:
+            metrics.registry.add('admission_in_use', labels, -1)
+            gate.release(user, time.monotonic() - started)
+    return decorated_function
+
+
+def init_app(app):
+    """Gate @expensive views, unless ADMISSION_SLOTS is 0"""
+    if app.config['ADMISSION_SLOTS'] <= 0:
+        return
+    app.extensions['admission'] = Gate(
+        'expensive',
+        app.config['ADMISSION_SLOTS'],
+        app.config['ADMISSION_QUEUE'],
+        app.config['ADMISSION_PER_USER'],
+        app.config['ADMISSION_QUEUE_TIMEOUT'],
+    )
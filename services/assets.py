@@ -0,0 +1,138 @@
+import gzip
+import hashlib
+import json
+import os
+from flask import current_app, url_for
+
+MANIFEST = 'manifest.json'
+# Extensions the build minifies, fingerprints and precompresses
+BUILT = ('.js', '.css')
+# Smaller than this, compression costs more in headers than it saves
+MIN_COMPRESS_BYTES = 256
+# Precompressed variants written next to each built file
+SUFFIXES = ('.gz', '.br')
+
+
+def _minify(path, source):
+    # Imported here: only the build step needs them
+    if path.endswith('.js'):
+        from rjsmin import jsmin
+        return jsmin(source)
+    from rcssmin import cssmin
+    return cssmin(source)
+
+
+def _brotli(data):
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli.compress(data, quality=11)
+
+
+def _write(path, data):
+    # Renamed into place so a worker serving the file never reads it half-written
+    partial = f'{path}.{os.getpid()}.tmp'
+    with open(partial, 'wb') as f:
+        f.write(data)
+    os.replace(partial, path)
+
+
+def build(static_dir, out_dir):
+    """Minify, content-hash and precompress every script and stylesheet.
+
+    `static_dir/js/main.js` becomes `out_dir/js/main.<hash>.js` plus `.gz`
+    and, if the brotli package is installed, `.br` variants. The manifest
+    maps each source path to its built name. Files from earlier builds are
+    kept, since running workers still link them until they reload the
+    manifest; prune() removes them. Returns
+    {source: {'source', 'minified', 'gzip', 'brotli'}} sizes in bytes.
+    """
+    manifest, sizes = {}, {}
+
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = [d for d in dirs if os.path.abspath(os.path.join(root, d)) != os.path.abspath(out_dir)]
+        for name in sorted(files):
+            if not name.endswith(BUILT):
+                continue
+            source_path = os.path.join(root, name)
+            logical = os.path.relpath(source_path, static_dir).replace(os.sep, '/')
+            with open(source_path, encoding='utf-8') as f:
+                source = f.read()
+            data = _minify(name, source).encode('utf-8')
+
+            stem, ext = os.path.splitext(logical)
+            built = f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+            target = os.path.join(out_dir, built)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            _write(target, data)
+
+            compressed = {'gzip': None, 'brotli': None}
+            if len(data) >= MIN_COMPRESS_BYTES:
+                # mtime=0 keeps the output identical across builds
+                compressed['gzip'] = gzip.compress(data, compresslevel=9, mtime=0)
+                compressed['brotli'] = _brotli(data)
+            for encoding, suffix in zip(('gzip', 'brotli'), SUFFIXES):
+                if compressed[encoding] is not None:
+                    _write(target + suffix, compressed[encoding])
+
+            manifest[logical] = built
+            sizes[logical] = {
+                'source': len(source.encode('utf-8')),
+                'minified': len(data),
+                'gzip': len(compressed['gzip']) if compressed['gzip'] else None,
+                'brotli': len(compressed['brotli']) if compressed['brotli'] else None,
+            }
+
+    os.makedirs(out_dir, exist_ok=True)
+    _write(os.path.join(out_dir, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return sizes
+
+
+def prune(out_dir):
+    """Delete built files the current manifest no longer links; returns their paths.
+
+    Run once every worker has restarted on the new build.
+    """
+    current = set(load_manifest(out_dir).values())
+    removed = []
+    for root, dirs, files in os.walk(out_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            built = os.path.relpath(path, out_dir).replace(os.sep, '/')
+            for suffix in SUFFIXES:
+                built = built.removesuffix(suffix)
+            if built != MANIFEST and built not in current:
+                os.remove(path)
+                removed.append(path)
+    return removed
+
+
+def load_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def asset_url(endpoint, **values):
+    """url_for() that points static scripts and stylesheets at their built copies.
+
+    Built files have a content hash in the name, so they can be cached
+    forever; anything not in the manifest falls through to url_for(), as
+    does everything in debug mode so edited sources show up without a
+    rebuild.
+    """
+    if endpoint == 'static' and not current_app.debug:
+        built = current_app.extensions['asset_manifest'].get(values.get('filename'))
+        if built:
+            values['filename'] = built
+            return url_for('assets.serve', **values)
+    return url_for(endpoint, **values)
+
+
+def init_app(app):
+    """Load the manifest written by `flask assets build` and expose asset_url() to templates"""
+    app.extensions['asset_manifest'] = load_manifest(app.config['ASSETS_DIR'])
+    app.jinja_env.globals['asset_url'] = asset_url
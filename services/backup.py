@@ -0,0 +1,101 @@
+import glob
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+PREFIX = 'myzenbrain-'
+SUFFIX = '.db'
+# Incremental copies restart whenever another connection commits; after
+# this many restarts the rest is copied in one step instead
+MAX_RESTARTS = 5
+
+
+class BackupError(Exception):
+    pass
+
+
+class _Restarted(Exception):
+    pass
+
+
+def copy(source_path, target_path, pages=256, sleep=0.05):
+    """Copy a live database with the online backup API, `pages` pages per step.
+
+    Between steps the source is unlocked for `sleep` seconds, so even in
+    rollback-journal mode writers are held up for one step at most. Every
+    commit by another connection makes SQLite start the copy over; if that
+    keeps happening, the copy is finished in a single step, which under
+    WAL still does not block writers. Returns the number of restarts.
+    """
+    restarts = 0
+    remaining = None
+
+    def progress(status, left, total):
+        nonlocal restarts, remaining
+        if remaining is not None and left > remaining:
+            restarts += 1
+            if restarts > MAX_RESTARTS:
+                raise _Restarted()
+        remaining = left
+        # backup() itself only sleeps when a step finds the source locked
+        if left and sleep:
+            time.sleep(sleep)
+
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(target_path)
+    try:
+        try:
+            source.backup(target, pages=pages, progress=progress)
+        except _Restarted:
+            source.backup(target)
+        # A standalone file: no -wal or -shm needed to open it
+        target.execute('PRAGMA journal_mode = DELETE')
+    finally:
+        target.close()
+        source.close()
+    return restarts
+
+
+def verify(path):
+    """Raise BackupError unless the file passes PRAGMA integrity_check"""
+    db = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        problems = [row[0] for row in db.execute('PRAGMA integrity_check')]
+    finally:
+        db.close()
+    if problems != ['ok']:
+        raise BackupError(f'{path} failed integrity check: {"; ".join(problems[:5])}')
+
+
+def rotate(directory, keep):
+    """Delete all but the newest `keep` backups in directory; returns the deleted paths"""
+    backups = sorted(glob.glob(os.path.join(directory, f'{PREFIX}*{SUFFIX}')))
+    stale = backups[:-keep] if keep > 0 else []
+    for path in stale:
+        os.remove(path)
+    return stale
+
+
+def backup(source_path, directory, keep=7, pages=256, sleep=0.05):
+    """Write a verified, timestamped copy of the database into directory.
+
+    The copy is checked with integrity_check before it gets its final
+    name, so a file matching the backup pattern is always usable. Older
+    backups beyond `keep` are then removed. Returns (path, restarts,
+    seconds taken).
+    """
+    started = time.monotonic()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{PREFIX}{datetime.now().strftime("%Y%m%d-%H%M%S")}{SUFFIX}')
+    tmp = path + '.tmp'
+    try:
+        restarts = copy(source_path, tmp, pages, sleep)
+        verify(tmp)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    os.replace(tmp, path)
+    rotate(directory, keep)
+    return path, restarts, time.monotonic() - started
@@ -0,0 +1,99 @@
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+
+
+class UserCache:
+    """Read-through, per-process cache for hot per-user lookups.
+
+    Entries expire after `ttl` seconds and the least recently used ones are
+    evicted beyond `maxsize`. `loader(db, key)` fetches a missing value.
+
+    Writers call `invalidate(db, key)` inside their transaction. That drops
+    the local entry and records the key with a new generation number in
+    cache_invalidations, which every other worker polls at most once per
+    CACHE_SYNC_INTERVAL seconds to evict its own stale copies. Setting the
+    interval to 0 turns cross-process invalidation off, leaving TTL only.
+    With shards, each database file has its own invalidations and is
+    polled separately; a key is always read through the shard that holds it.
+    """
+
+    def __init__(self, name, loader, ttl=300, maxsize=1024):
+        self.name = name
+        self.loader = loader
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Database file -> [last generation seen, monotonic time of last poll]
+        self._synced = {}
+
+    def get(self, db, key):
+        self._sync(db)
+        key = str(key)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+        value = self.loader(db, key)
+
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = (value, now + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, db, key):
+        key = str(key)
+        with self._lock:
+            self._entries.pop(key, None)
+
+        if self._sync_interval() > 0:
+            db.execute('''
+                INSERT INTO cache_invalidations (name, key, generation)
+                VALUES (?, ?, (SELECT COALESCE(MAX(generation), 0) + 1 FROM cache_invalidations WHERE name = ?))
+                ON CONFLICT (name, key) DO UPDATE SET generation = excluded.generation
+            ''', (self.name, key, self.name))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _sync_interval(self):
+        return current_app.config.get('CACHE_SYNC_INTERVAL', 1.0)
+
+    def _sync(self, db):
+        interval = self._sync_interval()
+        now = time.monotonic()
+        synced = self._synced.get(getattr(db, 'path', None))
+        if interval <= 0 or (synced is not None and now - synced[1] < interval):
+            return
+
+        if synced is None:
+            generation = db.execute(
+                'SELECT COALESCE(MAX(generation), 0) FROM cache_invalidations WHERE name = ?', (self.name,)
+            ).fetchone()[0]
+            self._synced[getattr(db, 'path', None)] = [generation, now]
+            self.clear()
+            return
+        synced[1] = now
+
+        rows = db.execute(
+            'SELECT key, generation FROM cache_invalidations WHERE name = ? AND generation > ?',
+            (self.name, synced[0])
+        ).fetchall()
+        if rows:
+            with self._lock:
+                for row in rows:
+                    self._entries.pop(row['key'], None)
+            synced[0] = max(row['generation'] for row in rows)
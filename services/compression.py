@@ -0,0 +1,56 @@
+import gzip
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = ('application/json', 'text/html', 'text/plain', 'text/css', 'text/javascript',
+                'application/javascript')
+# Levels tuned for per-request work rather than maximum ratio
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def _encoding():
+    """The best encoding the client accepts, or None"""
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress_response(response, min_bytes):
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE
+            or 'no-transform' in response.headers.get('Cache-Control', '')):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    encoding = _encoding()
+    if encoding is None or len(data) < min_bytes:
+        return response
+
+    if encoding == 'br':
+        data = brotli.compress(data, quality=BROTLI_QUALITY)
+    else:
+        data = gzip.compress(data, compresslevel=GZIP_LEVEL)
+    response.set_data(data)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_app(app):
+    """Compress larger responses with brotli or gzip, whichever the client prefers.
+
+    Turn off with COMPRESS_RESPONSES if a reverse proxy already compresses.
+    Files sent with send_file (e.g. built assets) are left alone.
+    """
+    if not app.config['COMPRESS_RESPONSES']:
+        return
+    min_bytes = app.config['COMPRESS_MIN_BYTES']
+    app.after_request(lambda response: compress_response(response, min_bytes))
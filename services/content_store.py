@@ -0,0 +1,96 @@
+import hashlib
+import zlib
+
+COMPRESSION_LEVEL = 9
+# Characters of syllabus text copied into the full-text index
+SEARCH_CONTENT_LIMIT = 5000
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def put(db, text):
+    """Store `text` compressed, deduplicated by hash, and return the hash.
+
+    The blob starts with no references; the syllabi triggers count a
+    reference once a row points at it.
+    """
+    digest = content_hash(text)
+    exists = db.execute('SELECT 1 FROM content_blobs WHERE hash = ?', (digest,)).fetchone()
+    if not exists:
+        raw = text.encode('utf-8')
+        db.execute(
+            'INSERT INTO content_blobs (hash, data, size) VALUES (?, ?, ?)',
+            (digest, zlib.compress(raw, COMPRESSION_LEVEL), len(raw))
+        )
+    return digest
+
+
+def get(db, digest):
+    row = db.execute('SELECT data FROM content_blobs WHERE hash = ?', (digest,)).fetchone()
+    if row is None:
+        return None
+    return zlib.decompress(row['data']).decode('utf-8')
+
+
+def syllabus_content(db, syllabus):
+    """Full text of a syllabus row, decompressed on demand"""
+    if syllabus['content_hash']:
+        return get(db, syllabus['content_hash']) or ''
+    return syllabus['content'] or ''
+
+
+def index_syllabus(db, syllabus_id, text):
+    db.execute('UPDATE syllabi_fts SET content = ? WHERE rowid = ?', (text[:SEARCH_CONTENT_LIMIT], syllabus_id))
+
+
+def collect_garbage(db):
+    """Recount references from syllabi and drop unreferenced blobs.
+
+    Triggers keep ref_count current on every insert, update and delete;
+    this repairs counts after out-of-band edits and removes blobs left over
+    from failed inserts. Returns the number of blobs deleted.
+    """
+    db.execute('''
+        UPDATE content_blobs SET ref_count = (
+            SELECT COUNT(*) FROM syllabi WHERE syllabi.content_hash = content_blobs.hash
+        )
+    ''')
+    deleted = db.execute('DELETE FROM content_blobs WHERE ref_count <= 0').rowcount
+    db.commit()
+    return deleted
+
+
+def compact_legacy(db):
+    """Move text stored inline in syllabi.content into the blob store"""
+    rows = db.execute(
+        'SELECT id, content FROM syllabi WHERE content_hash IS NULL AND content IS NOT NULL'
+    ).fetchall()
+    for row in rows:
+        digest = put(db, row['content'])
+        db.execute('UPDATE syllabi SET content_hash = ?, content = NULL WHERE id = ?', (digest, row['id']))
+    db.commit()
+    return len(rows)
+
+
+def storage_stats(db):
+    """Logical vs stored bytes for syllabus text"""
+    logical = db.execute('''
+        SELECT COALESCE(SUM(b.size), 0) FROM syllabi s JOIN content_blobs b ON b.hash = s.content_hash
+    ''').fetchone()[0]
+    unique, stored, blobs = db.execute(
+        'SELECT COALESCE(SUM(size), 0), COALESCE(SUM(LENGTH(data)), 0), COUNT(*) FROM content_blobs'
+    ).fetchone()
+    inline = db.execute(
+        'SELECT COALESCE(SUM(LENGTH(CAST(content AS BLOB))), 0) FROM syllabi WHERE content IS NOT NULL'
+    ).fetchone()[0]
+
+    return {
+        'syllabi': db.execute('SELECT COUNT(*) FROM syllabi').fetchone()[0],
+        'blobs': blobs,
+        'logical_bytes': logical + inline,
+        'unique_bytes': unique,
+        'stored_bytes': stored + inline,
+        'savings_pct': round(100 * (1 - (stored + inline) / (logical + inline)), 1) if logical + inline else 0.0,
+    }
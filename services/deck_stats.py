@@ -0,0 +1,133 @@
+from datetime import date, timedelta
+
+# Interval from which a card counts as mature; the deck_stats triggers in
+# schema.sql use the same threshold
+MATURE_INTERVAL = 21
+# Trailing windows, in days, that review counts and retention are reported over
+WINDOWS = (1, 7, 30)
+
+# Cards of a deck due for the user on :today, from deck_stats aliased st:
+# every card without a state, plus reviewed ones due by then
+DUE_COUNT = '''
+    COALESCE(st.cards - st.learning - st.young - st.mature, 0) + COALESCE((
+        SELECT SUM(dd.cards) FROM deck_due_dates dd
+        WHERE dd.deck_id = st.deck_id AND dd.user_id = st.user_id AND dd.due_date <= :today
+    ), 0)
+'''
+
+# (table, primary key columns, query recomputing it from the source tables)
+REBUILDS = (
+    ('deck_stats', 2, f'''
+        SELECT m.deck_id, m.user_id, COUNT(f.id),
+               COALESCE(SUM(s.repetitions = 0), 0),
+               COALESCE(SUM(s.repetitions > 0 AND s.interval_days < {MATURE_INTERVAL}), 0),
+               COALESCE(SUM(s.repetitions > 0 AND s.interval_days >= {MATURE_INTERVAL}), 0),
+               COALESCE(SUM(s.ease_factor), 0)
+        FROM (
+            SELECT id as deck_id, user_id FROM flashcard_decks
+            UNION SELECT deck_id, user_id FROM deck_subscriptions
+        ) m
+        LEFT JOIN flashcards f ON f.deck_id = m.deck_id
+        LEFT JOIN card_states s ON s.flashcard_id = f.id AND s.user_id = m.user_id
+        GROUP BY m.deck_id, m.user_id
+    '''),
+    ('deck_due_dates', 3, '''
+        SELECT f.deck_id, s.user_id, s.next_review_date, COUNT(*)
+        FROM card_states s JOIN flashcards f ON f.id = s.flashcard_id
+        GROUP BY f.deck_id, s.user_id, s.next_review_date
+    '''),
+    ('deck_review_days', 3, '''
+        SELECT f.deck_id, r.user_id, DATE(r.reviewed_at), COUNT(*),
+               SUM(r.is_recall), SUM(r.is_recall AND r.quality >= 3)
+        FROM flashcard_reviews r JOIN flashcards f ON f.id = r.flashcard_id
+        GROUP BY f.deck_id, r.user_id, DATE(r.reviewed_at)
+    '''),
+)
+
+
+def _retention(recalls, passed):
+    return round(passed / recalls, 4) if recalls else None
+
+
+def summary(db, deck_id, user_id, today=None):
+    """A user's statistics for a deck they can study, or None without a stats row.
+
+    Read from the precomputed tables: one deck_stats row, the due date
+    counts up to a week ahead and at most WINDOWS[-1] days of review
+    counts. Retention is the share of recalls (reviews of cards last
+    reviewed on an earlier day, not relearning in a study session)
+    answered with quality 3 or more.
+    """
+    today = today or date.today()
+    params = {'deck_id': deck_id, 'user_id': user_id, 'today': today.isoformat()}
+    row = db.execute(f'''
+        SELECT st.*, {DUE_COUNT} as due,
+               COALESCE((
+                   SELECT SUM(dd.cards) FROM deck_due_dates dd
+                   WHERE dd.deck_id = st.deck_id AND dd.user_id = st.user_id
+                     AND dd.due_date > :today AND dd.due_date <= DATE(:today, '+7 days')
+               ), 0) as due_later_this_week
+        FROM deck_stats st WHERE st.deck_id = :deck_id AND st.user_id = :user_id
+    ''', params).fetchone()
+    if row is None:
+        return None
+
+    reviewed = row['learning'] + row['young'] + row['mature']
+    days = db.execute('''
+        SELECT day, reviews, recalls, recalls_passed FROM deck_review_days
+        WHERE deck_id = :deck_id AND user_id = :user_id AND day > DATE(:today, :since)
+    ''', dict(params, since=f'-{WINDOWS[-1]} days')).fetchall()
+
+    windows = []
+    for window in WINDOWS:
+        start = today - timedelta(days=window)
+        in_window = [d for d in days if d['day'] > start]
+        recalls = sum(d['recalls'] for d in in_window)
+        passed = sum(d['recalls_passed'] for d in in_window)
+        windows.append({
+            'days': window,
+            'reviews': sum(d['reviews'] for d in in_window),
+            'recalls': recalls,
+            'retention': _retention(recalls, passed),
+        })
+
+    return {
+        'deck_id': deck_id,
+        'cards': row['cards'],
+        'maturity': {
+            'new': row['cards'] - reviewed,
+            'learning': row['learning'],
+            'young': row['young'],
+            'mature': row['mature'],
+        },
+        'due': {'today': row['due'], 'next_7_days': row['due'] + row['due_later_this_week']},
+        'average_ease': round(row['ease_sum'] / reviewed, 3) if reviewed else None,
+        'windows': windows,
+    }
+
+
+def _snapshot(db, table, key_size):
+    # ease_sum drifts by float rounding as it is added to and subtracted from
+    return {
+        tuple(row[:key_size]): tuple(round(v, 6) if isinstance(v, float) else v for v in row[key_size:])
+        for row in db.execute(f'SELECT * FROM {table}')
+    }
+
+
+def rebuild(db):
+    """Recompute the deck statistics tables from cards, states and reviews.
+
+    Returns {table: (rows, rows that differed from the maintained values)},
+    the second being rows that were missing, extra or wrong before the
+    rebuild; anything but 0 points at a write the triggers miss.
+    """
+    results = {}
+    with db:
+        for table, key_size, query in REBUILDS:
+            before = _snapshot(db, table, key_size)
+            db.execute(f'DELETE FROM {table}')
+            db.execute(f'INSERT INTO {table} {query}')
+            after = _snapshot(db, table, key_size)
+            differed = sum(before.get(key) != after.get(key) for key in before.keys() | after.keys())
+            results[table] = (len(after), differed)
+    return results
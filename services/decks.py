@@ -0,0 +1,257 @@
+from datetime import date, timedelta
+from database.db import get_directory_db, transaction
+from services import revisions, sqljson
+
+# Card content joined with the studying user's scheduling state. Cards the
+# user has never reviewed have no card_states row and report SM-2 defaults,
+# due from the day they were created.
+CARD_WITH_STATE = '''
+    SELECT f.id, f.deck_id, f.front, f.back, f.created_at,
+           COALESCE(s.ease_factor, 2.5) as ease_factor,
+           COALESCE(s.interval_days, 1) as interval_days,
+           COALESCE(s.repetitions, 0) as repetitions,
+           COALESCE(s.next_review_date, DATE(f.created_at)) as next_review_date,
+           s.last_reviewed_at
+    FROM flashcards f
+    LEFT JOIN card_states s ON s.flashcard_id = f.id AND s.user_id = :user_id
+'''
+# CARD_WITH_STATE's columns as (name, is_date) for sqljson; the COALESCEd
+# next_review_date has no declared type, so it was never a date
+CARD_COLUMNS = [
+    ('id', False), ('deck_id', False), ('front', False), ('back', False), ('created_at', True),
+    ('ease_factor', False), ('interval_days', False), ('repetitions', False),
+    ('next_review_date', False), ('last_reviewed_at', True),
+]
+
+# Decks a user can study: their own plus public decks they subscribed to
+STUDYABLE_DECK_IDS = '''
+    SELECT id FROM flashcard_decks WHERE user_id = :user_id
+    UNION ALL
+    SELECT s.deck_id FROM deck_subscriptions s
+    JOIN flashcard_decks d ON d.id = s.deck_id AND d.is_public = 1
+    WHERE s.user_id = :user_id
+'''
+
+
+def deck_sources(db):
+    """Databases holding decks the user behind `db` can study.
+
+    With SHARD_COUNT > 1 public decks live in the main database, where
+    users on every shard reach them (services/shards.publish_deck), so a
+    user on another shard has decks in both.
+    """
+    directory = get_directory_db()
+    return [db] if db is directory else [db, directory]
+
+
+def _locate(db, table, row_id):
+    for source in deck_sources(db):
+        if source.execute(f'SELECT 1 FROM {table} WHERE id = ?', (row_id,)).fetchone():
+            return source
+    return db
+
+
+def deck_db(db, deck_id):
+    """The database of deck_sources(db) holding a deck; `db` if none does"""
+    return _locate(db, 'flashcard_decks', deck_id)
+
+
+def card_db(db, card_id):
+    return _locate(db, 'flashcards', card_id)
+
+
+def session_db(db, session_id):
+    """Study sessions are kept next to their deck"""
+    return _locate(db, 'study_sessions', session_id)
+
+
+def can_study(db, deck_id, user_id):
+    return db.execute(
+        f'SELECT 1 FROM ({STUDYABLE_DECK_IDS}) WHERE id = :deck_id',
+        {'user_id': user_id, 'deck_id': deck_id}
+    ).fetchone() is not None
+
+
+def owns_deck(db, deck_id, user_id):
+    return db.execute(
+        'SELECT 1 FROM flashcard_decks WHERE id = ? AND user_id = ?', (deck_id, user_id)
+    ).fetchone() is not None
+
+
+DECK_CARDS = CARD_WITH_STATE + ' WHERE f.deck_id = :deck_id ORDER BY f.created_at'
+
+DUE_CARDS = CARD_WITH_STATE + '''
+    WHERE f.deck_id = :deck_id AND (s.next_review_date IS NULL OR s.next_review_date <= :today)
+    ORDER BY s.next_review_date IS NOT NULL, s.next_review_date ASC
+'''
+
+
+def deck_cards(db, deck_id, user_id):
+    return db.execute(DECK_CARDS, {'user_id': user_id, 'deck_id': deck_id}).fetchall()
+
+
+def deck_cards_json(db, deck_id, user_id):
+    """deck_cards() as a JSON array, serialized by SQLite"""
+    return db.execute(
+        sqljson.array_sql(DECK_CARDS, CARD_COLUMNS), {'user_id': user_id, 'deck_id': deck_id}
+    ).fetchone()[0]
+
+
+def due_cards(db, deck_id, user_id, today=None):
+    today = today or date.today().isoformat()
+    return db.execute(DUE_CARDS, {'user_id': user_id, 'deck_id': deck_id, 'today': today}).fetchall()
+
+
+def due_cards_json(db, deck_id, user_id, today=None):
+    """due_cards() as a JSON array, serialized by SQLite"""
+    today = today or date.today().isoformat()
+    return db.execute(
+        sqljson.array_sql(DUE_CARDS, CARD_COLUMNS), {'user_id': user_id, 'deck_id': deck_id, 'today': today}
+    ).fetchone()[0]
+
+
+def get_state(db, card_id, user_id):
+    """The user's SM-2 state for a card as (ease_factor, interval_days, repetitions)"""
+    state = db.execute(
+        'SELECT ease_factor, interval_days, repetitions FROM card_states WHERE user_id = ? AND flashcard_id = ?',
+        (user_id, card_id)
+    ).fetchone()
+    if state is None:
+        return 2.5, 1, 0
+    return state['ease_factor'], state['interval_days'], state['repetitions']
+
+
+def save_state(db, card_id, user_id, ease_factor, interval, repetitions, next_review):
+    db.execute('''
+        INSERT INTO card_states (user_id, flashcard_id, ease_factor, interval_days, repetitions, next_review_date, last_reviewed_at)
+        VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT (user_id, flashcard_id) DO UPDATE SET
+            ease_factor = excluded.ease_factor,
+            interval_days = excluded.interval_days,
+            repetitions = excluded.repetitions,
+            next_review_date = excluded.next_review_date,
+            last_reviewed_at = excluded.last_reviewed_at
+    ''', (user_id, card_id, ease_factor, interval, repetitions, next_review))
+
+
+def review(db, card, user_id, quality, stats_db=None):
+    """Apply one SM-2 review of `card` (a row with id and deck_id) by the user.
+
+    Updates their card state, logs the review and counts it in today's
+    stats, which go to `stats_db` (the user's own database) when the card
+    lives elsewhere. Quality: 0-1 complete failure, 2 correct with
+    difficulty, 3 correct with hesitation, 4 correct easily, 5 perfect.
+    Returns (next review date, interval in days).
+    """
+    stats_db = stats_db or db
+    # Get current values (this user's state; defaults if never reviewed)
+    ease_factor, interval, repetitions = get_state(db, card['id'], user_id)
+    is_recall = _is_recall(db, card, user_id)
+
+    # Apply SM-2 algorithm
+    if quality < 3:
+        # Failed - reset
+        repetitions = 0
+        interval = 1
+    else:
+        # Success
+        if repetitions == 0:
+            interval = 1
+        elif repetitions == 1:
+            interval = 6
+        else:
+            interval = int(interval * ease_factor)
+
+        repetitions += 1
+
+    # Update ease factor
+    ease_factor = max(1.3, ease_factor + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+
+    # Calculate next review date
+    next_review = date.today() + timedelta(days=interval)
+
+    # Update this user's card state
+    save_state(db, card['id'], user_id, ease_factor, interval, repetitions, next_review.isoformat())
+    revisions.bump(db, 'card_states', f'{user_id}:{card["deck_id"]}')
+
+    log_review(db, card, user_id, quality, is_recall, stats_db)
+    return next_review, interval
+
+
+def _is_recall(db, card, user_id):
+    # Only recalls count towards retention (services/deck_stats.py): the
+    # card was last reviewed on an earlier day and is not being relearned
+    # in today's study session. Learning steps don't move last_reviewed_at,
+    # but they only happen while the card has a study_steps row. Days are
+    # local, like study_date; last_reviewed_at is a UTC CURRENT_TIMESTAMP.
+    row = db.execute('''
+        SELECT DATE(s.last_reviewed_at, 'localtime') < :today AND NOT EXISTS (
+            SELECT 1 FROM study_sessions ss
+            JOIN study_steps st ON st.session_id = ss.id AND st.flashcard_id = s.flashcard_id
+            WHERE ss.user_id = s.user_id AND ss.deck_id = :deck_id AND ss.study_date = :today
+        )
+        FROM card_states s WHERE s.user_id = :user_id AND s.flashcard_id = :card_id
+    ''', {
+        'user_id': user_id, 'card_id': card['id'], 'deck_id': card['deck_id'], 'today': date.today().isoformat()
+    }).fetchone()
+    return bool(row and row[0])
+
+
+def log_review(db, card, user_id, quality, is_recall=False, stats_db=None):
+    """Log an answer to `card` and count it in today's stats, leaving its schedule alone"""
+    stats_db = stats_db or db
+    db.execute('''
+        INSERT INTO flashcard_reviews (flashcard_id, user_id, quality, is_recall)
+        VALUES (?, ?, ?, ?)
+    ''', (card['id'], user_id, quality, int(is_recall)))
+
+    # Update daily stats
+    stats_db.execute('''
+        INSERT INTO daily_stats (user_id, date, cards_reviewed) VALUES (?, ?, 1)
+        ON CONFLICT (user_id, date) DO UPDATE SET cards_reviewed = cards_reviewed + 1
+    ''', (user_id, date.today().isoformat()))
+    revisions.bump(stats_db, 'daily_stats', user_id)
+
+
+def fork_deck(db, deck_id, user_id, target=None):
+    """Copy a subscribed deck into one owned by the user, keeping their progress.
+
+    This is the copy in copy-on-write: subscribers study the shared rows
+    until they want to edit, at which point they get their own cards.
+    The copy goes to `target`, the user's own database, when the deck is
+    in another one. Returns the new deck id.
+    """
+    target = target or db
+    deck = db.execute('SELECT * FROM flashcard_decks WHERE id = ?', (deck_id,)).fetchone()
+    with transaction(target):
+        cursor = target.execute('''
+            INSERT INTO flashcard_decks (user_id, name, description, subject)
+            VALUES (?, ?, ?, ?)
+        ''', (user_id, deck['name'], deck['description'], deck['subject']))
+        new_deck_id = cursor.lastrowid
+
+        for card in db.execute('''
+            SELECT f.id, f.front, f.back, s.ease_factor, s.interval_days, s.repetitions,
+                   s.next_review_date, s.last_reviewed_at
+            FROM flashcards f LEFT JOIN card_states s ON s.flashcard_id = f.id AND s.user_id = ?
+            WHERE f.deck_id = ?
+        ''', (user_id, deck_id)).fetchall():
+            new_card_id = target.execute(
+                'INSERT INTO flashcards (deck_id, front, back) VALUES (?, ?, ?)',
+                (new_deck_id, card['front'], card['back'])
+            ).lastrowid
+            if card['next_review_date'] is not None:
+                target.execute('''
+                    INSERT INTO card_states (user_id, flashcard_id, ease_factor, interval_days, repetitions, next_review_date, last_reviewed_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (user_id, new_card_id, card['ease_factor'], card['interval_days'], card['repetitions'],
+                      card['next_review_date'], card['last_reviewed_at']))
+
+    with transaction(db):
+        db.execute(
+            'DELETE FROM card_states WHERE user_id = ? AND flashcard_id IN (SELECT id FROM flashcards WHERE deck_id = ?)',
+            (user_id, deck_id)
+        )
+        db.execute('DELETE FROM deck_subscriptions WHERE user_id = ? AND deck_id = ?', (user_id, deck_id))
+
+    return new_deck_id
@@ -0,0 +1,102 @@
+import io
+import json
+import zipfile
+from services import content_store
+
+# Rows fetched, and bytes handed to the response, per step
+BATCH_SIZE = 500
+
+# (file, query) per kind of data a user owns; every query takes :user_id
+EXPORTS = (
+    ('decks.ndjson', 'SELECT * FROM flashcard_decks WHERE user_id = :user_id ORDER BY id'),
+    ('cards.ndjson', '''
+        SELECT f.* FROM flashcards f JOIN flashcard_decks d ON d.id = f.deck_id
+        WHERE d.user_id = :user_id ORDER BY f.id
+    '''),
+    ('card_states.ndjson', 'SELECT * FROM card_states WHERE user_id = :user_id ORDER BY flashcard_id'),
+    ('reviews.ndjson', 'SELECT * FROM flashcard_reviews WHERE user_id = :user_id ORDER BY id'),
+    ('deck_subscriptions.ndjson', 'SELECT * FROM deck_subscriptions WHERE user_id = :user_id ORDER BY deck_id'),
+    ('quizzes.ndjson', 'SELECT * FROM quizzes WHERE user_id = :user_id ORDER BY id'),
+    ('questions.ndjson', '''
+        SELECT qq.* FROM quiz_questions qq JOIN quizzes q ON q.id = qq.quiz_id
+        WHERE q.user_id = :user_id ORDER BY qq.id
+    '''),
+    ('attempts.ndjson', 'SELECT * FROM quiz_attempts WHERE user_id = :user_id ORDER BY id'),
+    ('sessions.ndjson', 'SELECT * FROM pomodoro_sessions WHERE user_id = :user_id ORDER BY id'),
+    ('settings.ndjson', 'SELECT * FROM pomodoro_settings WHERE user_id = :user_id'),
+    ('daily_stats.ndjson', 'SELECT * FROM daily_stats WHERE user_id = :user_id ORDER BY date'),
+    ('syllabi.ndjson', 'SELECT * FROM syllabi WHERE user_id = :user_id ORDER BY id'),
+)
+# Files whose rows may also be in the main database, where public decks live
+SHARED_EXPORTS = {
+    'decks.ndjson', 'cards.ndjson', 'card_states.ndjson', 'reviews.ndjson', 'deck_subscriptions.ndjson',
+}
+
+
+class _Chunks(io.RawIOBase):
+    """Write-only sink that zipfile writes into and the response drains"""
+
+    def __init__(self):
+        self._chunks = []
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        self.size = 0
+        return data
+
+
+def _export_row(db, row):
+    record = dict(row)
+    if 'content_hash' in record:
+        # Syllabus text is kept compressed in content_blobs; export the text itself
+        record['content'] = content_store.syllabus_content(db, row)
+        del record['content_hash']
+    return record
+
+
+def _line(record):
+    return (json.dumps(record, default=str, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+def export_user(db, user_id, shared=()):
+    """Yield a zip of one NDJSON file per kind of data the user owns.
+
+    Built while it is sent: rows are read BATCH_SIZE at a time and the
+    compressed bytes handed on as they are produced, so memory use does
+    not grow with the amount of data. Everything is read in one
+    transaction per database, giving a consistent export without
+    blocking writers under WAL. `shared` are other databases holding
+    decks of the user, as for search.search().
+    """
+    sink = _Chunks()
+    for source in (db, *shared):
+        source.execute('BEGIN')
+    try:
+        with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for name, query in EXPORTS:
+                with archive.open(name, 'w') as f:
+                    for source in (db, *shared) if name in SHARED_EXPORTS else (db,):
+                        cursor = source.execute(query, {'user_id': user_id})
+                        while True:
+                            rows = cursor.fetchmany(BATCH_SIZE)
+                            if not rows:
+                                break
+                            for row in rows:
+                                f.write(_line(_export_row(source, row)))
+                            if sink.size:
+                                yield sink.drain()
+        # The central directory, written when the archive closes
+        yield sink.drain()
+    finally:
+        for source in (db, *shared):
+            source.rollback()
@@ -0,0 +1,242 @@
+import json
+import time
+from services.llm import MODEL
+
+QUIZ_PROMPT = """Based on this syllabus/course content, generate 10 quiz questions.
+
+SYLLABUS CONTENT:
+{content}
+
+Return ONLY a valid JSON array with this exact format (no markdown, no explanation):
+[
+  {{
+    "question": "What is...?",
+    "type": "multiple_choice",
+    "options": ["Option A", "Option B", "Option C", "Option D"],
+    "correct_answer": "Option A",
+    "explanation": "Brief explanation why this is correct"
+  }}
+]
+
+Include a mix of multiple_choice and true_false questions. For true_false, options should be ["True", "False"]."""
+
+FLASHCARD_PROMPT = """Based on this syllabus/course content, generate 15 flashcards for key terms and concepts.
+
+SYLLABUS CONTENT:
+{content}
+
+Return ONLY a valid JSON array with this exact format (no markdown, no explanation):
+[
+  {{
+    "front": "Term or question",
+    "back": "Definition or answer"
+  }}
+]"""
+
+PLAN_PROMPT = """Based on this syllabus, create a study plan with topics and recommended Pomodoro sessions.
+
+SYLLABUS CONTENT:
+{content}
+
+Return ONLY a valid JSON object with this format (no markdown):
+{{
+  "topics": [
+    {{
+      "name": "Topic Name",
+      "description": "Brief description",
+      "estimated_pomodoros": 4,
+      "priority": "high"
+    }}
+  ],
+  "total_study_hours": 20,
+  "recommended_daily_pomodoros": 4
+}}"""
+
+COMBINED_PROMPT = """Based on this syllabus/course content, generate study materials.
+
+SYLLABUS CONTENT:
+{content}
+
+Return ONLY a valid JSON object with the keys quizzes, flashcards and study_plan (no markdown, no explanation):
+{{
+  "quizzes": [
+    {{
+      "question": "What is...?",
+      "type": "multiple_choice",
+      "options": ["Option A", "Option B", "Option C", "Option D"],
+      "correct_answer": "Option A",
+      "explanation": "Brief explanation why this is correct"
+    }}
+  ],
+  "flashcards": [
+    {{
+      "front": "Term or question",
+      "back": "Definition or answer"
+    }}
+  ],
+  "study_plan": {{
+    "topics": [
+      {{
+        "name": "Topic Name",
+        "description": "Brief description",
+        "estimated_pomodoros": 4,
+        "priority": "high"
+      }}
+    ],
+    "total_study_hours": 20,
+    "recommended_daily_pomodoros": 4
+  }}
+}}
+
+quizzes must contain 10 questions mixing multiple_choice and true_false (true_false options are ["True", "False"]).
+flashcards must contain 15 cards for key terms and concepts."""
+
+# Per-section prompt, content budget and max_tokens used by the separate mode
+SECTIONS = {
+    'quizzes': (QUIZ_PROMPT, 8000, 3000),
+    'flashcards': (FLASHCARD_PROMPT, 8000, 2000),
+    'study_plan': (PLAN_PROMPT, 6000, 1500),
+}
+
+# Maps the `type` accepted by /syllabus/api/generate to the sections it produces
+GENERATE_TYPES = {
+    'quizzes': ['quizzes'],
+    'flashcards': ['flashcards'],
+    'plan': ['study_plan'],
+    'all': ['quizzes', 'flashcards', 'study_plan'],
+}
+
+
+def parse_json_response(text):
+    """Strip markdown code fences and decode the model output"""
+    text = text.strip()
+    if text.startswith('```'):
+        text = text.split('```')[1]
+        if text.startswith('json'):
+            text = text[4:]
+    return json.loads(text)
+
+
+def validate_quizzes(value):
+    """Return the cleaned question list, or None if it does not match the schema"""
+    if not isinstance(value, list):
+        return None
+    questions = []
+    for q in value:
+        if not isinstance(q, dict):
+            continue
+        if not isinstance(q.get('question'), str) or not q['question'].strip():
+            continue
+        if not isinstance(q.get('correct_answer'), str):
+            continue
+        options = q.get('options', [])
+        if not isinstance(options, list):
+            continue
+        questions.append({
+            'question': q['question'],
+            'type': 'true_false' if q.get('type') == 'true_false' else 'multiple_choice',
+            'options': [str(o) for o in options],
+            'correct_answer': q['correct_answer'],
+            'explanation': q.get('explanation', '') if isinstance(q.get('explanation', ''), str) else ''
+        })
+    return questions or None
+
+
+def validate_flashcards(value):
+    """Return the cleaned card list, or None if it does not match the schema"""
+    if not isinstance(value, list):
+        return None
+    cards = []
+    for card in value:
+        if not isinstance(card, dict):
+            continue
+        front, back = card.get('front'), card.get('back')
+        if isinstance(front, str) and isinstance(back, str) and front.strip() and back.strip():
+            cards.append({'front': front, 'back': back})
+    return cards or None
+
+
+def validate_study_plan(value):
+    """Return the plan if it has a topics list, otherwise None"""
+    if not isinstance(value, dict) or not isinstance(value.get('topics'), list):
+        return None
+    if not all(isinstance(t, dict) and isinstance(t.get('name'), str) for t in value['topics']):
+        return None
+    return value
+
+
+VALIDATORS = {
+    'quizzes': validate_quizzes,
+    'flashcards': validate_flashcards,
+    'study_plan': validate_study_plan,
+}
+
+
+class Generator:
+    """Runs syllabus generation against a chat client and tracks token usage.
+
+    `combined` mode asks for every requested section in one structured call
+    and only re-requests, with the per-section prompts, the sections whose
+    output failed validation. `separate` mode issues one call per section.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.provider_seconds = 0.0
+
+    @property
+    def usage(self):
+        return {
+            'calls': self.calls,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'total_tokens': self.prompt_tokens + self.completion_tokens
+        }
+
+    def _complete(self, prompt, max_tokens):
+        start = time.perf_counter()
+        response = self.client.chat.completions.create(
+            model=MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.7,
+            max_tokens=max_tokens
+        )
+        self.provider_seconds += time.perf_counter() - start
+        self.calls += 1
+        usage = getattr(response, 'usage', None)
+        if usage is not None:
+            self.prompt_tokens += usage.prompt_tokens or 0
+            self.completion_tokens += usage.completion_tokens or 0
+        return response.choices[0].message.content
+
+    def generate_section(self, section, content):
+        prompt, content_limit, max_tokens = SECTIONS[section]
+        text = self._complete(prompt.format(content=content[:content_limit]), max_tokens)
+        try:
+            return VALIDATORS[section](parse_json_response(text))
+        except json.JSONDecodeError:
+            return None
+
+    def generate(self, content, sections, mode='combined'):
+        """Return {section: validated value or None} for the requested sections"""
+        results = {}
+
+        if mode == 'combined' and len(sections) > 1:
+            text = self._complete(COMBINED_PROMPT.format(content=content[:8000]), 6000)
+            try:
+                document = parse_json_response(text)
+            except json.JSONDecodeError:
+                document = {}
+            if not isinstance(document, dict):
+                document = {}
+            for section in sections:
+                results[section] = VALIDATORS[section](document.get(section))
+
+        for section in sections:
+            if results.get(section) is None:
+                results[section] = self.generate_section(section, content)
+
+        return results
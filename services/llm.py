@@ -0,0 +1,127 @@
+import os
+import json
+import time
+from types import SimpleNamespace
+
+MODEL = "llama-3.1-8b-instant"
+
+
+def get_llm_client(provider='groq'):
+    """Return a chat client for the given provider ('groq' or 'mock')"""
+    if provider == 'mock':
+        return MockClient()
+    return get_groq_client()
+
+
+_groq_clients = {}
+
+
+def get_groq_client():
+    """One Groq client per API key, reused so its HTTP connections are too.
+
+    groq is imported on first use: it pulls in httpx and pydantic, which
+    would otherwise slow down every worker start.
+    """
+    api_key = os.environ.get('GROQ_API_KEY')
+    if not api_key:
+        return None
+    client = _groq_clients.get(api_key)
+    if client is None:
+        try:
+            from groq import Groq
+            client = _groq_clients[api_key] = Groq(api_key=api_key)
+        except Exception as e:
+            print(f"Groq init error: {e}")
+    return client
+
+
+def estimate_tokens(text):
+    # Rough rule of thumb for English text with Llama tokenizers
+    return max(1, len(text) // 4)
+
+
+class MockClient:
+    """Offline stand-in for the Groq client.
+
+    Mirrors the `client.chat.completions.create(...)` call shape and returns
+    canned JSON for each prompt kind. Latency is simulated from the token
+    counts so the separate and combined generation modes can be compared
+    without network access.
+    """
+
+    def __init__(self, base_latency=None, per_token_latency=None, broken_sections=()):
+        self.base_latency = base_latency if base_latency is not None else \
+            float(os.environ.get('MOCK_LLM_BASE_LATENCY', '0.05'))
+        self.per_token_latency = per_token_latency if per_token_latency is not None else \
+            float(os.environ.get('MOCK_LLM_PER_TOKEN_LATENCY', '0.0002'))
+        self.broken_sections = set(broken_sections)
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, temperature=0.7, max_tokens=1000, **kwargs):
+        prompt = messages[-1]['content']
+        self.calls += 1
+
+        if 'quizzes, flashcards and study_plan' in prompt:
+            payload = {}
+            payload['quizzes'] = 'not a list' if 'quizzes' in self.broken_sections else _mock_quiz()
+            payload['flashcards'] = 'not a list' if 'flashcards' in self.broken_sections else _mock_flashcards()
+            payload['study_plan'] = {} if 'study_plan' in self.broken_sections else _mock_plan()
+        elif 'quiz questions' in prompt:
+            payload = _mock_quiz()
+        elif 'flashcards' in prompt:
+            payload = _mock_flashcards()
+        else:
+            payload = _mock_plan()
+
+        content = json.dumps(payload, indent=2)
+        prompt_tokens = estimate_tokens(prompt)
+        completion_tokens = min(estimate_tokens(content), max_tokens)
+        time.sleep(self.base_latency + (prompt_tokens + completion_tokens) * self.per_token_latency)
+
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                total_tokens=prompt_tokens + completion_tokens
+            )
+        )
+
+
+def _mock_quiz():
+    questions = []
+    for i in range(10):
+        if i % 3 == 2:
+            questions.append({
+                "question": f"Statement {i + 1} about the course is accurate.",
+                "type": "true_false",
+                "options": ["True", "False"],
+                "correct_answer": "True",
+                "explanation": "The syllabus states this directly."
+            })
+        else:
+            questions.append({
+                "question": f"What is key concept {i + 1}?",
+                "type": "multiple_choice",
+                "options": [f"Definition {i + 1}", "Distractor A", "Distractor B", "Distractor C"],
+                "correct_answer": f"Definition {i + 1}",
+                "explanation": f"Concept {i + 1} is defined in the syllabus."
+            })
+    return questions
+
+
+def _mock_flashcards():
+    return [{"front": f"Term {i + 1}", "back": f"Definition of term {i + 1}"} for i in range(15)]
+
+
+def _mock_plan():
+    return {
+        "topics": [
+            {"name": f"Topic {i + 1}", "description": "Core material", "estimated_pomodoros": 4,
+             "priority": ["high", "medium", "low"][i % 3]}
+            for i in range(5)
+        ],
+        "total_study_hours": 10,
+        "recommended_daily_pomodoros": 4
+    }
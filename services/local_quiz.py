@@ -0,0 +1,157 @@
+import heapq
+import json
+import math
+import random
+from collections import Counter, defaultdict
+from database.db import transaction
+
+NGRAM = 3
+# Character n-grams present in more than this share of cards carry almost no
+# signal and would make the posting lists scanned per question very long
+MAX_DOC_FREQ = 0.1
+# Large decks are scored against a random sample of this many backs; the
+# nearest neighbours within a sample of this size are still close enough to
+# make plausible distractors and indexing cost stays flat as decks grow
+MAX_CANDIDATES = 2000
+
+
+def char_ngrams(text, n=NGRAM):
+    text = f" {' '.join(text.lower().split())} "
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class DistractorIndex:
+    """IDF weighted character n-gram index over card backs.
+
+    Vectors are binary n-gram sets weighted by IDF and stored sparsely in an
+    inverted index, so finding the nearest backs for one card only touches
+    cards that share an informative n-gram with it instead of the whole deck.
+    """
+
+    def __init__(self, texts):
+        self.texts = texts
+        grams = [char_ngrams(t) for t in texts]
+
+        doc_freq = Counter()
+        for g in grams:
+            doc_freq.update(g)
+
+        total = len(texts)
+        max_df = max(2, int(total * MAX_DOC_FREQ))
+        idf = {g: math.log((1 + total) / (1 + df)) + 1 for g, df in doc_freq.items() if df <= max_df}
+
+        self.vectors = []
+        self.postings = defaultdict(list)
+        for i, doc in enumerate(grams):
+            weights = [(g, idf[g]) for g in doc if g in idf]
+            norm = math.sqrt(sum(w * w for _, w in weights)) or 1.0
+            vec = [(g, w / norm) for g, w in weights]
+            self.vectors.append(vec)
+            for g, w in vec:
+                self.postings[g].append((i, w))
+
+    def nearest(self, i, k):
+        """Indices of the k backs most similar to card i, excluding duplicates of its text"""
+        scores = defaultdict(float)
+        for g, w in self.vectors[i]:
+            for j, wj in self.postings[g]:
+                scores[j] += w * wj
+
+        own = self.texts[i].strip().lower()
+        result, seen = [], {own}
+        for j in heapq.nlargest(k * 4 + 1, scores, key=scores.__getitem__):
+            text = self.texts[j].strip().lower()
+            if text not in seen:
+                seen.add(text)
+                result.append(j)
+                if len(result) == k:
+                    break
+        return result
+
+
+def build_questions(cards, num_questions=10, true_false_ratio=0.3, num_options=4, rng=None):
+    """Build quiz questions from (front, back) pairs using other cards' backs as distractors"""
+    rng = rng or random.Random()
+    cards = [c for c in cards if c[0] and c[1]]
+    if len(cards) < 2:
+        return []
+
+    chosen = rng.sample(range(len(cards)), min(num_questions, len(cards)))
+    num_true_false = round(len(chosen) * true_false_ratio)
+
+    candidates = list(range(len(cards)))
+    if len(cards) > MAX_CANDIDATES:
+        chosen_set = set(chosen)
+        others = rng.sample([j for j in candidates if j not in chosen_set], max(0, MAX_CANDIDATES - len(chosen)))
+        candidates = chosen + others
+    position = {card: pos for pos, card in enumerate(candidates)}
+    index = DistractorIndex([cards[j][1] for j in candidates])
+
+    questions = []
+    for n, i in enumerate(chosen):
+        front, back = cards[i]
+        needed = 1 if n < num_true_false else num_options - 1
+        distractors = [cards[candidates[j]][1] for j in index.nearest(position[i], needed)]
+        if len(distractors) < needed:
+            # Top up with random backs when the deck has too few lexical neighbours
+            pool = [c[1] for c in cards if c[1].strip().lower() != back.strip().lower()]
+            rng.shuffle(pool)
+            for candidate in pool:
+                if len(distractors) == needed:
+                    break
+                if candidate not in distractors:
+                    distractors.append(candidate)
+
+        if n < num_true_false:
+            is_true = rng.random() < 0.5 or not distractors
+            shown = back if is_true else distractors[0]
+            questions.append({
+                'question': f"{front} — {shown}",
+                'type': 'true_false',
+                'options': ['True', 'False'],
+                'correct_answer': 'True' if is_true else 'False',
+                'explanation': f"{front}: {back}"
+            })
+        else:
+            options = [back] + distractors
+            rng.shuffle(options)
+            questions.append({
+                'question': front,
+                'type': 'multiple_choice',
+                'options': options,
+                'correct_answer': back,
+                'explanation': f"{front}: {back}"
+            })
+
+    rng.shuffle(questions)
+    return questions
+
+
+def create_quiz_from_deck(db, user_id, deck, num_questions=10, true_false_ratio=0.3, rng=None, deck_db=None):
+    """Generate a quiz for `deck` and store it with its questions in one transaction.
+
+    The cards are read from `deck_db` when the deck is in another database
+    than the user's own `db`. Returns (quiz_id, question_count), or
+    (None, 0) if the deck has too few cards.
+    """
+    cards = (deck_db or db).execute('SELECT front, back FROM flashcards WHERE deck_id = ?', (deck['id'],)).fetchall()
+    questions = build_questions([(c['front'], c['back']) for c in cards], num_questions, true_false_ratio, rng=rng)
+    if not questions:
+        return None, 0
+
+    with transaction(db):
+        cursor = db.execute('''
+            INSERT INTO quizzes (user_id, title, description, subject)
+            VALUES (?, ?, ?, ?)
+        ''', (user_id, f"{deck['name']} - Quiz", "Generated from flashcard deck", deck['subject']))
+        quiz_id = cursor.lastrowid
+
+        db.executemany('''
+            INSERT INTO quiz_questions (quiz_id, question_text, question_type, correct_answer, options, explanation, order_num)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (quiz_id, q['question'], q['type'], q['correct_answer'], json.dumps(q['options']), q['explanation'], i + 1)
+            for i, q in enumerate(questions)
+        ])
+
+    return quiz_id, len(questions)
@@ -0,0 +1,283 @@
+import bisect
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+from flask import g, request, current_app, Response
+
+PREFIX = 'myzenbrain'
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Seconds between snapshots written for the other workers to read
+FLUSH_INTERVAL = 1.0
+# Counters and histograms of exited workers, folded together in METRICS_DIR
+RETIRED = 'retired.json'
+
+HELP = {
+    'request_duration_seconds': ('histogram', 'Request latency by endpoint'),
+    'request_db_seconds': ('histogram', 'Time spent in SQLite per request'),
+    'request_provider_seconds': ('histogram', 'Time spent waiting on the LLM provider per request'),
+    'requests_total': ('counter', 'Requests by endpoint, method and status'),
+    'db_commits_total': ('counter', 'Commits that wrote rows, by endpoint'),
+    'requests_in_flight': ('gauge', 'Requests currently being handled'),
+    'admission_in_use': ('gauge', 'Admission gate slots held by running requests'),
+    'admission_queue_depth': ('gauge', 'Requests waiting for an admission gate slot'),
+    'admission_wait_seconds': ('histogram', 'Time admitted requests waited for a slot'),
+    'admission_rejected_total': ('counter', 'Requests turned away with 429, by reason'),
+}
+
+
+class Registry:
+    """Counters, gauges and histograms for one process.
+
+    Label keys and bucket positions are worked out before taking the lock,
+    so the lock only covers a few dict updates. `snapshot()` returns plain
+    data that can be written to disk and merged with other processes'.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+    def inc(self, name, labels, amount=1):
+        key = (name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def add(self, name, labels, amount):
+        key = (name, labels)
+        with self._lock:
+            self.gauges[key] = self.gauges.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        key = (name, labels)
+        index = bisect.bisect_left(BUCKETS, value)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [[0] * (len(BUCKETS) + 1), 0.0]
+            histogram[0][index] += 1
+            histogram[1] += value
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': [[k[0], k[1], v] for k, v in self.counters.items()],
+                'gauges': [[k[0], k[1], v] for k, v in self.gauges.items()],
+                'histograms': [[k[0], k[1], list(v[0]), v[1]] for k, v in self.histograms.items()],
+            }
+
+
+registry = Registry()
+_last_flush = 0.0
+_flushed = False
+
+
+def labels(**labels):
+    return tuple(sorted(labels.items()))
+
+
+def flush(directory):
+    """Write this process's metrics where /metrics in any worker can merge them"""
+    global _last_flush, _flushed
+    _last_flush = time.monotonic()
+    path = os.path.join(directory, f'{os.getpid()}.json')
+    if not _flushed and os.path.exists(path):
+        # Left by an exited worker that had our pid before the OS reused it
+        retire(directory, path)
+    _flushed = True
+    _write(path, registry.snapshot())
+
+
+def _write(path, snapshot):
+    with open(path + '.tmp', 'w') as f:
+        json.dump(snapshot, f)
+    os.replace(path + '.tmp', path)
+
+
+def after_fork():
+    """Start a forked worker with empty metrics rather than a copy of its parent's"""
+    global registry, _last_flush, _flushed
+    registry = Registry()
+    _last_flush = 0.0
+    _flushed = False
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def retire(directory, path):
+    """Fold an exited worker's counters and histograms into RETIRED and delete its file.
+
+    Holds a lock on the directory so workers retiring at the same time
+    don't lose each other's updates; a file already retired by another
+    worker is skipped.
+    """
+    with open(os.path.join(directory, 'retired.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if not os.path.exists(path):
+            return
+        snapshots = [s for s in (_read(os.path.join(directory, RETIRED)), _read(path)) if s]
+        counters, _, histograms = _merge(snapshots)
+        _write(os.path.join(directory, RETIRED), {
+            'counters': [[k[0], k[1], v] for k, v in counters.items()],
+            'gauges': [],
+            'histograms': [[k[0], k[1], v[0], v[1]] for k, v in histograms.items()],
+        })
+        os.remove(path)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def collect(directory=None):
+    """Merge this process's live metrics with the snapshots of other workers.
+
+    Counters and histograms of workers that have exited are folded into
+    RETIRED, so totals never go backwards when a worker is replaced and the
+    directory holds one file per live worker; their gauges are dropped.
+    """
+    snapshots = [registry.snapshot()]
+    if directory:
+        for path in glob.glob(os.path.join(directory, '*.json')):
+            name = os.path.basename(path)
+            if name == RETIRED:
+                continue
+            pid = int(name.split('.')[0])
+            if pid == os.getpid():
+                continue
+            if not _pid_alive(pid):
+                retire(directory, path)
+                continue
+            snapshot = _read(path)
+            if snapshot:
+                snapshots.append(snapshot)
+        retired = _read(os.path.join(directory, RETIRED))
+        if retired:
+            snapshots.append(retired)
+    return _merge(snapshots)
+
+
+def _merge(snapshots):
+    counters, gauges, histograms = {}, {}, {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, value in snapshot['gauges']:
+            key = (name, tuple(map(tuple, labels)))
+            gauges[key] = gauges.get(key, 0) + value
+        for name, labels, buckets, total in snapshot['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            merged = histograms.setdefault(key, [[0] * len(buckets), 0.0])
+            merged[0] = [a + b for a, b in zip(merged[0], buckets)]
+            merged[1] += total
+    return counters, gauges, histograms
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=()):
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def render(counters, gauges, histograms):
+    """Prometheus text exposition format (version 0.0.4)"""
+    by_name = {}
+    for kind, series in (('counter', counters), ('gauge', gauges), ('histogram', histograms)):
+        for (name, labels), value in series.items():
+            by_name.setdefault(name, []).append((labels, value))
+
+    lines = []
+    for name in sorted(by_name):
+        kind, help_text = HELP[name]
+        full = f'{PREFIX}_{name}'
+        lines.append(f'# HELP {full} {help_text}')
+        lines.append(f'# TYPE {full} {kind}')
+        for labels, value in sorted(by_name[name]):
+            if kind != 'histogram':
+                lines.append(f'{full}{_format_labels(labels)} {value}')
+                continue
+            buckets, total = value
+            cumulative = 0
+            for bound, count in zip(BUCKETS + (float('inf'),), buckets):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{full}_bucket{_format_labels(labels, [("le", le)])} {cumulative}')
+            lines.append(f'{full}_sum{_format_labels(labels)} {total}')
+            lines.append(f'{full}_count{_format_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+def add_provider_time(seconds):
+    """Attribute time spent waiting on the LLM provider to the current request"""
+    g.provider_seconds = g.get('provider_seconds', 0.0) + seconds
+
+
+def _start_request():
+    g.request_started = time.perf_counter()
+    g.db_seconds = 0.0
+    registry.add('requests_in_flight', labels(endpoint=request.endpoint or 'unmatched'), 1)
+
+
+def _record_status(response):
+    g.response_status = response.status_code
+    return response
+
+
+def _finish_request(error=None):
+    if 'request_started' not in g:
+        return
+    elapsed = time.perf_counter() - g.pop('request_started')
+    endpoint = request.endpoint or 'unmatched'
+    status = 500 if error is not None else g.get('response_status', 500)
+
+    registry.add('requests_in_flight', labels(endpoint=endpoint), -1)
+    registry.inc('requests_total', labels(endpoint=endpoint, method=request.method, status=status))
+    registry.observe('request_duration_seconds', labels(endpoint=endpoint), elapsed)
+    registry.observe('request_db_seconds', labels(endpoint=endpoint), g.get('db_seconds', 0.0))
+    if g.get('provider_seconds'):
+        registry.observe('request_provider_seconds', labels(endpoint=endpoint), g.provider_seconds)
+    if g.get('db_commits'):
+        registry.inc('db_commits_total', labels(endpoint=endpoint), g.db_commits)
+
+    directory = current_app.config['METRICS_DIR']
+    if directory and time.monotonic() - _last_flush >= FLUSH_INTERVAL:
+        flush(directory)
+
+
+def metrics_endpoint():
+    return Response(render(*collect(current_app.config['METRICS_DIR'])),
+                    mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app):
+    """Instrument every request and serve /metrics, if METRICS_ENABLED"""
+    if not app.config['METRICS_ENABLED']:
+        return
+    if app.config['METRICS_DIR']:
+        os.makedirs(app.config['METRICS_DIR'], exist_ok=True)
+    app.before_request(_start_request)
+    app.after_request(_record_status)
+    app.teardown_request(_finish_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_endpoint)
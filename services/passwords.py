@@ -0,0 +1,142 @@
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Hashing jobs queued per pool worker before new requests are turned away
+QUEUE_PER_WORKER = 8
+QUEUE_TIMEOUT = 5.0
+
+# Token buckets as (capacity, tokens refilled per second). Usernames are
+# limited tightly against guessing; IPs more loosely since many users can
+# share one address.
+USERNAME_BUCKET = (5, 5 / 60)
+IP_BUCKET = (30, 30 / 60)
+
+
+class HashingBusy(RuntimeError):
+    """Raised when the hashing pool's queue stays full for QUEUE_TIMEOUT seconds"""
+
+
+class Throttle:
+    """In-process token buckets keyed by string, e.g. a username or IP.
+
+    `take(key)` spends a token and returns 0, or returns the seconds until
+    one is available without spending anything. At most `maxsize` keys are
+    tracked; the least recently used are forgotten, which only ever makes
+    the throttle more lenient.
+    """
+
+    def __init__(self, capacity, rate, maxsize=100000):
+        self.capacity = capacity
+        self.rate = rate
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+            wait = 0 if tokens >= 1 else (1 - tokens) / self.rate
+            if not wait:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+username_throttle = Throttle(*USERNAME_BUCKET)
+ip_throttle = Throttle(*IP_BUCKET)
+
+
+def throttle_login(username, ip):
+    """Seconds the caller must wait before attempting to log in, or 0"""
+    return max(username_throttle.take((username or '').lower()), ip_throttle.take(ip or ''))
+
+
+_pool = None
+_pool_pid = None
+_slots = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    """The process pool for this process, created on first use.
+
+    Workers are spawned rather than forked, so they start clean even when
+    the pool is first used from a threaded server or after a pre-fork.
+    """
+    global _pool, _pool_pid, _slots
+    workers = current_app.config['PASSWORD_HASH_WORKERS']
+    if workers <= 0:
+        return None
+
+    with _pool_lock:
+        if _pool_pid != os.getpid():
+            _pool = None
+            _pool_pid = os.getpid()
+            _slots = threading.BoundedSemaphore(workers * QUEUE_PER_WORKER)
+        if _pool is None:
+            _pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+    return _pool
+
+
+def _discard_pool(pool):
+    """Forget `pool` once a worker of it died, so _get_pool() starts a new one"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _run(fn, *args):
+    pool = _get_pool()
+    if pool is None:
+        return fn(*args)
+
+    slots = _slots
+    if not slots.acquire(timeout=QUEUE_TIMEOUT):
+        raise HashingBusy('password hashing queue is full')
+    try:
+        # A pool whose worker was killed (OOM, segfault) refuses every later
+        # job; replace it and try once more before giving up
+        for attempt in range(2):
+            try:
+                return pool.submit(fn, *args).result()
+            except BrokenProcessPool:
+                _discard_pool(pool)
+                if attempt:
+                    raise HashingBusy('password hashing pool keeps failing')
+                pool = _get_pool()
+    finally:
+        slots.release()
+
+
+def hash_password(password):
+    return _run(generate_password_hash, password, current_app.config['PASSWORD_HASH_METHOD'])
+
+
+def verify_password(pwhash, password):
+    return _run(check_password_hash, pwhash, password)
+
+
+@lru_cache(maxsize=8)
+def _method_prefix(method):
+    # Werkzeug fills in default parameters ('scrypt' -> 'scrypt:32768:8:1'),
+    # so compare against what it actually writes
+    return generate_password_hash('', method).split('$', 1)[0]
+
+
+def needs_rehash(pwhash):
+    """Whether a stored hash was made with other than the configured method"""
+    return pwhash.split('$', 1)[0] != _method_prefix(current_app.config['PASSWORD_HASH_METHOD'])
@@ -0,0 +1,55 @@
+from functools import wraps
+from flask import current_app, make_response, request, session
+from database.db import get_db
+
+# Part of every ETag; bump when the JSON of a tagged endpoint changes shape,
+# so clients drop bodies cached by an older release
+FORMAT = 1
+
+
+def get(db, name, key):
+    """Current revision of (name, key); 0 if it was never bumped"""
+    row = db.execute('SELECT revision FROM revisions WHERE name = ? AND key = ?', (name, str(key))).fetchone()
+    return row[0] if row else 0
+
+
+def bump(db, name, key):
+    """Record a change to (name, key). Call inside the transaction making the change."""
+    db.execute('''
+        INSERT INTO revisions (name, key, revision) VALUES (?, ?, 1)
+        ON CONFLICT (name, key) DO UPDATE SET revision = revision + 1
+    ''', (name, str(key)))
+
+
+def conditional(tag):
+    """Answer a GET with 304 Not Modified while the client's copy is current.
+
+    `tag(db, user_id, **view_args)` returns a tuple that changes whenever
+    the response would, built from revision counters instead of the rows
+    themselves, or None to just run the view (e.g. so it can 404). It is
+    read before the view runs, so a write landing in between can only
+    leave the client with a newer body under an older tag, never the
+    reverse.
+
+    The ETag is weak: response compression changes the bytes, not the
+    content. Responses are marked private and revalidated on every use.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            parts = tag(get_db(), session['user_id'], **kwargs)
+            if parts is None:
+                return f(*args, **kwargs)
+
+            etag = '-'.join(str(part) for part in (FORMAT,) + parts)
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return decorated_function
+    return decorator
@@ -0,0 +1,144 @@
+import re
+from services import content_store
+
+SNIPPET_OPEN = '<mark>'
+SNIPPET_CLOSE = '</mark>'
+SNIPPET_TOKENS = 12
+
+# One SELECT per indexed table. Every branch returns the same columns so they
+# can be combined with UNION ALL and ranked together. bm25() weights give the
+# owner column no influence and favour title-like columns over body text.
+KIND_QUERIES = {
+    'card': '''
+        SELECT 'card' as kind, f.id as id, d.id as parent_id, d.name as parent_name,
+               snippet(flashcards_fts, 1, :open, :close, '…', :tokens) as title,
+               snippet(flashcards_fts, 2, :open, :close, '…', :tokens) as body,
+               bm25(flashcards_fts, 0.0, 2.0, 1.0) as rank
+        FROM flashcards_fts
+        JOIN flashcards f ON f.id = flashcards_fts.rowid
+        JOIN flashcard_decks d ON d.id = f.deck_id AND d.user_id = :user_id
+        WHERE flashcards_fts MATCH :match_cards
+    ''',
+    'question': '''
+        SELECT 'question' as kind, qq.id as id, q.id as parent_id, q.title as parent_name,
+               snippet(quiz_questions_fts, 1, :open, :close, '…', :tokens) as title,
+               snippet(quiz_questions_fts, 2, :open, :close, '…', :tokens) as body,
+               bm25(quiz_questions_fts, 0.0, 2.0, 1.0) as rank
+        FROM quiz_questions_fts
+        JOIN quiz_questions qq ON qq.id = quiz_questions_fts.rowid
+        JOIN quizzes q ON q.id = qq.quiz_id AND q.user_id = :user_id
+        WHERE quiz_questions_fts MATCH :match_questions
+    ''',
+    'syllabus': '''
+        SELECT 'syllabus' as kind, s.id as id, s.id as parent_id, s.name as parent_name,
+               snippet(syllabi_fts, 1, :open, :close, '…', :tokens) as title,
+               snippet(syllabi_fts, 2, :open, :close, '…', :tokens) as body,
+               bm25(syllabi_fts, 0.0, 3.0, 1.0) as rank
+        FROM syllabi_fts
+        JOIN syllabi s ON s.id = syllabi_fts.rowid AND s.user_id = :user_id
+        WHERE syllabi_fts MATCH :match_syllabi
+    ''',
+}
+
+KIND_COLUMNS = {
+    'card': ('match_cards', 'front back'),
+    'question': ('match_questions', 'question_text explanation'),
+    'syllabus': ('match_syllabi', 'name content'),
+}
+
+
+def build_match_query(text, prefix=True):
+    """Turn free text into a safe FTS5 expression.
+
+    Every word is quoted so FTS5 operators typed by users are treated as
+    plain text. A trailing `*` on a word makes it a prefix query and, with
+    `prefix` enabled, the last word always is (search-as-you-type).
+    Returns None if the text contains no searchable words.
+    """
+    words = re.findall(r'\w+\*?', text)
+    if not words:
+        return None
+
+    terms = []
+    for i, word in enumerate(words):
+        is_prefix = word.endswith('*') or (prefix and i == len(words) - 1)
+        word = word.rstrip('*')
+        terms.append(f'"{word}"*' if is_prefix else f'"{word}"')
+    return ' '.join(terms)
+
+
+def search(db, user_id, text, kinds=None, page=1, per_page=20, prefix=True, shared=()):
+    """Ranked full-text search over one user's cards, questions and syllabi.
+
+    `shared` are other databases holding decks of the user (the main one,
+    for a user on another shard); their cards are ranked in with the rest.
+    Returns (results, has_more). Snippets wrap matches in <mark> tags; the
+    rest of the snippet text is not HTML-escaped.
+    """
+    expression = build_match_query(text, prefix)
+    kinds = [k for k in (kinds or KIND_QUERIES) if k in KIND_QUERIES]
+    if not expression or not kinds:
+        return [], False
+
+    params = {
+        'user_id': user_id,
+        'open': SNIPPET_OPEN,
+        'close': SNIPPET_CLOSE,
+        'tokens': SNIPPET_TOKENS,
+        'limit': per_page + 1,
+        'offset': (page - 1) * per_page,
+    }
+    for kind in kinds:
+        param, columns = KIND_COLUMNS[kind]
+        # Restrict the user's terms to content columns and the owner column to this user
+        params[param] = f'owner : "u{user_id}" AND {{{columns}}} : ({expression})'
+
+    sql = ' UNION ALL '.join(KIND_QUERIES[k] for k in kinds) + ' ORDER BY rank LIMIT :limit OFFSET :offset'
+    if not shared or 'card' not in kinds:
+        rows = db.execute(sql, params).fetchall()
+    else:
+        # Every database's first offset + limit rows, ranked together
+        params.update(limit=params['offset'] + params['limit'], offset=0)
+        rows = db.execute(sql, params).fetchall()
+        for other in shared:
+            rows += other.execute(KIND_QUERIES['card'] + ' ORDER BY rank LIMIT :limit', params).fetchall()
+        start = (page - 1) * per_page
+        rows = sorted(rows, key=lambda r: r['rank'])[start:start + per_page + 1]
+
+    results = [dict(r) for r in rows[:per_page]]
+    return results, len(rows) > per_page
+
+
+def rebuild_search_index(db):
+    """Repopulate every FTS table from its source table and optimize the index"""
+    with db:
+        db.execute('DELETE FROM flashcards_fts')
+        db.execute('''
+            INSERT INTO flashcards_fts (rowid, owner, front, back)
+            SELECT f.id, 'u' || d.user_id, f.front, f.back
+            FROM flashcards f JOIN flashcard_decks d ON d.id = f.deck_id
+        ''')
+
+        db.execute('DELETE FROM quiz_questions_fts')
+        db.execute('''
+            INSERT INTO quiz_questions_fts (rowid, owner, question_text, explanation)
+            SELECT qq.id, 'u' || q.user_id, qq.question_text, qq.explanation
+            FROM quiz_questions qq JOIN quizzes q ON q.id = qq.quiz_id
+        ''')
+
+        db.execute('DELETE FROM syllabi_fts')
+        db.execute('''
+            INSERT INTO syllabi_fts (rowid, owner, name, content)
+            SELECT id, 'u' || user_id, name, content FROM syllabi
+        ''')
+        for row in db.execute('SELECT id, content_hash FROM syllabi WHERE content_hash IS NOT NULL').fetchall():
+            content_store.index_syllabus(db, row['id'], content_store.get(db, row['content_hash']) or '')
+
+    for table in ('flashcards_fts', 'quiz_questions_fts', 'syllabi_fts'):
+        db.execute(f"INSERT INTO {table} ({table}) VALUES ('optimize')")
+    db.commit()
+
+    return {
+        table: db.execute(f'SELECT COUNT(*) as count FROM {table}').fetchone()[0]
+        for table in ('flashcards_fts', 'quiz_questions_fts', 'syllabi_fts')
+    }
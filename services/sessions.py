@@ -0,0 +1,207 @@
+import base64
+from datetime import date, datetime, timedelta, timezone
+from database.db import transaction
+from services import revisions
+
+SESSION_TYPES = ('focus', 'short_break', 'long_break')
+MAX_BATCH_SIZE = 500
+MAX_DURATION_MINUTES = 600
+# Client clocks drift; events stamped slightly in the future are accepted
+FUTURE_TOLERANCE = timedelta(minutes=5)
+GRANULARITIES = ('day', 'week', 'month')
+
+
+class InvalidEvent(ValueError):
+    pass
+
+
+def parse_event(event, now=None):
+    """Validate one queued session event.
+
+    Returns (client_event_id, session_type, duration_minutes, notes,
+    completed_at, day) where completed_at is a UTC 'YYYY-MM-DD HH:MM:SS'
+    string, matching CURRENT_TIMESTAMP, and day is the date of the event in
+    the client's timezone.
+    """
+    now = now or datetime.now(timezone.utc)
+
+    session_type = event.get('session_type', 'focus')
+    if session_type not in SESSION_TYPES:
+        raise InvalidEvent('invalid session_type')
+
+    try:
+        duration = int(event.get('duration_minutes', 25))
+    except (TypeError, ValueError):
+        raise InvalidEvent('invalid duration_minutes')
+    if not 0 <= duration <= MAX_DURATION_MINUTES:
+        raise InvalidEvent('invalid duration_minutes')
+
+    completed_at = event.get('completed_at')
+    if completed_at:
+        try:
+            completed = datetime.fromisoformat(str(completed_at).replace('Z', '+00:00'))
+        except ValueError:
+            raise InvalidEvent('invalid completed_at')
+        if completed.tzinfo is None:
+            completed = completed.replace(tzinfo=timezone.utc)
+        completed = completed.astimezone(timezone.utc)
+        if completed > now + FUTURE_TOLERANCE:
+            raise InvalidEvent('completed_at is in the future')
+    else:
+        completed = now
+
+    # tz_offset follows JavaScript's getTimezoneOffset(): minutes behind UTC
+    tz_offset = event.get('tz_offset')
+    if tz_offset is not None:
+        try:
+            day = (completed - timedelta(minutes=int(tz_offset))).date()
+        except (TypeError, ValueError, OverflowError):
+            raise InvalidEvent('invalid tz_offset')
+    else:
+        day = completed.astimezone().date()
+
+    event_id = event.get('id')
+    return (
+        str(event_id)[:64] if event_id else None,
+        session_type,
+        duration,
+        event.get('notes', '') or '',
+        completed.strftime('%Y-%m-%d %H:%M:%S'),
+        day.isoformat()
+    )
+
+
+def apply_session_events(db, user_id, events):
+    """Record pomodoro session events and their daily_stats deltas atomically.
+
+    Events whose id was already recorded for this user are skipped, so a
+    client can safely resend a batch after a lost response. Each event
+    counts towards the day it happened on, not the day it arrived.
+    Returns (accepted_ids, duplicate_ids, rejected) with rejected a list of
+    {'id', 'error'} dicts.
+    """
+    accepted, duplicates, rejected = [], [], []
+    parsed = []
+    for event in events:
+        try:
+            parsed.append(parse_event(event))
+        except InvalidEvent as e:
+            rejected.append({'id': event.get('id'), 'error': str(e)})
+
+    deltas = {}
+    with transaction(db):
+        for event_id, session_type, duration, notes, completed_at, day in parsed:
+            cursor = db.execute('''
+                INSERT OR IGNORE INTO pomodoro_sessions
+                    (user_id, session_type, duration_minutes, completed_at, notes, client_event_id, local_date)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (user_id, session_type, duration, completed_at, notes, event_id, day))
+
+            if cursor.rowcount == 0:
+                duplicates.append(event_id)
+                continue
+            accepted.append(event_id)
+
+            count, minutes = deltas.get(day, (0, 0))
+            if session_type == 'focus':
+                count, minutes = count + 1, minutes + duration
+            deltas[day] = (count, minutes)
+
+        db.executemany('''
+            INSERT INTO daily_stats (user_id, date, pomodoro_count, focus_minutes)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (user_id, date) DO UPDATE SET
+                pomodoro_count = pomodoro_count + excluded.pomodoro_count,
+                focus_minutes = focus_minutes + excluded.focus_minutes
+        ''', [(user_id, day, count, minutes) for day, (count, minutes) in deltas.items()])
+        if deltas:
+            revisions.bump(db, 'daily_stats', user_id)
+
+    return accepted, duplicates, rejected
+
+
+def encode_cursor(completed_at, session_id):
+    return base64.urlsafe_b64encode(f'{completed_at}|{session_id}'.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Return (completed_at, id) from a history cursor, or raise ValueError"""
+    completed_at, session_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit('|', 1)
+    return completed_at, int(session_id)
+
+
+def session_history(db, user_id, limit=50, cursor=None):
+    """One page of a user's sessions, newest first, by keyset on (completed_at, id).
+
+    Returns (sessions, next_cursor); next_cursor is None on the last page.
+    """
+    params = {'user_id': user_id, 'limit': limit + 1}
+    where = 'user_id = :user_id'
+    if cursor:
+        params['completed_at'], params['id'] = decode_cursor(cursor)
+        where += ' AND (completed_at, id) < (:completed_at, :id)'
+
+    rows = db.execute(f'''
+        SELECT id, session_type, duration_minutes, completed_at, local_date, notes,
+               completed_at || '' as cursor_ts
+        FROM pomodoro_sessions
+        WHERE {where}
+        ORDER BY completed_at DESC, id DESC
+        LIMIT :limit
+    ''', params).fetchall()
+
+    page = rows[:limit]
+    next_cursor = encode_cursor(page[-1]['cursor_ts'], page[-1]['id']) if len(rows) > limit else None
+    sessions = [{k: r[k] for k in r.keys() if k != 'cursor_ts'} for r in page]
+    return sessions, next_cursor
+
+
+def period_start(day, granularity):
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def session_rollups(db, user_id, granularity, start, end):
+    """Focus minutes and session counts per period between two dates (inclusive).
+
+    Served from session_rollups with a single range read on its primary key;
+    periods without sessions are omitted.
+    """
+    rows = db.execute('''
+        SELECT period_start, focus_minutes, focus_sessions, break_sessions
+        FROM session_rollups
+        WHERE user_id = ? AND granularity = ? AND period_start BETWEEN ? AND ?
+          AND (focus_sessions > 0 OR break_sessions > 0)
+        ORDER BY period_start
+    ''', (user_id, granularity, period_start(start, granularity).isoformat(), end.isoformat())).fetchall()
+    return [dict(r, period_start=r['period_start'].isoformat()) for r in rows]
+
+
+def rebuild_rollups(db):
+    """Recompute session_rollups from pomodoro_sessions"""
+    with db:
+        db.execute('DELETE FROM session_rollups')
+        db.execute('''
+            INSERT INTO session_rollups
+            SELECT user_id, granularity, period_start,
+                   SUM(CASE WHEN session_type = 'focus' THEN duration_minutes ELSE 0 END),
+                   SUM(session_type = 'focus'), SUM(session_type != 'focus')
+            FROM (
+                SELECT user_id, session_type, duration_minutes, 'day' as granularity,
+                       COALESCE(local_date, DATE(completed_at)) as period_start
+                FROM pomodoro_sessions
+                UNION ALL
+                SELECT user_id, session_type, duration_minutes, 'week',
+                       DATE(COALESCE(local_date, DATE(completed_at)), 'weekday 0', '-6 days')
+                FROM pomodoro_sessions
+                UNION ALL
+                SELECT user_id, session_type, duration_minutes, 'month',
+                       DATE(COALESCE(local_date, DATE(completed_at)), 'start of month')
+                FROM pomodoro_sessions
+            )
+            GROUP BY user_id, granularity, period_start
+        ''')
+    return db.execute('SELECT COUNT(*) FROM session_rollups').fetchone()[0]
@@ -0,0 +1,308 @@
+import time
+from collections import defaultdict
+from database.db import connect_shard, transaction
+from services import content_store
+
+# Public decks stay in the main database, with everyone's progress on them
+# (see publish_deck); a user's other decks are on their shard and move with them
+OWN_DECKS = 'SELECT id FROM {schema}.flashcard_decks WHERE user_id = :user_id AND NOT is_public'
+OWN_CARDS = f'SELECT id FROM {{schema}}.flashcards WHERE deck_id IN ({OWN_DECKS})'
+
+# (table, the user's rows in it) in the order they are deleted; children
+# (cards, questions, ...) go with their parents through ON DELETE CASCADE
+# and the deck statistics with the rows they count
+USER_TABLES = (
+    ('pomodoro_settings', 'user_id = :user_id'),
+    ('pomodoro_sessions', 'user_id = :user_id'),
+    ('session_rollups', 'user_id = :user_id'),
+    ('daily_stats', 'user_id = :user_id'),
+    ('flashcard_reviews', f'user_id = :user_id AND flashcard_id IN ({OWN_CARDS})'),
+    ('card_states', f'user_id = :user_id AND flashcard_id IN ({OWN_CARDS})'),
+    ('study_sessions', f'user_id = :user_id AND deck_id IN ({OWN_DECKS})'),
+    ('quiz_attempts', 'user_id = :user_id'),
+    ('quizzes', 'user_id = :user_id'),
+    ('flashcard_decks', f'id IN ({OWN_DECKS})'),
+    ('syllabi', 'user_id = :user_id'),
+)
+
+# (table, rows to copy from the attached source) in foreign key order.
+# Rollups are rebuilt by the pomodoro_sessions triggers as sessions land;
+# study state and reviews are only carried for the user's own cards.
+COPIES = (
+    ('pomodoro_settings', 'user_id = :user_id'),
+    ('pomodoro_sessions', 'user_id = :user_id'),
+    ('daily_stats', 'user_id = :user_id'),
+    ('flashcard_decks', f'id IN ({OWN_DECKS})'),
+    ('flashcards', f'id IN ({OWN_CARDS})'),
+    ('card_states', f'user_id = :user_id AND flashcard_id IN ({OWN_CARDS})'),
+    ('flashcard_reviews', f'user_id = :user_id AND flashcard_id IN ({OWN_CARDS})'),
+    ('quizzes', 'user_id = :user_id'),
+    ('quiz_questions', 'quiz_id IN (SELECT id FROM source.quizzes WHERE user_id = :user_id)'),
+    ('quiz_attempts', 'user_id = :user_id'),
+    ('syllabi', 'user_id = :user_id'),
+)
+
+# Revision counters (services/revisions.py) of everything the user owns
+REVISION_KEYS = f'''
+    (name IN ('settings', 'daily_stats') AND key = CAST(:user_id AS TEXT))
+    OR (name = 'card_states' AND key IN (
+        SELECT :user_id || ':' || id FROM ({OWN_DECKS})))
+    OR (name = 'deck' AND key IN (SELECT CAST(id AS TEXT) FROM ({OWN_DECKS})))
+    OR (name = 'quiz' AND key IN (SELECT CAST(id AS TEXT) FROM {{schema}}.quizzes WHERE user_id = :user_id))
+'''
+
+
+class MoveError(Exception):
+    pass
+
+
+def create_user(directory, shard_count, **columns):
+    """Insert a user into the main database and set them up on their shard.
+
+    New users are spread over shards by id. A shard other than the main
+    database gets a stub users row for its foreign keys to point at; the
+    main database's row stays the only one holding credentials. Returns
+    the new user's id.
+    """
+    with transaction(directory):
+        cursor = directory.execute(
+            f'INSERT INTO users ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})',
+            tuple(columns.values())
+        )
+        user_id = cursor.lastrowid
+        shard = user_id % shard_count
+        if not shard:
+            directory.execute('INSERT INTO pomodoro_settings (user_id) VALUES (?)', (user_id,))
+            return user_id
+
+        directory.execute('INSERT INTO user_shards (user_id, shard) VALUES (?, ?)', (user_id, shard))
+        db = connect_shard(shard)
+        try:
+            with transaction(db):
+                db.execute('INSERT INTO users (id, username) VALUES (?, ?)', (user_id, columns['username']))
+                db.execute('INSERT INTO pomodoro_settings (user_id) VALUES (?)', (user_id,))
+        finally:
+            db.close()
+    return user_id
+
+
+def delete_shard_data(directory, user_ids):
+    """Delete what users own on shards other than the main database.
+
+    Call before deleting their users rows from the main database, which
+    takes their data on the main database with it.
+    """
+    if not user_ids:
+        return
+    by_shard = defaultdict(list)
+    for row in directory.execute(
+        f'SELECT user_id, shard FROM user_shards WHERE user_id IN ({", ".join("?" * len(user_ids))})',
+        tuple(user_ids)
+    ):
+        by_shard[row['shard']].append((row['user_id'],))
+    for shard, ids in by_shard.items():
+        db = connect_shard(shard)
+        try:
+            with transaction(db):
+                db.executemany('DELETE FROM users WHERE id = ?', ids)
+        finally:
+            db.close()
+
+
+def delete_user_data(db, user_id):
+    """Delete everything a user owns in one database, keeping their users row"""
+    db.execute(f'DELETE FROM revisions WHERE {REVISION_KEYS.format(schema="main")}', {'user_id': user_id})
+    for table, where in USER_TABLES:
+        db.execute(f'DELETE FROM {table} WHERE {where.format(schema="main")}', {'user_id': user_id})
+
+
+def _columns(db, table):
+    return ', '.join(row[1] for row in db.execute(f'PRAGMA table_info({table})'))
+
+
+def _copy_user(source_path, target, user_id, username, is_directory):
+    """Copy a user's rows, ids and all, from source_path into target"""
+    target.execute('ATTACH DATABASE ? AS source', (source_path,))
+    try:
+        with transaction(target):
+            # Leftovers of an earlier, interrupted move
+            delete_user_data(target, user_id)
+            if not is_directory:
+                target.execute('DELETE FROM users WHERE id = ?', (user_id,))
+                target.execute('INSERT INTO users (id, username) VALUES (?, ?)', (user_id, username))
+
+            # Blobs start unreferenced; the syllabi triggers count the new rows
+            target.execute('''
+                INSERT OR IGNORE INTO content_blobs (hash, data, size, created_at)
+                SELECT b.hash, b.data, b.size, b.created_at FROM source.content_blobs b
+                JOIN source.syllabi s ON s.content_hash = b.hash WHERE s.user_id = :user_id
+            ''', {'user_id': user_id})
+            counts = {}
+            for table, where in COPIES:
+                columns = _columns(target, table)
+                counts[table] = target.execute(
+                    f'INSERT INTO {table} ({columns}) SELECT {columns} FROM source.{table} WHERE {where.format(schema="source")}',
+                    {'user_id': user_id}
+                ).rowcount
+            for syllabus in target.execute('SELECT * FROM syllabi WHERE user_id = ?', (user_id,)).fetchall():
+                content_store.index_syllabus(target, syllabus['id'], content_store.syllabus_content(target, syllabus))
+
+            # A fresh revision for every copied counter, so no tag a client
+            # got from either shard can match by accident
+            target.execute(f'''
+                INSERT INTO revisions (name, key, revision)
+                SELECT name, key, :now FROM source.revisions WHERE {REVISION_KEYS.format(schema='source')}
+                ON CONFLICT (name, key) DO UPDATE SET revision = MAX(revision + 1, excluded.revision)
+            ''', {'user_id': user_id, 'now': int(time.time())})
+        return counts
+    finally:
+        target.execute('DETACH DATABASE source')
+
+
+def move_user(directory, user_id, target, grace=10.0, caches=()):
+    """Move a user's data to another shard while the app keeps running.
+
+    The user is marked as moving first, so their requests get a 503 with
+    Retry-After; `grace` seconds then let requests already past that check
+    finish. Rows are copied with their ids, the routing table is pointed
+    at the target, and only then is the source copy deleted; if copying
+    fails the user stays where they were and the move can be run again.
+    Public decks and progress on them stay in the main database. Returns
+    {table: rows copied}.
+    """
+    user = directory.execute('SELECT username FROM users WHERE id = ?', (user_id,)).fetchone()
+    if user is None:
+        raise MoveError(f'No user {user_id}')
+    route = directory.execute('SELECT shard FROM user_shards WHERE user_id = ?', (user_id,)).fetchone()
+    source = route['shard'] if route else 0
+    if source == target:
+        raise MoveError(f'User {user_id} is already on shard {target}')
+
+    source_db = directory if source == 0 else connect_shard(source)
+    try:
+        with transaction(directory):
+            directory.execute('''
+                INSERT INTO user_shards (user_id, shard, moving) VALUES (?, ?, 1)
+                ON CONFLICT (user_id) DO UPDATE SET moving = 1
+            ''', (user_id, source))
+        target_db = directory if target == 0 else connect_shard(target)
+        try:
+            time.sleep(grace)
+            counts = _copy_user(source_db.path, target_db, user_id, user['username'], target == 0)
+            with transaction(target_db):
+                for cache in caches:
+                    cache.invalidate(target_db, user_id)
+        except BaseException:
+            # The source is untouched; let the user carry on there
+            with transaction(directory):
+                if source == 0:
+                    directory.execute('DELETE FROM user_shards WHERE user_id = ?', (user_id,))
+                else:
+                    directory.execute('UPDATE user_shards SET moving = 0 WHERE user_id = ?', (user_id,))
+            raise
+        finally:
+            if target_db is not directory:
+                target_db.close()
+
+        with transaction(directory):
+            if target == 0:
+                directory.execute('DELETE FROM user_shards WHERE user_id = ?', (user_id,))
+            else:
+                directory.execute('UPDATE user_shards SET shard = ?, moving = 0 WHERE user_id = ?', (target, user_id))
+
+        with transaction(source_db):
+            delete_user_data(source_db, user_id)
+            if source != 0:
+                source_db.execute('DELETE FROM users WHERE id = ?', (user_id,))
+        return counts
+    finally:
+        if source_db is not directory:
+            source_db.close()
+
+
+def _insert(db, table, row, **values):
+    """Insert a row read from another database, under a new id and with `values` replaced"""
+    columns = {name: row[name] for name in row.keys() if name != 'id'}
+    columns.update(values)
+    return db.execute(
+        f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})',
+        tuple(columns.values())
+    ).lastrowid
+
+
+def _copy_deck(source, target, deck_id, user_id=None):
+    """Copy a deck, its cards and the progress on them into another database.
+
+    Rows get new ids: explicit ids from another shard's range would move
+    the target's AUTOINCREMENT into that range. Progress (card states,
+    reviews, subscriptions and study sessions) is copied for `user_id`
+    only, or for everyone when None. Returns the new deck id.
+    """
+    params = {'deck_id': deck_id, 'user_id': user_id}
+    users = '' if user_id is None else ' AND user_id = :user_id'
+    deck = source.execute('SELECT * FROM flashcard_decks WHERE id = :deck_id', params).fetchone()
+    new_deck_id = _insert(target, 'flashcard_decks', deck)
+
+    cards = {}
+    for card in source.execute('SELECT * FROM flashcards WHERE deck_id = :deck_id ORDER BY id', params).fetchall():
+        cards[card['id']] = _insert(target, 'flashcards', card, deck_id=new_deck_id)
+    for table in ('card_states', 'flashcard_reviews'):
+        for row in source.execute(f'''
+            SELECT * FROM {table}
+            WHERE flashcard_id IN (SELECT id FROM flashcards WHERE deck_id = :deck_id){users}
+        ''', params).fetchall():
+            _insert(target, table, row, flashcard_id=cards[row['flashcard_id']])
+    for row in source.execute(f'SELECT * FROM deck_subscriptions WHERE deck_id = :deck_id{users}', params).fetchall():
+        _insert(target, 'deck_subscriptions', row, deck_id=new_deck_id)
+    for study in source.execute(f'SELECT * FROM study_sessions WHERE deck_id = :deck_id{users}', params).fetchall():
+        session_id = _insert(target, 'study_sessions', study, deck_id=new_deck_id)
+        for step in source.execute('SELECT * FROM study_steps WHERE session_id = ?', (study['id'],)).fetchall():
+            _insert(target, 'study_steps', step, session_id=session_id, flashcard_id=cards[step['flashcard_id']])
+    return new_deck_id
+
+
+def publish_deck(directory, db, deck_id):
+    """Move a deck from a shard into the main database before it is made public.
+
+    Public decks live in the main database so that users on every shard
+    can subscribe to them; the deck and everyone's progress on it are
+    copied there under new ids, and only then deleted from the shard.
+    Returns the deck's new id.
+    """
+    with transaction(directory):
+        new_deck_id = _copy_deck(db, directory, deck_id)
+    with transaction(db):
+        db.execute('DELETE FROM flashcard_decks WHERE id = ?', (deck_id,))
+    return new_deck_id
+
+
+def withdraw_deck(directory, db, deck_id):
+    """Move a deck no longer public from the main database back to its owner's shard.
+
+    Only the owner's progress comes along; subscribers could no longer
+    study it. Returns the deck's new id.
+    """
+    owner = directory.execute('SELECT user_id FROM flashcard_decks WHERE id = ?', (deck_id,)).fetchone()['user_id']
+    with transaction(db):
+        new_deck_id = _copy_deck(directory, db, deck_id, owner)
+    with transaction(directory):
+        directory.execute('DELETE FROM flashcard_decks WHERE id = ?', (deck_id,))
+    return new_deck_id
+
+
+def relocate_public_decks(directory, db):
+    """Publish public decks left on a shard by versions that kept them there"""
+    decks = db.execute('SELECT id FROM flashcard_decks WHERE is_public').fetchall()
+    for deck in decks:
+        publish_deck(directory, db, deck['id'])
+    return len(decks)
+
+
+def shard_counts(directory, shard_count):
+    """{shard: users routed there}, including shards nobody is on yet"""
+    counts = dict.fromkeys(range(shard_count), 0)
+    counts[0] = directory.execute('SELECT COUNT(*) FROM users').fetchone()[0]
+    for row in directory.execute('SELECT shard, COUNT(*) FROM user_shards GROUP BY shard'):
+        counts[row[0]] = row[1]
+        counts[0] -= row[1]
+    return counts
@@ -0,0 +1,102 @@
+import os
+import sqlite3
+import time
+from urllib.parse import quote
+from flask import current_app, g, session
+from database.db import MIGRATIONS, TimedConnection, get_db, shard_path
+
+# Reports scan many pages; map the file instead of copying pages into SQLite's cache
+MMAP_BYTES = 256 * 1024 * 1024
+
+
+def refresh(source_path, snapshot_path):
+    """Copy the database to snapshot_path with the online backup API.
+
+    The copy is made in a single step: under WAL that reads one consistent
+    view without blocking writers, whereas copying a few pages at a time
+    starts over whenever another connection commits. It is written next
+    to the old snapshot and renamed over it, so open readers keep the file
+    they have. The mtime is set to when the copy started, the newest data
+    it can hold. Returns the seconds taken.
+    """
+    started = time.time()
+    tmp = f'{snapshot_path}.{os.getpid()}.tmp'
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(tmp)
+    try:
+        source.backup(target)
+        # Readers open the file as immutable, which a WAL database can't be
+        target.execute('PRAGMA journal_mode = DELETE')
+    except BaseException:
+        target.close()
+        os.remove(tmp)
+        raise
+    finally:
+        source.close()
+    target.close()
+    os.utime(tmp, (started, started))
+    os.replace(tmp, snapshot_path)
+    return time.time() - started
+
+
+def _open_snapshot():
+    if not current_app.config['SNAPSHOT_PATH']:
+        return None
+    # Each shard has its own snapshot; get_db() works out the user's shard
+    get_db()
+    path = shard_path(current_app.config['SNAPSHOT_PATH'], g.shard)
+    try:
+        taken = os.stat(path).st_mtime
+    except FileNotFoundError:
+        return None
+    if time.time() - taken > current_app.config['SNAPSHOT_MAX_AGE'] or taken < session.get('wrote_at', 0):
+        return None
+
+    # Snapshots are replaced, never modified, so SQLite can skip locking entirely
+    db = sqlite3.connect(
+        f'file:{quote(os.path.abspath(path))}?mode=ro&immutable=1', uri=True,
+        detect_types=sqlite3.PARSE_DECLTYPES,
+        factory=TimedConnection if current_app.config['METRICS_ENABLED'] else sqlite3.Connection
+    )
+    db.row_factory = sqlite3.Row
+    db.execute(f'PRAGMA mmap_size = {MMAP_BYTES}')
+    # Taken before a migration: the queries expect the new schema
+    if db.execute('PRAGMA user_version').fetchone()[0] != len(MIGRATIONS):
+        db.close()
+        return None
+    return db
+
+
+def get_report_db():
+    """Read-only connection for heavy aggregate queries.
+
+    The snapshot, if it is at most SNAPSHOT_MAX_AGE seconds old and newer
+    than the current user's last write so nobody misses their own changes;
+    the live database otherwise. Nothing may be written through it.
+    """
+    if 'report_db' not in g:
+        g.snapshot_db = _open_snapshot()
+        g.report_db = g.snapshot_db or get_db()
+    return g.report_db
+
+
+def close_snapshot(e=None):
+    g.pop('report_db', None)
+    db = g.pop('snapshot_db', None)
+    if db is not None:
+        db.close()
+
+
+def record_write(response):
+    # Requests that committed something, see database.db.transaction()
+    if g.get('db_commits') and 'user_id' in session:
+        session['wrote_at'] = time.time()
+    return response
+
+
+def init_app(app):
+    """Route get_report_db() to SNAPSHOT_PATH, refreshed by `flask data snapshot`"""
+    if not app.config['SNAPSHOT_PATH']:
+        return
+    app.teardown_appcontext(close_snapshot)
+    app.after_request(record_write)
@@ -0,0 +1,44 @@
+from flask import current_app
+
+# SQL equivalent of werkzeug.http.http_date(), which is how Flask's JSON
+# provider writes datetimes, so responses look the same as with jsonify.
+# NULL stays NULL.
+HTTP_DATE = (
+    "substr('SunMonTueWedThuFriSat', 1 + 3 * strftime('%w', {0}), 3) || ', ' || strftime('%d', {0}) || ' ' || "
+    "substr('JanFebMarAprMayJunJulAugSepOctNovDec', 3 * strftime('%m', {0}) - 2, 3) || ' ' || "
+    "strftime('%Y %H:%M:%S', {0}) || ' GMT'"
+)
+DATE_TYPES = ('TIMESTAMP', 'DATE')
+
+_table_columns = {}
+
+
+def table_columns(db, table):
+    """[(name, is_date)] for a table, read from its declared types once per process"""
+    columns = _table_columns.get(table)
+    if columns is None:
+        columns = _table_columns[table] = [
+            (row[1], row[2].upper() in DATE_TYPES) for row in db.execute(f'PRAGMA table_info({table})')
+        ]
+    return columns
+
+
+def object_sql(columns, prefix=''):
+    """json_object(...) over (name, is_date) columns, optionally qualified with a table alias"""
+    pairs = []
+    for name, is_date in columns:
+        ref = f'{prefix}"{name}"'
+        pairs.append(f"'{name}', {HTTP_DATE.format(ref) if is_date else ref}")
+    return f'json_object({", ".join(pairs)})'
+
+
+def array_sql(query, columns):
+    """Wrap a SELECT so it returns its rows as a single JSON array of objects.
+
+    SQLite builds the whole body; no Row or dict is created per row.
+    """
+    return f'SELECT json_group_array({object_sql(columns)}) FROM ({query})'
+
+
+def response(body):
+    return current_app.response_class(body, mimetype='application/json')
@@ -0,0 +1,158 @@
+from collections import deque
+from datetime import date
+from services import decks
+
+# A card answered wrong comes back LEARNING_STEPS[0] cards later, then after
+# each further step while it is answered right; past the last it graduates
+LEARNING_STEPS = (3, 10)
+# While both are left, every NEW_CARD_EVERY-th card shown is a new one
+NEW_CARD_EVERY = 4
+# Cards handed out per request, so the client can show the next one at once
+PREFETCH = 5
+MAX_PREFETCH = 20
+
+
+def start(db, deck_id, user_id, new_limit, today=None):
+    """Today's session for a deck, resumed if already started; returns its row"""
+    today = today or date.today().isoformat()
+    db.execute(
+        'DELETE FROM study_sessions WHERE user_id = ? AND deck_id = ? AND study_date < ?', (user_id, deck_id, today)
+    )
+    db.execute('''
+        INSERT INTO study_sessions (user_id, deck_id, study_date, new_limit) VALUES (?, ?, ?, ?)
+        ON CONFLICT (user_id, deck_id, study_date) DO NOTHING
+    ''', (user_id, deck_id, today, new_limit))
+    return db.execute(
+        'SELECT * FROM study_sessions WHERE user_id = ? AND deck_id = ? AND study_date = ?', (user_id, deck_id, today)
+    ).fetchone()
+
+
+def get_session(db, session_id, user_id):
+    return db.execute(
+        'SELECT * FROM study_sessions WHERE id = ? AND user_id = ?', (session_id, user_id)
+    ).fetchone()
+
+
+def _params(study_session, **extra):
+    return dict(
+        session_id=study_session['id'], user_id=study_session['user_id'], deck_id=study_session['deck_id'],
+        today=str(study_session['study_date']), **extra
+    )
+
+
+# Reviews due in the deck, leaving out cards already being relearned
+DUE_REVIEWS = '''
+    FROM card_states s JOIN flashcards f ON f.id = s.flashcard_id
+    WHERE s.user_id = :user_id AND f.deck_id = :deck_id AND s.next_review_date <= :today
+      AND s.flashcard_id NOT IN (SELECT flashcard_id FROM study_steps WHERE session_id = :session_id)
+'''
+NEW_CARDS = '''
+    FROM flashcards f
+    WHERE f.deck_id = :deck_id
+      AND NOT EXISTS (SELECT 1 FROM card_states s WHERE s.user_id = :user_id AND s.flashcard_id = f.id)
+'''
+
+
+def _new_left(study_session):
+    return max(0, study_session['new_limit'] - study_session['new_seen'])
+
+
+def plan(db, study_session, count=PREFETCH):
+    """The next `count` cards of a session, in the order they will be shown.
+
+    Relearning cards come back once their position is reached, new cards
+    are mixed in among the due reviews, and relearning cards not yet due
+    fill in at the end. At most `count` candidates of each kind are read,
+    whatever the size of the deck.
+    """
+    learning = deque(db.execute('''
+        SELECT f.id, f.front, f.back, st.due_position FROM study_steps st JOIN flashcards f ON f.id = st.flashcard_id
+        WHERE st.session_id = :session_id ORDER BY st.due_position LIMIT :count
+    ''', _params(study_session, count=count)).fetchall())
+    reviews = deque(db.execute(
+        f'SELECT f.id, f.front, f.back {DUE_REVIEWS} ORDER BY s.next_review_date, f.id LIMIT :count',
+        _params(study_session, count=count)
+    ).fetchall())
+    new = deque(db.execute(
+        f'SELECT f.id, f.front, f.back {NEW_CARDS} ORDER BY f.id LIMIT :count',
+        _params(study_session, count=min(count, _new_left(study_session)))
+    ).fetchall())
+
+    window = []
+    while len(window) < count:
+        position = study_session['position'] + len(window)
+        if learning and learning[0]['due_position'] <= position:
+            card, kind = learning.popleft(), 'learning'
+        elif new and (not reviews or position % NEW_CARD_EVERY == NEW_CARD_EVERY - 1):
+            card, kind = new.popleft(), 'new'
+        elif reviews:
+            card, kind = reviews.popleft(), 'review'
+        elif learning:
+            card, kind = learning.popleft(), 'learning'
+        else:
+            break
+        window.append({'id': card['id'], 'front': card['front'], 'back': card['back'], 'kind': kind})
+    return window
+
+
+def remaining(db, study_session):
+    """Cards left in the session by kind"""
+    params = _params(study_session, new_left=_new_left(study_session))
+    return {
+        'learning': db.execute(
+            'SELECT COUNT(*) FROM study_steps WHERE session_id = :session_id', params
+        ).fetchone()[0],
+        'review': db.execute(f'SELECT COUNT(*) {DUE_REVIEWS}', params).fetchone()[0],
+        # Stops counting at the limit rather than scanning the whole deck
+        'new': db.execute(f'SELECT COUNT(*) FROM (SELECT 1 {NEW_CARDS} LIMIT :new_left)', params).fetchone()[0],
+    }
+
+
+def answer(db, study_session, card, quality, stats_db=None):
+    """Record the answer to a card of the session and requeue it if it is being learned.
+
+    SM-2 runs once per card and session, on its first answer: a card
+    answered wrong is rescheduled then, and the learning steps that
+    follow are only logged, so they neither reset nor grow its interval
+    again. Returns the card's (next review date, interval in days);
+    `stats_db` is as for decks.review(). Call inside a transaction.
+    """
+    state = db.execute(
+        'SELECT next_review_date, interval_days FROM card_states WHERE user_id = ? AND flashcard_id = ?',
+        (study_session['user_id'], card['id'])
+    ).fetchone()
+    is_new = state is None
+    step = db.execute(
+        'SELECT step FROM study_steps WHERE session_id = ? AND flashcard_id = ?', (study_session['id'], card['id'])
+    ).fetchone()
+
+    if step is not None and state is not None:
+        decks.log_review(db, card, study_session['user_id'], quality, stats_db=stats_db)
+        result = state['next_review_date'], state['interval_days']
+    else:
+        result = decks.review(db, card, study_session['user_id'], quality, stats_db)
+
+    position = study_session['position'] + 1
+    if quality < 3:
+        next_step = 0
+    elif step is not None and step['step'] + 1 < len(LEARNING_STEPS):
+        next_step = step['step'] + 1
+    else:
+        next_step = None
+
+    if next_step is None:
+        db.execute(
+            'DELETE FROM study_steps WHERE session_id = ? AND flashcard_id = ?', (study_session['id'], card['id'])
+        )
+    else:
+        db.execute('''
+            INSERT INTO study_steps (session_id, flashcard_id, step, due_position) VALUES (?, ?, ?, ?)
+            ON CONFLICT (session_id, flashcard_id) DO UPDATE SET
+                step = excluded.step, due_position = excluded.due_position
+        ''', (study_session['id'], card['id'], next_step, position + LEARNING_STEPS[next_step]))
+
+    db.execute(
+        'UPDATE study_sessions SET position = position + 1, new_seen = new_seen + ? WHERE id = ?',
+        (int(is_new), study_session['id'])
+    )
+    return result
@@ -0,0 +1,106 @@
+document.getElementById('save-deck').addEventListener('click', async () => {
+    const data = {
+        name: document.getElementById('deck-name').value,
+        description: document.getElementById('deck-description').value,
+        subject: document.getElementById('deck-subject').value
+    };
+
+    if (!data.name) {
+        alert('Please enter a deck name');
+        return;
+    }
+
+    let url = '/flashcard/api/deck';
+    let method = 'POST';
+
+    if (deckId) {
+        url = `/flashcard/api/deck/${deckId}`;
+        method = 'PUT';
+    }
+
+    const res = await fetch(url, {
+        method,
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(data)
+    });
+
+    const result = await res.json();
+
+    if (result.success || result.id) {
+        if (!deckId) {
+            deckId = result.id;
+        }
+        document.getElementById('cards-section').style.display = 'block';
+        alert('Deck saved!');
+    }
+});
+
+document.getElementById('add-card-btn').addEventListener('click', () => {
+    document.getElementById('card-form').style.display = 'block';
+    document.getElementById('card-form-title').textContent = 'Add New Card';
+    document.getElementById('edit-card-id').value = '';
+    document.getElementById('card-front').value = '';
+    document.getElementById('card-back').value = '';
+});
+
+document.getElementById('cancel-card').addEventListener('click', () => {
+    document.getElementById('card-form').style.display = 'none';
+});
+
+document.getElementById('save-card').addEventListener('click', async () => {
+    const front = document.getElementById('card-front').value;
+    const back = document.getElementById('card-back').value;
+    const editId = document.getElementById('edit-card-id').value;
+
+    if (!front || !back) {
+        alert('Please fill in both sides of the card');
+        return;
+    }
+
+    let url, method;
+    if (editId) {
+        url = `/flashcard/api/card/${editId}`;
+        method = 'PUT';
+    } else {
+        url = `/flashcard/api/deck/${deckId}/card`;
+        method = 'POST';
+    }
+
+    await fetch(url, {
+        method,
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ front, back })
+    });
+
+    location.reload();
+});
+
+document.querySelectorAll('.delete-card').forEach(btn => {
+    btn.addEventListener('click', async () => {
+        const cardItem = btn.closest('.card-item');
+        const cardId = cardItem.dataset.id;
+        if (confirm('Delete this card?')) {
+            await fetch(`/flashcard/api/card/${cardId}`, { method: 'DELETE' });
+            cardItem.remove();
+        }
+    });
+});
+
+document.querySelectorAll('.edit-card').forEach(btn => {
+    btn.addEventListener('click', async () => {
+        const cardItem = btn.closest('.card-item');
+        const cardId = cardItem.dataset.id;
+
+        const res = await fetch(`/flashcard/api/deck/${deckId}`);
+        const data = await res.json();
+        const card = data.cards.find(c => c.id == cardId);
+
+        if (card) {
+            document.getElementById('card-form').style.display = 'block';
+            document.getElementById('card-form-title').textContent = 'Edit Card';
+            document.getElementById('edit-card-id').value = cardId;
+            document.getElementById('card-front').value = card.front;
+            document.getElementById('card-back').value = card.back;
+        }
+    });
+});
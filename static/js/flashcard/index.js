@@ -0,0 +1,57 @@
+document.querySelectorAll('.delete-deck').forEach(btn => {
+    btn.addEventListener('click', async () => {
+        if (confirm('Delete this deck and all its cards?')) {
+            const id = btn.dataset.id;
+            await fetch(`/flashcard/api/deck/${id}`, { method: 'DELETE' });
+            location.reload();
+        }
+    });
+});
+
+document.querySelectorAll('.share-deck').forEach(btn => {
+    btn.addEventListener('click', async () => {
+        await fetch(`/flashcard/api/deck/${btn.dataset.id}/share`, {
+            method: 'PUT',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ is_public: btn.dataset.public !== '1' })
+        });
+        location.reload();
+    });
+});
+
+document.querySelectorAll('.unsubscribe-deck').forEach(btn => {
+    btn.addEventListener('click', async () => {
+        if (confirm('Unsubscribe from this deck? Your review progress on it will be removed.')) {
+            await fetch(`/flashcard/api/deck/${btn.dataset.id}/subscribe`, { method: 'DELETE' });
+            location.reload();
+        }
+    });
+});
+
+document.querySelectorAll('.fork-deck').forEach(btn => {
+    btn.addEventListener('click', async () => {
+        const res = await fetch(`/flashcard/api/deck/${btn.dataset.id}/fork`, { method: 'POST' });
+        const data = await res.json();
+        if (data.success) {
+            window.location.href = `/flashcard/edit/${data.id}`;
+        }
+    });
+});
+
+document.querySelectorAll('.quiz-from-deck').forEach(btn => {
+    btn.addEventListener('click', async () => {
+        btn.disabled = true;
+        const res = await fetch(`/quiz/api/quiz/from-deck/${btn.dataset.id}`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ num_questions: 10 })
+        });
+        const data = await res.json();
+        if (data.success) {
+            window.location.href = `/quiz/${data.id}/take`;
+        } else {
+            alert('Error: ' + (data.error || 'Failed to create quiz'));
+            btn.disabled = false;
+        }
+    });
+});
@@ -0,0 +1,6 @@
+document.querySelectorAll('.subscribe-deck').forEach(btn => {
+    btn.addEventListener('click', async () => {
+        await fetch(`/flashcard/api/deck/${btn.dataset.id}/subscribe`, { method: 'POST' });
+        location.reload();
+    });
+});
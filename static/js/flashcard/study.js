@@ -0,0 +1,111 @@
+// Cards come from a server-side study session a few at a time: each answer
+// returns the next ones, so the following card can be shown without waiting
+let sessionId = null;
+let queue = [];
+let remaining = null;
+let current = null;
+let isFlipped = false;
+let pending = Promise.resolve();
+
+async function loadCards() {
+    const res = await fetch(`/flashcard/api/deck/${deckId}/study`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({})
+    });
+    const data = await res.json();
+    sessionId = data.session_id;
+    remaining = data.remaining;
+    queue = data.cards;
+    showCard();
+}
+
+function showComplete() {
+    document.getElementById('flashcard').style.display = 'none';
+    document.getElementById('rating-buttons').style.display = 'none';
+    document.getElementById('complete-message').style.display = 'block';
+    document.querySelector('.text-muted.mb-3').style.display = 'none';
+    document.getElementById('progress').textContent = 'Nothing left to study today';
+}
+
+function showProgress() {
+    const parts = [`${remaining.review} due`, `${remaining.new} new`];
+    if (remaining.learning) parts.push(`${remaining.learning} learning`);
+    document.getElementById('progress').textContent = parts.join(' · ');
+}
+
+function showCard() {
+    current = queue.shift() || null;
+    if (!current) {
+        showComplete();
+        return;
+    }
+
+    document.getElementById('card-front').textContent = current.front;
+    document.getElementById('card-back').textContent = current.back;
+    showProgress();
+
+    // Reset flip state
+    isFlipped = false;
+    document.getElementById('flashcard').classList.remove('flipped');
+    document.getElementById('rating-buttons').style.display = 'none';
+}
+
+function flipCard() {
+    if (!current) return;
+    isFlipped = !isFlipped;
+    document.getElementById('flashcard').classList.toggle('flipped');
+
+    if (isFlipped) {
+        document.getElementById('rating-buttons').style.display = 'flex';
+    }
+}
+
+async function sendAnswer(card, quality) {
+    const res = await fetch(`/flashcard/api/study/${sessionId}/answer`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ card_id: card.id, quality })
+    });
+    const data = await res.json();
+    if (!data.success) return;
+
+    remaining = data.remaining;
+    // The server's plan replaces ours; skip the card already on screen
+    queue = data.cards.filter(c => !current || c.id !== current.id);
+    if (current) {
+        showProgress();
+    } else if (queue.length) {
+        showCard();
+    }
+}
+
+function rateCard(quality) {
+    const card = current;
+    if (!card) return;
+
+    // Answers are sent in order; the next card shows straight away
+    pending = pending.then(() => sendAnswer(card, quality));
+    current = null;
+    if (queue.length) {
+        showCard();
+    } else {
+        document.getElementById('rating-buttons').style.display = 'none';
+        pending.then(() => { if (!current) showComplete(); });
+    }
+}
+
+// Keyboard shortcuts
+document.addEventListener('keydown', (e) => {
+    if (e.code === 'Space') {
+        e.preventDefault();
+        flipCard();
+    } else if (isFlipped) {
+        if (e.key === '1') rateCard(1);
+        else if (e.key === '2') rateCard(2);
+        else if (e.key === '3') rateCard(4);
+        else if (e.key === '4') rateCard(5);
+    }
+});
+
+loadCards();
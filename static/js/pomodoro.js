@@ -189,18 +189,11 @@ class PomodoroTimer {
     }
 
     async logSession() {
-        try {
-            await fetch('/pomodoro/api/session', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({
-                    session_type: this.sessionType,
-                    duration_minutes: this.getDuration()
-                })
-            });
-        } catch (e) {
-            console.error('Failed to log session:', e);
-        }
+        sessionQueue.enqueue({
+            session_type: this.sessionType,
+            duration_minutes: this.getDuration()
+        });
+        await sessionQueue.flush();
     }
 
     async saveSettings() {
@@ -263,6 +256,95 @@ class PomodoroTimer {
     }
 }
 
+// Offline-first queue of completed sessions. Events are kept in localStorage
+// with an idempotency key until the server acknowledges them, and are sent in
+// batches, so sessions finished offline or during a failed request are not lost.
+class SessionQueue {
+    constructor() {
+        this.storageKey = 'myzenbrain.pendingSessions';
+        this.batchSize = 50;
+        this.retryDelay = 5000;
+        this.maxRetryDelay = 5 * 60 * 1000;
+        this.flushing = false;
+        this.retryTimer = null;
+
+        window.addEventListener('online', () => this.flush());
+        document.addEventListener('visibilitychange', () => {
+            if (document.visibilityState === 'hidden') this.flush({ keepalive: true });
+        });
+    }
+
+    load() {
+        try {
+            return JSON.parse(localStorage.getItem(this.storageKey)) || [];
+        } catch (e) {
+            return [];
+        }
+    }
+
+    save(events) {
+        localStorage.setItem(this.storageKey, JSON.stringify(events));
+    }
+
+    newId() {
+        if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+        return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+    }
+
+    enqueue(event) {
+        const events = this.load();
+        events.push({
+            ...event,
+            id: this.newId(),
+            completed_at: new Date().toISOString(),
+            tz_offset: new Date().getTimezoneOffset()
+        });
+        this.save(events);
+    }
+
+    async flush({ keepalive = false } = {}) {
+        if (this.flushing || !navigator.onLine) return;
+        this.flushing = true;
+        clearTimeout(this.retryTimer);
+
+        try {
+            let pending = this.load();
+            while (pending.length > 0) {
+                const batch = pending.slice(0, this.batchSize);
+                const res = await fetch('/pomodoro/api/sessions/batch', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({ events: batch }),
+                    keepalive
+                });
+                if (!res.ok) throw new Error(`Sync failed with status ${res.status}`);
+
+                const data = await res.json();
+                // Rejected events are invalid and would fail again, so drop them too
+                const done = new Set([
+                    ...data.accepted,
+                    ...data.duplicates,
+                    ...data.rejected.map(r => r.id)
+                ]);
+                // Re-read in case another tab queued events meanwhile
+                pending = this.load().filter(e => !done.has(e.id));
+                this.save(pending);
+                if (batch.every(e => !done.has(e.id))) break;
+            }
+            this.retryDelay = 5000;
+        } catch (e) {
+            console.error('Failed to sync sessions, will retry:', e);
+            this.retryTimer = setTimeout(() => this.flush(), this.retryDelay);
+            this.retryDelay = Math.min(this.retryDelay * 2, this.maxRetryDelay);
+        } finally {
+            this.flushing = false;
+        }
+    }
+}
+
+const sessionQueue = new SessionQueue();
+sessionQueue.flush();
+
 // Request notification permission
 if ('Notification' in window && Notification.permission === 'default') {
     Notification.requestPermission();
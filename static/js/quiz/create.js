@@ -0,0 +1,152 @@
+document.getElementById('question-type').addEventListener('change', (e) => {
+    const mcOptions = document.getElementById('mc-options');
+    if (e.target.value === 'multiple_choice') {
+        mcOptions.style.display = 'block';
+    } else {
+        mcOptions.style.display = 'none';
+    }
+
+    if (e.target.value === 'true_false') {
+        document.getElementById('correct-answer').placeholder = 'true or false';
+    } else {
+        document.getElementById('correct-answer').placeholder = 'Enter the correct answer';
+    }
+});
+
+document.getElementById('save-quiz').addEventListener('click', async () => {
+    const data = {
+        title: document.getElementById('quiz-title').value,
+        description: document.getElementById('quiz-description').value,
+        subject: document.getElementById('quiz-subject').value
+    };
+
+    if (!data.title) {
+        alert('Please enter a quiz title');
+        return;
+    }
+
+    let url = '/quiz/api/quiz';
+    let method = 'POST';
+
+    if (quizId) {
+        url = `/quiz/api/quiz/${quizId}`;
+        method = 'PUT';
+    }
+
+    const res = await fetch(url, {
+        method,
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(data)
+    });
+
+    const result = await res.json();
+
+    if (result.success || result.id) {
+        if (!quizId) {
+            quizId = result.id;
+        }
+        document.getElementById('questions-section').style.display = 'block';
+        alert('Quiz saved!');
+    }
+});
+
+document.getElementById('add-question-btn').addEventListener('click', () => {
+    document.getElementById('question-form').style.display = 'block';
+    document.getElementById('question-form-title').textContent = 'Add New Question';
+    document.getElementById('edit-question-id').value = '';
+    document.getElementById('question-text').value = '';
+    document.getElementById('question-options').value = '';
+    document.getElementById('correct-answer').value = '';
+    document.getElementById('question-explanation').value = '';
+    document.getElementById('question-type').value = 'multiple_choice';
+    document.getElementById('mc-options').style.display = 'block';
+});
+
+document.getElementById('cancel-question').addEventListener('click', () => {
+    document.getElementById('question-form').style.display = 'none';
+});
+
+document.getElementById('save-question').addEventListener('click', async () => {
+    const questionText = document.getElementById('question-text').value;
+    const questionType = document.getElementById('question-type').value;
+    const correctAnswer = document.getElementById('correct-answer').value;
+    const explanation = document.getElementById('question-explanation').value;
+    const editId = document.getElementById('edit-question-id').value;
+
+    let options = [];
+    if (questionType === 'multiple_choice') {
+        options = document.getElementById('question-options').value.split('\n').filter(o => o.trim());
+    } else if (questionType === 'true_false') {
+        options = ['true', 'false'];
+    }
+
+    if (!questionText || !correctAnswer) {
+        alert('Please fill in the question and answer');
+        return;
+    }
+
+    const data = {
+        question_text: questionText,
+        question_type: questionType,
+        correct_answer: correctAnswer,
+        options: options,
+        explanation: explanation
+    };
+
+    let url, method;
+    if (editId) {
+        url = `/quiz/api/question/${editId}`;
+        method = 'PUT';
+    } else {
+        url = `/quiz/api/quiz/${quizId}/question`;
+        method = 'POST';
+    }
+
+    await fetch(url, {
+        method,
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(data)
+    });
+
+    location.reload();
+});
+
+document.querySelectorAll('.delete-question').forEach(btn => {
+    btn.addEventListener('click', async () => {
+        const item = btn.closest('.question-item');
+        const qId = item.dataset.id;
+        if (confirm('Delete this question?')) {
+            await fetch(`/quiz/api/question/${qId}`, { method: 'DELETE' });
+            item.remove();
+        }
+    });
+});
+
+document.querySelectorAll('.edit-question').forEach(btn => {
+    btn.addEventListener('click', async () => {
+        const item = btn.closest('.question-item');
+        const qId = item.dataset.id;
+
+        const res = await fetch(`/quiz/api/quiz/${quizId}`);
+        const data = await res.json();
+        const q = data.questions.find(x => x.id == qId);
+
+        if (q) {
+            document.getElementById('question-form').style.display = 'block';
+            document.getElementById('question-form-title').textContent = 'Edit Question';
+            document.getElementById('edit-question-id').value = qId;
+            document.getElementById('question-text').value = q.question_text;
+            document.getElementById('question-type').value = q.question_type;
+            document.getElementById('correct-answer').value = q.correct_answer;
+            document.getElementById('question-explanation').value = q.explanation || '';
+
+            if (q.question_type === 'multiple_choice') {
+                const opts = JSON.parse(q.options || '[]');
+                document.getElementById('question-options').value = opts.join('\n');
+                document.getElementById('mc-options').style.display = 'block';
+            } else {
+                document.getElementById('mc-options').style.display = 'none';
+            }
+        }
+    });
+});
@@ -0,0 +1,9 @@
+document.querySelectorAll('.delete-quiz').forEach(btn => {
+    btn.addEventListener('click', async () => {
+        if (confirm('Delete this quiz and all its questions?')) {
+            const id = btn.dataset.id;
+            await fetch(`/quiz/api/quiz/${id}`, { method: 'DELETE' });
+            location.reload();
+        }
+    });
+});
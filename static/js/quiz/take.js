@@ -0,0 +1,56 @@
+const startTime = Date.now();
+
+// Style selected options
+document.querySelectorAll('.quiz-option').forEach(opt => {
+    opt.addEventListener('click', () => {
+        const parent = opt.closest('.quiz-options');
+        parent.querySelectorAll('.quiz-option').forEach(o => o.classList.remove('selected'));
+        opt.classList.add('selected');
+    });
+});
+
+document.getElementById('quiz-form').addEventListener('submit', async (e) => {
+    e.preventDefault();
+
+    const formData = new FormData(e.target);
+    const answers = {};
+
+    for (let [key, value] of formData.entries()) {
+        const qId = key.replace('q_', '');
+        answers[qId] = value;
+    }
+
+    const timeTaken = Math.floor((Date.now() - startTime) / 1000);
+
+    const res = await fetch(`/quiz/api/quiz/${quizId}/submit`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ answers, time_taken: timeTaken })
+    });
+
+    const result = await res.json();
+
+    // Show results
+    document.getElementById('quiz-container').style.display = 'none';
+    document.getElementById('results-container').style.display = 'block';
+
+    document.getElementById('score-display').textContent = Math.round(result.percentage) + '%';
+    document.getElementById('score-text').textContent = `${result.score} out of ${result.total_points} correct`;
+
+    // Show individual results
+    const resultsList = document.getElementById('results-list');
+    resultsList.innerHTML = '';
+
+    result.results.forEach((r, i) => {
+        const div = document.createElement('div');
+        div.className = `card mb-2 ${r.correct ? 'quiz-option correct' : 'quiz-option incorrect'}`;
+        div.innerHTML = `
+            <strong>Q${i + 1}:</strong> ${r.correct ? '<i class="fas fa-check" style="color: var(--success);"></i>' : '<i class="fas fa-times" style="color: var(--error);"></i>'}
+            <br>
+            <span class="text-muted">Your answer: ${r.user_answer || '(no answer)'}</span>
+            ${!r.correct ? `<br><span style="color: var(--success);">Correct: ${r.correct_answer}</span>` : ''}
+            ${r.explanation ? `<br><small class="text-muted"><em>${r.explanation}</em></small>` : ''}
+        `;
+        resultsList.appendChild(div);
+    });
+});
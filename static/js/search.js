@@ -0,0 +1,63 @@
+const KIND_LABELS = { card: 'Flashcard', question: 'Quiz question', syllabus: 'Syllabus' };
+let page = 1;
+let debounce = null;
+
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text || '';
+    return div.innerHTML;
+}
+
+// Snippets mark matches with <mark> tags; escape everything else
+function renderSnippet(text) {
+    return escapeHtml(text).replace(/&lt;mark&gt;/g, '<mark>').replace(/&lt;\/mark&gt;/g, '</mark>');
+}
+
+function resultLink(r) {
+    if (r.kind === 'card') return `/flashcard/edit/${r.parent_id}`;
+    if (r.kind === 'question') return `/quiz/edit/${r.parent_id}`;
+    return `/syllabus/${r.parent_id}`;
+}
+
+async function runSearch() {
+    const q = document.getElementById('search-input').value.trim();
+    const container = document.getElementById('search-results');
+    if (!q) {
+        container.innerHTML = '';
+        document.getElementById('prev-page').style.display = 'none';
+        document.getElementById('next-page').style.display = 'none';
+        return;
+    }
+
+    const res = await fetch(`/search/api/search?q=${encodeURIComponent(q)}&page=${page}`);
+    const data = await res.json();
+
+    if (!data.results || data.results.length === 0) {
+        container.innerHTML = '<div class="card empty-state"><i class="fas fa-search"></i><h3>No results</h3></div>';
+    } else {
+        container.innerHTML = data.results.map(r => `
+            <a href="${resultLink(r)}" class="card mb-2" style="display: block; text-decoration: none; color: inherit;">
+                <div class="flex flex-between">
+                    <h4>${renderSnippet(r.title)}</h4>
+                    <span class="badge badge-primary">${KIND_LABELS[r.kind]}</span>
+                </div>
+                <p class="text-muted">${renderSnippet(r.body)}</p>
+                <p class="text-muted"><small>${escapeHtml(r.parent_name)}</small></p>
+            </a>
+        `).join('');
+    }
+
+    document.getElementById('prev-page').style.display = page > 1 ? 'inline-flex' : 'none';
+    document.getElementById('next-page').style.display = data.has_more ? 'inline-flex' : 'none';
+}
+
+document.getElementById('search-input').addEventListener('input', () => {
+    clearTimeout(debounce);
+    page = 1;
+    debounce = setTimeout(runSearch, 200);
+});
+
+document.getElementById('prev-page').addEventListener('click', () => { page--; runSearch(); });
+document.getElementById('next-page').addEventListener('click', () => { page++; runSearch(); });
+
+runSearch();
@@ -0,0 +1,146 @@
+let currentSource = 'pdf';
+let extractedContent = '';
+
+// Source type switching
+document.querySelectorAll('.session-type-btn').forEach(btn => {
+    btn.addEventListener('click', () => {
+        document.querySelectorAll('.session-type-btn').forEach(b => b.classList.remove('active'));
+        btn.classList.add('active');
+
+        currentSource = btn.dataset.source;
+        document.querySelectorAll('.source-input').forEach(el => el.style.display = 'none');
+        document.getElementById(`source-${currentSource}`).style.display = 'block';
+    });
+});
+
+// Checkbox styling
+document.querySelectorAll('.quiz-option input[type="checkbox"]').forEach(cb => {
+    cb.addEventListener('change', () => {
+        cb.closest('.quiz-option').classList.toggle('selected', cb.checked);
+    });
+});
+
+// Parse content
+document.getElementById('parse-btn').addEventListener('click', async () => {
+    const formData = new FormData();
+    formData.append('source_type', currentSource);
+
+    if (currentSource === 'pdf') {
+        const file = document.getElementById('pdf-file').files[0];
+        if (!file) {
+            alert('Please select a PDF file');
+            return;
+        }
+        formData.append('pdf_file', file);
+    } else if (currentSource === 'url') {
+        const url = document.getElementById('url-input').value;
+        if (!url) {
+            alert('Please enter a URL');
+            return;
+        }
+        formData.append('url', url);
+    } else {
+        const text = document.getElementById('text-input').value;
+        if (!text) {
+            alert('Please enter some text');
+            return;
+        }
+        formData.append('text_content', text);
+    }
+
+    const btn = document.getElementById('parse-btn');
+    btn.disabled = true;
+    btn.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Parsing...';
+
+    try {
+        const res = await fetch('/syllabus/api/parse', {
+            method: 'POST',
+            body: formData
+        });
+
+        const data = await res.json();
+
+        if (data.success) {
+            extractedContent = data.content;
+            document.getElementById('content-preview').value = extractedContent.substring(0, 2000) + (extractedContent.length > 2000 ? '...' : '');
+            document.getElementById('content-length').textContent = data.length;
+            document.getElementById('step-2').style.display = 'block';
+            document.getElementById('step-2').scrollIntoView({ behavior: 'smooth' });
+        } else {
+            alert('Error: ' + (data.error || 'Failed to parse content'));
+        }
+    } catch (e) {
+        alert('Error: ' + e.message);
+    }
+
+    btn.disabled = false;
+    btn.innerHTML = '<i class="fas fa-search"></i> Parse Content';
+});
+
+// Generate content
+document.getElementById('generate-btn').addEventListener('click', async () => {
+    const name = document.getElementById('syllabus-name').value || 'My Syllabus';
+
+    const checkboxes = document.querySelectorAll('input[name="generate"]:checked');
+    if (checkboxes.length === 0) {
+        alert('Please select at least one type of content to generate');
+        return;
+    }
+
+    document.getElementById('generate-btn').style.display = 'none';
+    document.getElementById('loading').style.display = 'block';
+
+    try {
+        const res = await fetch('/syllabus/api/generate', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                name: name,
+                content: extractedContent,
+                type: 'all'
+            })
+        });
+
+        const data = await res.json();
+
+        if (data.success) {
+            let html = '';
+
+            if (data.results.quizzes.length > 0) {
+                html += `<div class="mb-3">
+                    <h3><i class="fas fa-check" style="color: var(--success);"></i> Quiz Created</h3>
+                    <p class="text-muted">${data.results.quizzes[0].question_count} questions generated</p>
+                </div>`;
+            }
+
+            if (data.results.flashcards.length > 0) {
+                html += `<div class="mb-3">
+                    <h3><i class="fas fa-check" style="color: var(--success);"></i> Flashcard Deck Created</h3>
+                    <p class="text-muted">${data.results.flashcards[0].card_count} cards generated</p>
+                </div>`;
+            }
+
+            if (data.results.study_plan) {
+                const plan = data.results.study_plan;
+                html += `<div class="mb-3">
+                    <h3><i class="fas fa-check" style="color: var(--success);"></i> Study Plan Created</h3>
+                    <p class="text-muted">${plan.topics?.length || 0} topics, ~${plan.total_study_hours || 0} hours total</p>
+                </div>`;
+            }
+
+            document.getElementById('results-content').innerHTML = html;
+            document.getElementById('step-2').style.display = 'none';
+            document.getElementById('step-3').style.display = 'block';
+            document.getElementById('step-3').scrollIntoView({ behavior: 'smooth' });
+
+        } else {
+            alert('Error: ' + (data.error || 'Failed to generate content'));
+            document.getElementById('generate-btn').style.display = 'block';
+            document.getElementById('loading').style.display = 'none';
+        }
+    } catch (e) {
+        alert('Error: ' + e.message);
+        document.getElementById('generate-btn').style.display = 'block';
+        document.getElementById('loading').style.display = 'none';
+    }
+});
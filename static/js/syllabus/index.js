@@ -0,0 +1,9 @@
+document.querySelectorAll('.delete-syllabus').forEach(btn => {
+    btn.addEventListener('click', async () => {
+        if (confirm('Delete this syllabus?')) {
+            const id = btn.dataset.id;
+            await fetch(`/syllabus/api/syllabus/${id}`, { method: 'DELETE' });
+            location.reload();
+        }
+    });
+});
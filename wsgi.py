@@ -0,0 +1,5 @@
+from app import create_app, precompile_templates
+
+# Entry point for WSGI servers, e.g. gunicorn -c gunicorn.conf.py wsgi:app
+app = create_app()
+precompile_templates(app)